@@ -0,0 +1,335 @@
+r"""
+Measures how fast each comparison engine (i.e. strategy) compares a synthetic pair of collections, along with how
+many round trips to the server it makes, how many bytes it exchanges with the server, and its peak memory usage.
+
+The script generates the collections—whose sizes, document shapes, identifier types, indexes, and differences you
+can specify—either on a MongoDB server (e.g. a local `mongod`), or in an in-process stand-in for one (via `mongomock`,
+which you can install via `$ pip install mongomock`). Each engine runs in a fresh worker process, so that its peak
+memory usage can be measured separately. The stand-in doesn't report commands, so round trips and bytes are only
+measured when using a MongoDB server.
+
+Usage (from the root directory of the repository, so that `mongo_diff` is importable even if it isn't installed):
+    $ python -m benchmarks.compare_collections [--mongo-uri mongodb://localhost:27017] [--num-documents 10000]
+    $ python -m benchmarks.compare_collections --in-process --identifier-type mixed --no-index --json results.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Optional
+
+import bson
+import pymongo
+from bson.objectid import ObjectId
+from pymongo import MongoClient, monitoring
+from pymongo.collection import Collection
+from rich.console import Console
+from rich.table import Table, Column
+from rich import box
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.strategies import Strategy
+
+DATABASE_NAME = "mongo_diff_benchmark"
+
+
+class CommandCounter(monitoring.CommandListener):
+    r"""
+    Counts the commands the client sends to the server (i.e. round trips), along with the sizes of the BSON
+    representations of those commands and of the server's replies to them.
+
+    Note: Re-encoding the replies takes time, which is why the engines are timed in separate, uninstrumented, runs.
+    """
+
+    def __init__(self) -> None:
+        self.num_round_trips = 0
+        self.num_bytes_sent = 0
+        self.num_bytes_received = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.num_round_trips += 1
+        self.num_bytes_sent += len(bson.encode(event.command))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.num_bytes_received += len(bson.encode(event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+
+def make_identifier(index: int, identifier_type: str) -> Any:
+    r"""
+    Returns the identifier value of the document having the specified index (in generation order).
+
+    >>> [make_identifier(index, "mixed") for index in range(3)]
+    [0, 'id-000000001', 2]
+    """
+
+    if identifier_type == "int":
+        return index
+    if identifier_type == "string":
+        return f"id-{index:09d}"
+    if identifier_type == "objectid":
+        return ObjectId(index.to_bytes(12, "big"))
+    return index if index % 2 == 0 else f"id-{index:09d}"  # "mixed"
+
+
+def make_value(rnd: random.Random, depth: int, width: int) -> Any:
+    r"""Returns a value for a field, which is an embedded document (nested to the specified depth) if depth > 0."""
+
+    if depth > 0:
+        return {f"field_{index}": make_value(rnd, depth - 1, width) for index in range(width)}
+    kind = rnd.randrange(4)
+    if kind == 0:
+        return rnd.randrange(1_000_000)
+    if kind == 1:
+        return rnd.random()
+    if kind == 2:
+        return f"value {rnd.randrange(1_000_000)}"
+    return [rnd.randrange(100) for _ in range(3)]
+
+
+def generate_collection_pair(collection_a: Collection, collection_b: Collection, scenario: dict) -> dict:
+    r"""
+    Populates the (empty) collections with documents as described by the scenario, and returns the numbers of
+    documents that are in collection A only, in collection B only, and that differ between the collections.
+
+    Every other pair of differing documents differs only in the fractional part of a number (e.g. `1.25` versus
+    `1.75`); which an engine that compared digests of numbers truncated to integers (as `$toHashedIndexKey`
+    computes them) would miss.
+    """
+
+    rnd = random.Random(scenario["seed"])
+    if scenario["indexed"]:
+        collection_a.create_index("id", unique=True)
+        collection_b.create_index("id", unique=True)
+
+    expected = dict(num_a_only=0, num_b_only=0, num_differing=0)
+    (batch_a, batch_b) = ([], [])
+    thresholds = (
+        scenario["percent_a_only"] / 100,
+        (scenario["percent_a_only"] + scenario["percent_b_only"]) / 100,
+        (scenario["percent_a_only"] + scenario["percent_b_only"] + scenario["percent_differing"]) / 100,
+    )
+    for index in range(scenario["num_documents"]):
+        document = {"id": make_identifier(index, scenario["identifier_type"])}
+        document.update(make_value(rnd, scenario["depth"], scenario["width"]))
+        roll = rnd.random()
+        if roll < thresholds[0]:
+            batch_a.append(document)
+            expected["num_a_only"] += 1
+        elif roll < thresholds[1]:
+            batch_b.append(document)
+            expected["num_b_only"] += 1
+        elif roll < thresholds[2]:
+            if expected["num_differing"] % 2 == 0:
+                batch_b.append({**document, "field_0": "something else"})
+            else:
+                document["field_0"] = 1.25
+                batch_b.append({**document, "field_0": 1.75})
+            batch_a.append(document)
+            expected["num_differing"] += 1
+        else:
+            batch_a.append(document)
+            batch_b.append(dict(document))
+        for (collection, batch) in [(collection_a, batch_a), (collection_b, batch_b)]:
+            if len(batch) >= 1000:
+                collection.insert_many(batch)
+                batch.clear()
+    for (collection, batch) in [(collection_a, batch_a), (collection_b, batch_b)]:
+        if len(batch) > 0:
+            collection.insert_many(batch)
+    return expected
+
+
+def get_peak_rss() -> int:
+    r"""Returns the peak resident set size of this process, in bytes (`ru_maxrss` is in kilobytes on Linux)."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def run_engine(job: dict) -> dict:
+    r"""
+    Compares the collections via the engine described by the job, and returns measurements of that. This runs in
+    a worker process; which, when using the in-process stand-in, generates its own copy of the collections.
+    """
+
+    (scenario, engine) = (job["scenario"], job["engine"])
+    measurement: dict[str, Any] = dict(engine=engine, error=None)
+    counter = CommandCounter()
+    if job["mongo_uri"] is None:
+        import mongomock  # only needed when using the in-process stand-in
+        clients = [mongomock.MongoClient()]
+        database = clients[0][DATABASE_NAME]
+        expected = generate_collection_pair(database["a"], database["b"], scenario)
+    else:
+        clients = [MongoClient(job["mongo_uri"]), MongoClient(job["mongo_uri"], event_listeners=[counter])]
+        expected = job["expected"]
+
+    try:
+        comparator = Comparator(console=None)
+        options = dict(
+            identifier_field_name_a="id",
+            identifier_field_name_b="id",
+            ignore_oid=True,
+            strategy=Strategy(engine),
+            batch_size=scenario["batch_size"],
+            use_raw_bson=scenario["raw_bson"],
+        )
+
+        # Time the comparison, and measure how much it raised the peak memory usage of this process.
+        baseline_rss = get_peak_rss()
+        database = clients[0][DATABASE_NAME]
+        started_at = time.perf_counter()
+        result = comparator.compare_collections(collection_a=database["a"], collection_b=database["b"], **options)
+        seconds = time.perf_counter() - started_at
+        num_documents = result.num_documents_in_collection_a + result.num_documents_in_collection_b
+        measurement.update(
+            seconds=round(seconds, 4),
+            documents_per_second=round(num_documents / seconds),
+            baseline_rss_bytes=baseline_rss,
+            peak_rss_bytes=get_peak_rss(),
+            is_correct=(
+                result.num_documents_in_collection_a_only == expected["num_a_only"]
+                and result.num_documents_in_collection_b_only == expected["num_b_only"]
+                and result.num_differing_documents == expected["num_differing"]
+            ),
+        )
+
+        # Count the round trips and bytes via a separate, instrumented, comparison (if the server reports them).
+        measurement.update(round_trips=None, bytes_sent=None, bytes_received=None)
+        if len(clients) > 1:
+            database = clients[1][DATABASE_NAME]
+            comparator.compare_collections(collection_a=database["a"], collection_b=database["b"], **options)
+            measurement.update(
+                round_trips=counter.num_round_trips,
+                bytes_sent=counter.num_bytes_sent,
+                bytes_received=counter.num_bytes_received,
+            )
+    except Exception as error:  # record the failure (e.g. a strategy the server doesn't support) and move on
+        measurement["error"] = f"{type(error).__name__}: {error}"
+    finally:
+        for client in clients:
+            client.close()
+    return measurement
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark collection comparisons.")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017",
+                        help="Connection string of the MongoDB server on which to generate the collections.")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Generate the collections in an in-process stand-in for a MongoDB server (mongomock).")
+    parser.add_argument("--engine", action="append", choices=[strategy.value for strategy in Strategy],
+                        help="Engine (i.e. strategy) to benchmark. Can be specified multiple times (default: all).")
+    parser.add_argument("--num-documents", type=int, default=10_000, help="Number of distinct identifier values.")
+    parser.add_argument("--depth", type=int, default=1, help="Depth to which documents contain embedded documents.")
+    parser.add_argument("--width", type=int, default=10, help="Number of fields at each level of a document.")
+    parser.add_argument("--percent-differing", type=float, default=5.0, help="Percentage of documents that differ.")
+    parser.add_argument("--percent-a-only", type=float, default=1.0, help="Percentage of documents in A only.")
+    parser.add_argument("--percent-b-only", type=float, default=1.0, help="Percentage of documents in B only.")
+    parser.add_argument("--identifier-type", choices=["int", "string", "objectid", "mixed"], default="int",
+                        help="BSON type of the identifier values (`mixed` alternates ints and strings).")
+    parser.add_argument("--no-index", dest="indexed", action="store_false",
+                        help="Do not index the identifier field.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Batch size to pass to the engines.")
+    parser.add_argument("--raw-bson", action="store_true", help="Have the engines read documents as raw BSON.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random number generator.")
+    parser.add_argument("--json", dest="json_path", help="Path to a file to which to save the results, as JSON.")
+    parser.add_argument("--keep-data", action="store_true",
+                        help="Do not drop the generated database (when using a MongoDB server) afterward.")
+    args = parser.parse_args()
+
+    scenario = dict(
+        num_documents=args.num_documents,
+        depth=args.depth,
+        width=args.width,
+        percent_differing=args.percent_differing,
+        percent_a_only=args.percent_a_only,
+        percent_b_only=args.percent_b_only,
+        identifier_type=args.identifier_type,
+        indexed=args.indexed,
+        batch_size=args.batch_size,
+        raw_bson=args.raw_bson,
+        seed=args.seed,
+    )
+    engines = args.engine or [strategy.value for strategy in Strategy]
+    console = Console()
+
+    # Generate the collections on the server (the worker processes generate their own, when using the stand-in).
+    mongo_uri: Optional[str] = None if args.in_process else args.mongo_uri
+    expected = None
+    server_version = "mongomock"
+    if mongo_uri is not None:
+        with MongoClient(mongo_uri) as client:
+            server_version = client.server_info()["version"]
+            client.drop_database(DATABASE_NAME)
+            console.print(f"Generating collections on MongoDB {server_version}...")
+            expected = generate_collection_pair(client[DATABASE_NAME]["a"], client[DATABASE_NAME]["b"], scenario)
+
+    # Run each engine in a fresh worker process.
+    #
+    # Note: We use the "spawn" start method so that the worker processes do not inherit (via "fork") this process's
+    #       memory, which would skew their peak memory usage.
+    #
+    measurements = []
+    try:
+        for engine in engines:
+            console.print(f"Benchmarking engine: {engine}")
+            job = dict(scenario=scenario, engine=engine, mongo_uri=mongo_uri, expected=expected)
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                measurements.append(executor.submit(run_engine, job).result())
+    finally:
+        if mongo_uri is not None and not args.keep_data:
+            with MongoClient(mongo_uri) as client:
+                client.drop_database(DATABASE_NAME)
+
+    table = Table(
+        Column("Engine"),
+        Column("Docs/sec", justify="right"),
+        Column("Seconds", justify="right"),
+        Column("Round trips", justify="right"),
+        Column("MB received", justify="right"),
+        Column("Peak RSS (MB)", justify="right"),
+        Column("Correct"),
+        box=box.SIMPLE_HEAVY,
+    )
+    for measurement in measurements:
+        if measurement["error"] is not None:
+            table.add_row(measurement["engine"], measurement["error"], style="red")
+            continue
+        table.add_row(
+            measurement["engine"],
+            f"{measurement['documents_per_second']:,}",
+            f"{measurement['seconds']:,.2f}",
+            "-" if measurement["round_trips"] is None else f"{measurement['round_trips']:,}",
+            "-" if measurement["bytes_received"] is None else f"{measurement['bytes_received'] / 2 ** 20:,.1f}",
+            f"{measurement['peak_rss_bytes'] / 2 ** 20:,.1f}",
+            "yes" if measurement["is_correct"] else "[red]no[/red]",
+        )
+    console.print(table)
+
+    if args.json_path is not None:
+        report = dict(
+            scenario=scenario,
+            environment=dict(
+                python=platform.python_version(),
+                pymongo=pymongo.version,
+                server=server_version,
+                platform=platform.platform(),
+            ),
+            results=measurements,
+        )
+        with open(args.json_path, "w") as file:
+            json.dump(report, file, indent=2)
+        console.print(f'Results saved to: "{args.json_path}"')
+
+
+if __name__ == "__main__":
+    main()
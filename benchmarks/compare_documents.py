@@ -0,0 +1,126 @@
+r"""
+Measures how long it takes to compare pairs of (decoded) documents via `Comparator.compare_documents`, and via
+`dictdiffer` (which the tool used to use for that), for documents having various shapes.
+
+Usage (from the root directory of the repository):
+    $ python -m benchmarks.compare_documents [--number 2000]
+"""
+
+import argparse
+import datetime
+import timeit
+from copy import deepcopy
+from typing import Any, Mapping
+
+import dictdiffer
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from rich.console import Console
+from rich.table import Table, Column
+from rich import box
+
+from mongo_diff.comparator import Comparator
+
+
+def compare_documents_via_dictdiffer(document_a: Mapping, document_b: Mapping, ignore_oid: bool = False) -> bool:
+    r"""Returns `True` if `dictdiffer` does not find any differences between the documents; otherwise `False`."""
+
+    fields_to_ignore = {"_id"} if ignore_oid else set()
+    try:
+        next(dictdiffer.diff(document_a, document_b, ignore=fields_to_ignore))
+    except StopIteration:
+        return True
+    return False
+
+
+def make_wide_document(num_fields: int) -> dict:
+    r"""Returns a document having the specified number of top-level fields, of assorted BSON types."""
+
+    document: dict[str, Any] = {"_id": ObjectId("65a1f0c0e4b0a1b2c3d4e5f6"), "id": "doc-1"}
+    for index in range(num_fields):
+        kind = index % 5
+        if kind == 0:
+            document[f"field_{index}"] = f"value {index}"
+        elif kind == 1:
+            document[f"field_{index}"] = index
+        elif kind == 2:
+            document[f"field_{index}"] = index / 3
+        elif kind == 3:
+            document[f"field_{index}"] = datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=index)
+        else:
+            document[f"field_{index}"] = Decimal128(f"{index}.25")
+    return document
+
+
+def make_deep_document(depth: int, breadth: int) -> dict:
+    r"""Returns a document having embedded documents and arrays nested to the specified depth."""
+
+    def make_level(level: int) -> Any:
+        if level == depth:
+            return [level, f"leaf {level}", level / 7]
+        return {f"child_{index}": make_level(level + 1) for index in range(breadth)} | {"tags": ["a", "b", "c"]}
+
+    return {"_id": ObjectId("65a1f0c0e4b0a1b2c3d4e5f6"), "id": "doc-1", "root": make_level(0)}
+
+
+def make_cases() -> list[tuple[str, dict, dict]]:
+    r"""Returns a list of (description, document A, document B) tuples to benchmark."""
+
+    cases = []
+    for (shape, document) in [
+        ("wide (200 fields)", make_wide_document(200)),
+        ("deep (depth 6, breadth 3)", make_deep_document(6, 3)),
+    ]:
+        same = deepcopy(document)
+        cases.append((f"{shape}, identical", document, same))
+
+        differs_early = deepcopy(document)
+        differs_early["id"] = "doc-2"
+        cases.append((f"{shape}, first field differs", document, differs_early))
+
+        differs_late = deepcopy(document)
+        last_field_name = list(differs_late.keys())[-1]
+        differs_late[last_field_name] = "something else"
+        cases.append((f"{shape}, last field differs", document, differs_late))
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark document comparisons.")
+    parser.add_argument("--number", type=int, default=2000, help="Number of comparisons to time per case.")
+    args = parser.parse_args()
+
+    table = Table(
+        Column("Case"),
+        Column("dictdiffer (µs)", justify="right"),
+        Column("mongo-diff (µs)", justify="right"),
+        Column("Speedup", justify="right"),
+        box=box.SIMPLE_HEAVY,
+    )
+    for (description, document_a, document_b) in make_cases():
+        expected = compare_documents_via_dictdiffer(document_a, document_b, ignore_oid=True)
+        actual = Comparator.compare_documents(document_a, document_b, ignore_oid=True)
+        assert actual == expected, f"Results differ for case: {description}"
+
+        baseline_seconds = min(timeit.repeat(
+            lambda: compare_documents_via_dictdiffer(document_a, document_b, ignore_oid=True),
+            number=args.number,
+            repeat=3,
+        ))
+        seconds = min(timeit.repeat(
+            lambda: Comparator.compare_documents(document_a, document_b, ignore_oid=True),
+            number=args.number,
+            repeat=3,
+        ))
+        table.add_row(
+            description,
+            f"{baseline_seconds / args.number * 1e6:,.1f}",
+            f"{seconds / args.number * 1e6:,.1f}",
+            f"{baseline_seconds / seconds:,.1f}x",
+        )
+
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+r"""The asyncio-based comparator, which reads both collections at the same time."""
+
+import asyncio
+from typing import Any, Optional
+
+from pymongo.collection import Collection
+from pymongo import ASCENDING, AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from bson.raw_bson import RawBSONDocument
+from rich.console import Console
+
+from mongo_diff.equality import EqualityRules
+from mongo_diff.bson_utils import bson_sort_key
+from mongo_diff.queries import make_pymongo_projection_for_fields
+from mongo_diff.stats import ComparisonStats
+from mongo_diff.reports import ReportSink
+from mongo_diff.results import Result
+from mongo_diff.comparator import Comparator
+
+
+class AsyncComparator(Comparator):
+    r"""
+    Compares MongoDB collections with one another, reading from both collections at the same time.
+
+    This is an asyncio-based variant of `Comparator`, built on PyMongo's asynchronous client. It is
+    most useful when the collections reside on different servers, since it waits for both servers
+    at once (rather than for one, then the other) and compares documents while more are on the way.
+
+    Its `compare_collections_async` method is the asynchronous counterpart of `compare_collections` (which
+    it inherits unchanged, so an `AsyncComparator` can still be used wherever a `Comparator` can).
+
+    Reference: https://pymongo.readthedocs.io/en/stable/async-tutorial.html
+    """
+
+    async def compare_collections_async(
+        self,
+        collection_a: AsyncCollection,
+        collection_b: AsyncCollection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        prefetch_size: int = 1000,
+        use_raw_bson: bool = False,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        only_field_names: Optional[list[str]] = None,
+        ignored_field_names: Optional[list[str]] = None,
+        report_sink: Optional[ReportSink] = None,
+    ) -> Result:
+        r"""
+        Compares one MongoDB collection with another one, producing the same result as
+        `Comparator.compare_collections` does.
+
+        Reads each collection sorted by its identifier field (in a separate asyncio task, which
+        stays up to `prefetch_size` documents ahead) and pairs up documents whose identifier
+        values match, as `Strategy.MERGE` does.
+
+        :param collection_a: One collection.
+        :param collection_b: The other collection.
+        :param identifier_field_name_a: The name of the field of each document in collection A to
+                                        use to identify a corresponding document in collection B.
+        :param identifier_field_name_b: The name of the field of each document in collection B to
+                                        use to identify a corresponding document in collection A.
+        :param ignore_oid: Whether to ignore the `_id` field when comparing documents.
+        :param prefetch_size: The maximum number of documents to read ahead from each collection.
+        :param use_raw_bson: Whether to read documents as `RawBSONDocument` instances (see
+                             `Comparator.compare_collections`).
+        :param filter_a: A pymongo filter that limits the comparison to the documents in collection A
+                         that match it.
+        :param filter_b: A pymongo filter that limits the comparison to the documents in collection B
+                         that match it.
+        :param only_field_names: The names (or dotted paths) of the only fields to compare (besides the
+                                 identifier field and—unless ignored—the `_id` field).
+        :param ignored_field_names: The names (or dotted paths) of fields to ignore when comparing documents.
+        :param report_sink: A `ReportSink` to which the result will stream its records, instead of
+                            keeping them in memory.
+
+        :returns: A `Result` instance containing the result of the comparison.
+        """
+
+        if use_raw_bson:
+            collection_a = collection_a.with_options(
+                codec_options=collection_a.codec_options.with_options(document_class=RawBSONDocument),
+            )
+            collection_b = collection_b.with_options(
+                codec_options=collection_b.codec_options.with_options(document_class=RawBSONDocument),
+            )
+
+        # Initialize the report we will return.
+        filter_a = {} if filter_a is None else filter_a
+        filter_b = {} if filter_b is None else filter_b
+        projection_a = make_pymongo_projection_for_fields(
+            identifier_field_name_a, only_field_names, ignored_field_names,
+        )
+        projection_b = make_pymongo_projection_for_fields(
+            identifier_field_name_b, only_field_names, ignored_field_names,
+        )
+        with self._time_phase("counting documents"):
+            (num_documents_in_collection_a, num_documents_in_collection_b) = await asyncio.gather(
+                collection_a.count_documents(filter_a) if filter_a else collection_a.estimated_document_count(),
+                collection_b.count_documents(filter_b) if filter_b else collection_b.estimated_document_count(),
+            )
+        report = Result(num_documents_in_collection_a, num_documents_in_collection_b, sink=report_sink)
+        report.stats = self.stats
+
+        # Start reading from both collections.
+        queue_a: asyncio.Queue = asyncio.Queue(maxsize=prefetch_size)
+        queue_b: asyncio.Queue = asyncio.Queue(maxsize=prefetch_size)
+        producers = [
+            asyncio.create_task(self._read_sorted_documents(
+                collection_a, identifier_field_name_a, filter_a, projection_a, queue_a, "A",
+            )),
+            asyncio.create_task(self._read_sorted_documents(
+                collection_b, identifier_field_name_b, filter_b, projection_b, queue_b, "B",
+            )),
+        ]
+
+        # Set up the progress bar functionality.
+        self.console.print()
+        try:
+            with self._create_progress() as progress, self._time_phase("comparing collections"):
+                task_a = progress.add_task("Comparing collections via sorted merge (collection A)",
+                                           total=report.num_documents_in_collection_a)
+                task_b = progress.add_task("Comparing collections via sorted merge (collection B)",
+                                           total=report.num_documents_in_collection_b)
+
+                # Walk along both streams of documents, as `merge_sorted_streams` does.
+                num_documents_a = num_documents_b = 0
+                head_a = await self._get_next_keyed_document(queue_a)
+                head_b = await self._get_next_keyed_document(queue_b)
+                while head_a is not None or head_b is not None:
+                    document_a = document_b = None
+                    if head_b is None or (head_a is not None and head_a[0] < head_b[0]):
+                        document_a = head_a[1]
+                        identifier_value_a = self.get_identifier_value(document_a, identifier_field_name_a, "A")
+                        self._process_document_in_collection_a_only(report, identifier_field_name_a,
+                                                                     identifier_value_a)
+                    elif head_a is None or head_b[0] < head_a[0]:
+                        document_b = head_b[1]
+                        identifier_value_b = self.get_identifier_value(document_b, identifier_field_name_b, "B")
+                        self._process_document_in_collection_b_only(report, identifier_field_name_b,
+                                                                     identifier_value_b)
+                    else:
+                        document_a, document_b = head_a[1], head_b[1]
+                        self._process_document_pair(
+                            report=report,
+                            document_a=document_a,
+                            document_b=document_b,
+                            identifier_field_name_a=identifier_field_name_a,
+                            identifier_field_name_b=identifier_field_name_b,
+                            ignore_oid=ignore_oid,
+                        )
+
+                    # Advance the progress bar(s) by 1, and move on to the next document(s).
+                    if document_a is not None:
+                        progress.update(task_a, advance=1)
+                        num_documents_a += 1
+                        head_a = await self._get_next_keyed_document(queue_a)
+                    if document_b is not None:
+                        progress.update(task_b, advance=1)
+                        num_documents_b += 1
+                        head_b = await self._get_next_keyed_document(queue_b)
+
+                # Now that we've processed every document, replace the estimates with the actual numbers of documents.
+                report.num_documents_in_collection_a = num_documents_a
+                report.num_documents_in_collection_b = num_documents_b
+        finally:
+            self.flush_output()
+            for producer in producers:
+                producer.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+
+        return report
+
+    async def _read_sorted_documents(
+        self,
+        collection: AsyncCollection,
+        identifier_field_name: str,
+        filter: dict,
+        projection: Optional[dict],
+        queue: asyncio.Queue,
+        collection_label: str,
+    ) -> None:
+        r"""
+        Reads the documents in the collection (that match the filter, projected via the projection), sorted by
+        identifier value, and puts
+        a `(bson_sort_key, document)` pair for each one into the queue, followed by `None`. If anything goes
+        wrong, puts the exception into the queue instead (so the consumer can raise it).
+        """
+
+        try:
+            previous_key: Any = None
+            cursor = collection.find(
+                filter, projection, sort=[(identifier_field_name, ASCENDING)], allow_disk_use=True,
+            )
+            async for document in cursor:
+                identifier_value = self.get_identifier_value(document, identifier_field_name, collection_label)
+                key = bson_sort_key(identifier_value)
+                if previous_key is not None and not previous_key < key:
+                    raise ValueError(
+                        f"Stream {collection_label} is not sorted by key (or contains duplicate keys)."
+                    )
+                previous_key = key
+                await queue.put((key, document))
+            await queue.put(None)
+        except Exception as exception:
+            await queue.put(exception)
+
+    @staticmethod
+    async def _get_next_keyed_document(queue: asyncio.Queue) -> Optional[tuple]:
+        r"""Returns the next `(bson_sort_key, document)` pair from the queue, or `None` if there are none left."""
+
+        item = await queue.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+async def compare_collections_asynchronously(
+    console: Console | None,
+    mongo_uri_a: str,
+    mongo_uri_b: str,
+    collection_a: Collection,
+    collection_b: Collection,
+    equality_rules: Optional[EqualityRules] = None,
+    max_diffs: Optional[int] = None,
+    stats: Optional[ComparisonStats] = None,
+    **options: Any,
+) -> Result:
+    r"""
+    Connects to the MongoDB server(s) containing the (already validated) collections via PyMongo's
+    asynchronous client, and compares the collections via an `AsyncComparator`. If you pass it a
+    `ComparisonStats` instance, it also registers that as a command listener of the clients.
+    """
+
+    event_listeners = [] if stats is None else [stats]
+    async_mongo_client_a: AsyncMongoClient = AsyncMongoClient(
+        host=mongo_uri_a, directConnection=True, event_listeners=event_listeners,
+    )
+    async_mongo_client_b: AsyncMongoClient = AsyncMongoClient(
+        host=mongo_uri_b, directConnection=True, event_listeners=event_listeners,
+    )
+    try:
+        async_collection_a = async_mongo_client_a[collection_a.database.name][collection_a.name]
+        async_collection_b = async_mongo_client_b[collection_b.database.name][collection_b.name]
+        comparator = AsyncComparator(console=console, equality_rules=equality_rules, max_diffs=max_diffs,
+                                     stats=stats)
+        return await comparator.compare_collections_async(
+            collection_a=async_collection_a,
+            collection_b=async_collection_b,
+            **options,
+        )
+    finally:
+        await async_mongo_client_a.close()
+        await async_mongo_client_b.close()
@@ -0,0 +1,344 @@
+r"""Helpers for ordering, encoding, and digesting BSON values, and for merging streams of values sorted by them."""
+
+import datetime
+import hashlib
+import math
+from decimal import Decimal
+from fractions import Fraction
+from typing import Any, Iterable, Iterator, Mapping, Tuple
+
+import bson
+from bson.binary import Binary
+from bson.datetime_ms import DatetimeMS
+from bson.decimal128 import Decimal128
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+
+def bson_sort_key(value: Any) -> tuple:
+    r"""
+    Returns a key that orders (and equates) BSON values the same way MongoDB does when it sorts
+    documents by a field containing those values.
+
+    That allows the caller to walk along cursors that MongoDB has sorted, and to tell—on the client
+    side—whether one value comes before, after, or is the same as another one. Numeric values of
+    different types (e.g. `1`, `1.0`, and `Decimal128("1")`) are considered the same, as they are
+    by MongoDB. The keys are hashable, so they can also be used as dictionary keys.
+
+    Reference: https://www.mongodb.com/docs/manual/reference/bson-type-comparison-order/
+
+    >>> bson_sort_key(1) == bson_sort_key(1.0) == bson_sort_key(Decimal128("1"))
+    True
+    >>> sorted(["b", 2, None, "a", True, 1.5], key=bson_sort_key)
+    [None, 1.5, 2, 'a', 'b', True]
+    >>> bson_sort_key({"b": 1}) < bson_sort_key({"b": 1, "a": 1})
+    True
+    """
+
+    if value is None:
+        return (2,)
+    if isinstance(value, MinKey):
+        return (1,)
+    if isinstance(value, MaxKey):
+        return (13,)
+    if isinstance(value, bool):  # note: we check this before `int`, since `bool` is a subclass of `int`
+        return (9, value)
+    if isinstance(value, (int, float, Decimal128)):
+        number = value.to_decimal() if isinstance(value, Decimal128) else value
+        if (isinstance(number, float) and math.isnan(number)) or (isinstance(number, Decimal) and number.is_nan()):
+            return (3, 0)  # MongoDB sorts `NaN` before all other numbers
+        return (3, 1, number)
+    if isinstance(value, str):
+        # Note: Python compares strings by code point, which matches MongoDB's (binary) comparison of UTF-8 bytes.
+        return (4, value)
+    if isinstance(value, Mapping):
+        return (5, tuple((bson_sort_key(v)[0], k, bson_sort_key(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return (6, tuple(bson_sort_key(v) for v in value))
+    if isinstance(value, bytes):
+        subtype = value.subtype if isinstance(value, Binary) else 0
+        return (7, len(value), subtype, bytes(value))
+    if isinstance(value, ObjectId):
+        return (8, value.binary)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return (10, (value - datetime.datetime(1970, 1, 1)) // datetime.timedelta(milliseconds=1))
+    if isinstance(value, DatetimeMS):
+        return (10, int(value))
+    if isinstance(value, Timestamp):
+        return (11, value.time, value.inc)
+    if isinstance(value, Regex):
+        return (12, str(value.pattern), str(value.flags))
+    raise TypeError(f"Unsupported identifier value type: {type(value).__name__}")
+
+
+def encode_identifier(identifier_value: Any) -> bytes:
+    r"""
+    Returns a compact (16-byte) digest of the identifier value. Identifier values that MongoDB
+    considers to be equal (e.g. `1`, `1.0`, and `Decimal128("1")`) have the same digest.
+
+    >>> len(encode_identifier("x:food-00001"))
+    16
+    >>> encode_identifier(1) == encode_identifier(1.0) == encode_identifier(Decimal128("1"))
+    True
+    >>> encode_identifier(1) == encode_identifier("1")
+    False
+    """
+
+    def normalize(part: Any) -> Any:
+        if isinstance(part, tuple):
+            return tuple(normalize(sub_part) for sub_part in part)
+        if isinstance(part, (int, float, Decimal)) and not isinstance(part, bool):
+            # Represent every finite number as an exact fraction, so equal numbers of different types match.
+            return Fraction(part) if math.isfinite(part) else float(part)
+        return part
+
+    canonical_representation = repr(normalize(bson_sort_key(identifier_value)))
+    return hashlib.blake2b(canonical_representation.encode("utf-8"), digest_size=16).digest()
+
+
+def encode_sort_key(value: Any) -> bytes:
+    r"""
+    Returns a byte string that orders (and equates) BSON values the same way `bson_sort_key` does—i.e.
+    the way MongoDB does—when byte strings are compared with one another. Unlike the keys `bson_sort_key`
+    returns, these can be written to disk and compared without decoding them (see `ExternalSorter`).
+
+    Each value is encoded as its type's rank in MongoDB's comparison order, followed by an encoding of
+    its content in which shorter content that is a prefix of longer content sorts first. Numbers are
+    encoded as their exact decimal value (sign, exponent, and digits), so that numbers of different types
+    that are equal (e.g. `1`, `1.0`, and `Decimal128("1")`) have the same encoding.
+
+    >>> encode_sort_key(1) == encode_sort_key(1.0) == encode_sort_key(Decimal128("1.00"))
+    True
+    >>> values = ["b", 2, None, "a", True, 1.5, -3, 0, float("-inf"), [1, "x"], {"a": 1}, "", 10, 1e-3, -0.5]
+    >>> sorted(values, key=encode_sort_key) == sorted(values, key=bson_sort_key)
+    True
+    """
+
+    sort_key = bson_sort_key(value)
+    rank = bytes([sort_key[0]])
+    if value is None or isinstance(value, (MinKey, MaxKey)):
+        return rank
+    if isinstance(value, bool):
+        return rank + bytes([value])
+    if isinstance(value, (int, float, Decimal128)):
+        return rank + _encode_number_for_sorting(sort_key)
+    if isinstance(value, str):
+        return rank + _encode_string_for_sorting(value)
+    if isinstance(value, Mapping):
+        # Note: Like `bson_sort_key`, we compare each field's type rank before its name, then its value.
+        encoded_fields = []
+        for (field_name, field_value) in value.items():
+            encoded_value = encode_sort_key(field_value)
+            encoded_fields.append(encoded_value[:1] + _encode_string_for_sorting(field_name) + encoded_value)
+        return rank + b"".join(encoded_fields) + b"\x00"
+    if isinstance(value, (list, tuple)):
+        return rank + b"".join(encode_sort_key(element) for element in value) + b"\x00"
+    if isinstance(value, bytes):
+        (_, length, subtype, content) = sort_key
+        return rank + length.to_bytes(4, "big") + bytes([subtype]) + content
+    if isinstance(value, ObjectId):
+        return rank + value.binary
+    if isinstance(value, (datetime.datetime, DatetimeMS)):
+        return rank + (sort_key[1] + 2 ** 63).to_bytes(8, "big")
+    if isinstance(value, Timestamp):
+        return rank + value.time.to_bytes(4, "big") + value.inc.to_bytes(4, "big")
+    if isinstance(value, Regex):
+        return rank + _encode_string_for_sorting(sort_key[1]) + _encode_string_for_sorting(sort_key[2])
+    raise TypeError(f"Unsupported identifier value type: {type(value).__name__}")
+
+
+def _encode_string_for_sorting(string: str) -> bytes:
+    r"""
+    Returns the string's UTF-8 representation (which sorts by code point), with each null byte escaped
+    and followed by a terminator that sorts before any content; so a string sorts before the strings it
+    is a prefix of.
+    """
+    return string.encode("utf-8").replace(b"\x00", b"\x00\xff") + b"\x00\x00"
+
+
+def _encode_number_for_sorting(sort_key: tuple) -> bytes:
+    r"""
+    Returns an order-preserving encoding of the number in the specified `bson_sort_key`: a byte that
+    distinguishes `NaN`, negative infinity, negative numbers, zero, positive numbers, and positive
+    infinity; followed—for finite, nonzero numbers—by the exponent of the most significant digit and
+    then the significant digits (with negative numbers' bytes inverted, so larger magnitudes sort first).
+    """
+
+    if sort_key[1] == 0:
+        return b"\x00"  # `NaN`
+    number = sort_key[2]
+    if isinstance(number, float) and math.isinf(number):
+        return b"\x01" if number < 0 else b"\x05"
+    if isinstance(number, Decimal) and number.is_infinite():
+        return b"\x01" if number.is_signed() else b"\x05"
+    if number == 0:
+        return b"\x03"
+    (sign, digits, exponent) = Decimal(number).as_tuple()
+    assert isinstance(exponent, int)
+    adjusted_exponent = exponent + len(digits) - 1
+    significant_digits = bytes(digits).rstrip(b"\x00")
+    encoded_magnitude = (adjusted_exponent + 2 ** 31).to_bytes(4, "big") + bytes(
+        digit + 1 for digit in significant_digits  # shifted by 1, so the terminator sorts before every digit
+    ) + b"\x00"
+    if sign:
+        return b"\x02" + bytes(255 - byte for byte in encoded_magnitude)
+    return b"\x04" + encoded_magnitude
+
+
+def merge_sorted_streams(
+    keyed_items_a: Iterable[Tuple[Any, Any]],
+    keyed_items_b: Iterable[Tuple[Any, Any]],
+) -> Iterator[Tuple[Any, Any]]:
+    r"""
+    Walks along two streams of `(key, item)` pairs—each of which is sorted by key, and neither of which
+    contains duplicate keys—and yields `(item_a, item_b)` pairs. When a key exists in only one stream,
+    the item from the other stream is `None`.
+
+    Raises a `ValueError` if either stream turns out not to be sorted (e.g. if the server sorted the
+    values differently than `bson_sort_key` orders them), rather than producing an incorrect result.
+
+    >>> list(merge_sorted_streams([(1, "a1"), (2, "a2")], [(2, "b2"), (3, "b3")]))
+    [('a1', None), ('a2', 'b2'), (None, 'b3')]
+    >>> list(merge_sorted_streams([(2, "a2"), (1, "a1")], []))
+    Traceback (most recent call last):
+    ...
+    ValueError: Stream A is not sorted by key (or contains duplicate keys).
+    """
+
+    def checked(keyed_items: Iterable[Tuple[Any, Any]], label: str) -> Iterator[Tuple[Any, Any]]:
+        previous_key: Any = None
+        is_first = True
+        for key, item in keyed_items:
+            if not is_first and not previous_key < key:
+                raise ValueError(f"Stream {label} is not sorted by key (or contains duplicate keys).")
+            previous_key, is_first = key, False
+            yield key, item
+
+    iterator_a = checked(keyed_items_a, "A")
+    iterator_b = checked(keyed_items_b, "B")
+    head_a = next(iterator_a, None)
+    head_b = next(iterator_b, None)
+    while head_a is not None or head_b is not None:
+        if head_b is None or (head_a is not None and head_a[0] < head_b[0]):
+            yield head_a[1], None
+            head_a = next(iterator_a, None)
+        elif head_a is None or head_b[0] < head_a[0]:
+            yield None, head_b[1]
+            head_b = next(iterator_b, None)
+        else:
+            yield head_a[1], head_b[1]
+            head_a = next(iterator_a, None)
+            head_b = next(iterator_b, None)
+
+
+def decode_raw_bson_document(value: Any) -> Any:
+    r"""
+    Returns the value decoded into a `dict` if it is a `RawBSONDocument`; otherwise returns it as is.
+
+    >>> decode_raw_bson_document(RawBSONDocument(bson.encode({"a": {"b": 1}})))
+    {'a': {'b': 1}}
+    >>> decode_raw_bson_document("a")
+    'a'
+    """
+
+    if isinstance(value, RawBSONDocument):
+        return bson.decode(value.raw)
+    return value
+
+
+def remove_field_from_raw_bson(raw: bytes, field_name: str) -> bytes:
+    r"""
+    Returns a copy of the BSON-encoded document with the specified top-level field removed,
+    without decoding the document.
+
+    Reference: https://bsonspec.org/spec.html
+
+    >>> raw = bson.encode({"_id": 1, "a": "x", "b": [1.5, None]})
+    >>> bson.decode(remove_field_from_raw_bson(raw, "_id"))
+    {'a': 'x', 'b': [1.5, None]}
+    >>> bson.decode(remove_field_from_raw_bson(raw, "b"))
+    {'_id': 1, 'a': 'x'}
+    >>> remove_field_from_raw_bson(raw, "c") == raw
+    True
+    """
+
+    encoded_field_name = field_name.encode("utf-8") + b"\x00"
+    position = 4  # skip the document's length prefix
+    end = len(raw) - 1  # exclude the document's trailing null byte
+    while position < end:
+        element_start = position
+        element_type = raw[position]
+        name_end = raw.index(b"\x00", position + 1)
+        position = name_end + 1
+        position += _get_raw_bson_value_size(raw, position, element_type)
+        if raw[element_start + 1:name_end + 1] == encoded_field_name:
+            body = raw[4:element_start] + raw[position:]
+            return (4 + len(body)).to_bytes(4, "little") + body
+    return raw
+
+
+# Sizes of BSON values whose sizes do not depend upon their contents (indexed by element type).
+_FIXED_RAW_BSON_VALUE_SIZES = {
+    0x01: 8,  # double
+    0x06: 0,  # undefined
+    0x07: 12,  # ObjectId
+    0x08: 1,  # boolean
+    0x09: 8,  # UTC datetime
+    0x0A: 0,  # null
+    0x10: 4,  # int32
+    0x11: 8,  # timestamp
+    0x12: 8,  # int64
+    0x13: 16,  # decimal128
+    0x7F: 0,  # max key
+    0xFF: 0,  # min key
+}
+
+
+def _get_raw_bson_value_size(raw: bytes, position: int, element_type: int) -> int:
+    r"""Returns the size, in bytes, of the BSON value of the specified type that starts at the specified position."""
+
+    if element_type in _FIXED_RAW_BSON_VALUE_SIZES:
+        return _FIXED_RAW_BSON_VALUE_SIZES[element_type]
+    length = int.from_bytes(raw[position:position + 4], "little", signed=True)
+    if element_type in (0x02, 0x0D, 0x0E):  # string, JavaScript code, symbol
+        return 4 + length
+    if element_type in (0x03, 0x04, 0x0F):  # embedded document, array, JavaScript code with scope
+        return length
+    if element_type == 0x05:  # binary (length, subtype, bytes)
+        return 4 + 1 + length
+    if element_type == 0x0B:  # regular expression (pattern and options, each a null-terminated string)
+        options_start = raw.index(b"\x00", position) + 1
+        return raw.index(b"\x00", options_start) + 1 - position
+    if element_type == 0x0C:  # DBPointer (string and ObjectId)
+        return 4 + length + 12
+    raise ValueError(f"Unsupported BSON element type: {element_type:#04x}")
+
+
+def compute_digest(document: Mapping, ignore_oid: bool = False) -> bytes:
+    r"""
+    Returns a digest of the document's BSON representation. Considers the `_id` field unless you opt
+    out via `ignore_oid`.
+
+    Note: Documents that have the same digest are the same; but documents that have different digests
+          are not necessarily different (e.g. their fields may merely be in a different order).
+
+    >>> compute_digest({"_id": 1, "a": 1}) == compute_digest({"_id": 2, "a": 1})
+    False
+    >>> compute_digest({"_id": 1, "a": 1}, ignore_oid=True) == compute_digest({"_id": 2, "a": 1}, ignore_oid=True)
+    True
+    >>> compute_digest({"a": 1.2}) == compute_digest({"a": 1.7})
+    False
+    """
+
+    if isinstance(document, RawBSONDocument):
+        raw = remove_field_from_raw_bson(document.raw, "_id") if ignore_oid else document.raw
+        return hashlib.blake2b(raw, digest_size=16).digest()
+    if ignore_oid and "_id" in document:
+        document = {field_name: value for (field_name, value) in document.items() if field_name != "_id"}
+    return hashlib.blake2b(bson.encode(document), digest_size=16).digest()
@@ -0,0 +1,91 @@
+r"""Helpers for following the changes made to a collection via its change stream."""
+
+from typing import Any, Tuple
+
+from pymongo.collection import Collection
+from pymongo.change_stream import ChangeStream
+from pymongo.errors import OperationFailure
+
+
+class ChangeStreamGapError(Exception):
+    r"""
+    Raised when the change stream of a collection cannot account for every change made to the collection
+    since a given resume token (e.g. because the oplog no longer contains that resume token).
+    """
+
+
+def open_change_stream(collection: Collection, identifier_field_name: str, resume_token: Any = None) -> ChangeStream:
+    r"""
+    Opens a change stream on the collection (starting after the resume token, if any), whose events
+    include the documents' identifier values wherever MongoDB can provide them.
+
+    Note: Unless the identifier field is `_id` (which MongoDB includes in every event), we ask for the
+          pre-image of each changed document, so that we can tell which identifier value a deleted
+          document had. MongoDB only provides pre-images for collections on which they are enabled.
+          Reference: https://www.mongodb.com/docs/manual/changeStreams/
+    """
+
+    options: dict[str, Any] = dict(full_document="updateLookup", resume_after=resume_token)
+    if identifier_field_name != "_id":
+        options["full_document_before_change"] = "whenAvailable"
+    return collection.watch(**options)
+
+
+def get_current_resume_token(collection: Collection, identifier_field_name: str) -> Any:
+    r"""Returns a resume token that marks the current point in time in the change stream of the collection."""
+    with open_change_stream(collection, identifier_field_name) as change_stream:
+        return change_stream.resume_token
+
+
+def iterate_changed_identifier_values(
+    collection: Collection,
+    identifier_field_name: str,
+    resume_token: Any,
+) -> Tuple[list, Any]:
+    r"""
+    Reads the change stream of the collection, from the resume token up to the present; and returns
+    the identifier values of the documents that changed (including the values they had before changing),
+    along with a resume token that marks the present.
+
+    Raises a `ChangeStreamGapError` if the change stream cannot account for every change; i.e. if the
+    resume token is no longer in the oplog, if the collection was dropped or renamed, or if a document
+    was deleted (or its identifier field was modified) and MongoDB didn't provide its pre-image.
+    """
+
+    identifier_values = []
+    try:
+        with open_change_stream(collection, identifier_field_name, resume_token) as change_stream:
+            while (change := change_stream.try_next()) is not None:
+                operation_type = change["operationType"]
+                if operation_type not in ("insert", "update", "replace", "delete"):
+                    raise ChangeStreamGapError(
+                        f'Collection "{collection.full_name}" had a "{operation_type}" event.'
+                    )
+
+                # Determine the identifier value the document had before the change (if it existed before).
+                document_before = change.get("fullDocumentBeforeChange") or change.get("documentKey") or {}
+                document_after = change.get("fullDocument") or {}
+                if identifier_field_name in document_before:
+                    identifier_values.append(document_before[identifier_field_name])
+                elif operation_type == "update" and identifier_field_name in document_after:
+                    update_description = change.get("updateDescription", {})
+                    for field_name in [*update_description.get("updatedFields", {}),
+                                       *update_description.get("removedFields", [])]:
+                        if field_name == identifier_field_name or field_name.startswith(f"{identifier_field_name}."):
+                            raise ChangeStreamGapError(
+                                f'A document in collection "{collection.full_name}" had its identifier field '
+                                f"modified, and its pre-image is not available."
+                            )
+                elif operation_type != "insert":
+                    raise ChangeStreamGapError(
+                        f'A document in collection "{collection.full_name}" was {operation_type}d, '
+                        f"and its pre-image is not available."
+                    )
+
+                # Determine the identifier value the document has now (if it still exists).
+                if identifier_field_name in document_after:
+                    identifier_values.append(document_after[identifier_field_name])
+
+            return identifier_values, change_stream.resume_token
+    except OperationFailure as error:
+        raise ChangeStreamGapError(f'Cannot read change stream of collection "{collection.full_name}": {error}')
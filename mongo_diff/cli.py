@@ -0,0 +1,829 @@
+r"""The command-line interface of the tool."""
+
+import asyncio
+from contextlib import nullcontext
+import os
+import sys
+from typing import Optional
+
+import typer
+from typing_extensions import Annotated
+from pymongo.collection import Collection
+from pymongo import MongoClient, timeout
+from pymongo.database import Database
+import bson
+from bson import json_util
+from rich.console import Console
+from rich.markup import escape
+
+from mongo_diff.equality import EqualityRules
+from mongo_diff.queries import make_pymongo_projection_for_fields
+from mongo_diff.progress import ThrottledProgress
+from mongo_diff.stats import ComparisonStats
+from mongo_diff.reports import ReportSink, Checkpointer
+from mongo_diff.results import Result
+from mongo_diff.snapshot import FingerprintSnapshot
+from mongo_diff.strategies import Strategy
+from mongo_diff.planning import plan_comparison
+from mongo_diff.comparator import Comparator
+from mongo_diff.async_comparator import compare_collections_asynchronously
+
+app = typer.Typer(
+    help="Compare MongoDB collections.",
+    add_completion=False,  # hides the shell completion options from `--help` output
+)
+
+
+def connect_to_database(
+    console: Console,
+    mongo_uri: str,
+    database_name: str,
+    mongo_clients: dict[str, MongoClient],
+    stats: Optional[ComparisonStats] = None,
+) -> Database:
+    r"""
+    Returns the specified database, after checking that the MongoDB server is accessible and that the database
+    exists on it. Reuses the `MongoClient` (and, so, the connection pool) in `mongo_clients` for the connection
+    string, if any; otherwise, connects to the MongoDB server and adds the new `MongoClient` to `mongo_clients`
+    (registering the `ComparisonStats` instance, if any, as a command listener of it).
+    """
+
+    with (timeout(5)):  # if any message exchange takes > 5 seconds, this will raise an exception
+        mongo_client = mongo_clients.get(mongo_uri)
+        if mongo_client is None:
+            event_listeners = [] if stats is None else [stats]
+            mongo_client = MongoClient(host=mongo_uri, directConnection=True, event_listeners=event_listeners)
+            (host, port_number) = mongo_client.address
+            console.print(f'Connecting to MongoDB server: "{host}:{port_number}"')
+
+            # Check whether we can access the MongoDB server.
+            mongo_client.server_info()  # raises an exception if it fails
+            mongo_clients[mongo_uri] = mongo_client
+
+        # Check whether the database exists on the MongoDB server.
+        if database_name not in mongo_client.list_database_names():
+            raise ValueError(f'Database "{database_name}" not found on the MongoDB server.')
+        return mongo_client[database_name]
+
+
+@app.command("diff-collections")
+def diff_collections(
+        mongo_uri_a: Annotated[Optional[str], typer.Option(
+            envvar="MONGO_URI_A",
+            help="Connection string for accessing the MongoDB server containing collection A.",
+            show_default=False,
+            rich_help_panel="Collection A",
+        )] = None,
+        database_name_a: Annotated[Optional[str], typer.Option(
+            help="Name of the database containing collection A.",
+            show_default=False,
+            rich_help_panel="Collection A",
+        )] = None,
+        collection_name_a: Annotated[Optional[str], typer.Option(
+            help="Name of collection A.",
+            show_default=False,
+            rich_help_panel="Collection A",
+        )] = None,
+        identifier_field_name_a: Annotated[str, typer.Option(
+            help="Name of the field of each document in collection A "
+                 "to use to identify a corresponding document in collection B. "
+                 "The values in this field must be unique within each collection.",
+            rich_help_panel="Collection A",
+        )] = "id",
+        snapshot_a: Annotated[Optional[str], typer.Option(
+            help="Path to a snapshot (see the `snapshot` command) to use instead of collection A. "
+                 "The snapshot specifies the identifier field name, so the other collection A options are unused.",
+            show_default=False,
+            rich_help_panel="Collection A",
+        )] = None,
+        mongo_uri_b: Annotated[Optional[str], typer.Option(
+            envvar="MONGO_URI_B",
+            help="Connection string for accessing the MongoDB server containing collection B "
+                 "(if different from that specified for collection A).",
+            show_default=False,
+            rich_help_panel="Collection B",
+        )] = None,
+        database_name_b: Annotated[Optional[str], typer.Option(
+            help="Name of the database containing collection B "
+                 "(if different from that specified for collection A).",
+            show_default=False,
+            rich_help_panel="Collection B",
+        )] = None,
+        collection_name_b: Annotated[Optional[str], typer.Option(
+            help="Name of collection B "
+                 "(if different from that specified for collection A).",
+            show_default=False,
+            rich_help_panel="Collection B",
+        )] = None,
+        identifier_field_name_b: Annotated[Optional[str], typer.Option(
+            help="Name of the field of each document in collection B "
+                 "to use to identify a corresponding document in collection A "
+                 "(if different from that specified for collection A). "
+                 "The values in this field must be unique within each collection.",
+            show_default=False,
+            rich_help_panel="Collection B",
+        )] = None,
+        snapshot_b: Annotated[Optional[str], typer.Option(
+            help="Path to a snapshot (see the `snapshot` command) to use instead of collection B. "
+                 "The snapshot specifies the identifier field name, so the other collection B options are unused.",
+            show_default=False,
+            rich_help_panel="Collection B",
+        )] = None,
+        include_oid: Annotated[bool, typer.Option(
+            "--include-oid",
+            "--include-id",  # support this legacy flag (a misnomer) for backwards compatibility
+            help="Include the `_id` field when comparing documents (`--include-id` is deprecated).",
+        )] = False,
+        strict_number_types: Annotated[bool, typer.Option(
+            "--strict-number-types",
+            help="Consider numbers of different BSON types (e.g. the int32 `1` and the double `1.0`) to be different.",
+        )] = False,
+        field_order_matters: Annotated[bool, typer.Option(
+            "--field-order-matters",
+            help="Consider documents whose fields are in different orders to be different.",
+        )] = False,
+        decimals_by_value: Annotated[bool, typer.Option(
+            "--decimals-by-value",
+            help="Consider decimal128 numbers to be equal to other numbers having the same value (e.g. the "
+                 "decimal128 `1.0` and the int32 `1`), as MongoDB does in queries.",
+        )] = False,
+        strict_booleans: Annotated[bool, typer.Option(
+            "--strict-booleans",
+            help="Consider `true` and `false` to be different from the numbers `1` and `0`.",
+        )] = False,
+        strict_nan: Annotated[bool, typer.Option(
+            "--strict-nan",
+            help='Consider a "not a number" value to be different from another one.',
+        )] = False,
+        exact_doubles: Annotated[bool, typer.Option(
+            "--exact-doubles",
+            help="Consider doubles to be different from numbers whose values differ from theirs at all, rather than "
+                 "only by more than the machine epsilon (relative to their magnitude).",
+        )] = False,
+        filter_json: Annotated[Optional[str], typer.Option(
+            "--filter",
+            help="A query filter, in (Extended) JSON format, that limits the comparison to the documents in each "
+                 'collection that match it (e.g. \'{"tenant": "acme"}\').',
+            show_default=False,
+        )] = None,
+        ignored_field_names: Annotated[Optional[list[str]], typer.Option(
+            "--ignore-field",
+            help="Name (or dotted path) of a field to ignore when comparing documents. "
+                 "The servers omit this field from the documents they return. Can be specified multiple times.",
+            show_default=False,
+        )] = None,
+        only_field_names: Annotated[Optional[list[str]], typer.Option(
+            "--only-field",
+            help="Name (or dotted path) of a field to compare, ignoring all others (except the identifier field "
+                 "and, if included, the `_id` field). The servers omit all other fields from the documents they "
+                 "return. Can be specified multiple times.",
+            show_default=False,
+        )] = None,
+        strategy: Annotated[Optional[Strategy], typer.Option(
+            help="Strategy to use to pair up documents from the two collections. "
+                 "If omitted, the tool uses `merge` when both collections can be read in identifier order via "
+                 "indexes, `batch` when collection B can be looked up via an index on its identifier field, "
+                 "and `hash` otherwise.",
+            show_default=False,
+        )] = None,
+        raw_bson: Annotated[bool, typer.Option(
+            "--raw-bson",
+            help="Read documents as raw BSON, and only decode the ones whose BSON representations differ.",
+        )] = False,
+        memory_limit: Annotated[int, typer.Option(
+            help="Approximate number of megabytes of document digests to keep in memory (when using the `sort` "
+                 "strategy) before writing them, sorted, to temporary files on disk.",
+            min=1,
+        )] = 256,
+        use_async: Annotated[bool, typer.Option(
+            "--async",
+            help="Read from both collections at the same time, via an asyncio-based comparator "
+                 "(uses the `merge` strategy).",
+        )] = False,
+        report_file: Annotated[Optional[str], typer.Option(
+            help="Path to a file to which to save the report as it is produced (instead of keeping it in memory), "
+                 "in BSON format if the path ends with `.bson`, and JSON Lines format otherwise. "
+                 "You can display the report later via the `render-report` command.",
+            show_default=False,
+        )] = None,
+        workers: Annotated[int, typer.Option(
+            help="Number of worker processes to use. Each one compares a different range of identifier values.",
+            min=1,
+        )] = 1,
+        batch_size: Annotated[int, typer.Option(
+            help="Number of documents whose counterparts to look up at a time "
+                 "(when using the `batch` or `fingerprint` strategy), "
+                 "or to read ahead from each collection (when using `--async`).",
+            min=1,
+        )] = 1000,
+        checkpoint_file: Annotated[Optional[str], typer.Option(
+            help="Path to a file to which to periodically save the progress of the comparison, "
+                 "so you can resume it via `--resume` if it gets interrupted (uses the `merge` strategy).",
+            show_default=False,
+            rich_help_panel="Checkpoints",
+        )] = None,
+        checkpoint_interval: Annotated[float, typer.Option(
+            help="Minimum number of seconds between checkpoints.",
+            min=0,
+            rich_help_panel="Checkpoints",
+        )] = 60.0,
+        resume: Annotated[Optional[str], typer.Option(
+            help="Path to a checkpoint file from which to resume an interrupted comparison "
+                 "(the comparison will continue saving checkpoints to that file, unless you specify another one "
+                 "via `--checkpoint-file`).",
+            show_default=False,
+            rich_help_panel="Checkpoints",
+        )] = None,
+        incremental_state: Annotated[Optional[str], typer.Option(
+            help="Path to a file in which to save change stream resume tokens and the identifier values of the "
+                 "documents that differ, so that the next comparison using that file only re-compares those "
+                 "documents and the ones that have changed (requires a replica set).",
+            show_default=False,
+        )] = None,
+        sample_size: Annotated[Optional[int], typer.Option(
+            "--sample",
+            help="Instead of comparing the collections in full, compare this many documents chosen at random from "
+                 "each collection, and estimate how many documents differ (etc.) in the collections as a whole.",
+            min=1,
+            show_default=False,
+            rich_help_panel="Sampling",
+        )] = None,
+        sample_rate: Annotated[Optional[float], typer.Option(
+            help="Like `--sample`, but compare this fraction of the documents in each collection (e.g. 0.001), "
+                 "chosen at random.",
+            min=0,
+            max=1,
+            show_default=False,
+            rich_help_panel="Sampling",
+        )] = None,
+        max_diffs: Annotated[Optional[int], typer.Option(
+            help="Maximum number of differing documents whose diffs to generate. The tool only records (and "
+                 "displays) the identifier values of the remaining differing documents.",
+            min=0,
+            show_default=False,
+        )] = None,
+        quiet: Annotated[bool, typer.Option(
+            "--quiet",
+            "-q",
+            help="Only display the summary table. Unless you save the report to a file, the tool doesn't "
+                 "generate any diffs (since nothing would display them).",
+        )] = False,
+        show_stats: Annotated[bool, typer.Option(
+            "--stats",
+            help="Count the round trips to the servers and the bytes exchanged with them (per command type and per "
+                 "server), time each phase of the comparison, and display those statistics (in JSON format) after "
+                 "the summary table.",
+        )] = False,
+) -> None:
+    r"""
+    Compare two MongoDB collections.
+
+    Those collections can reside in either a single database or two separate databases (even across servers).
+    """
+
+    # Instantiate a Rich console for fancy console output (which, in quiet mode, stays quiet until the summary).
+    # Reference: https://rich.readthedocs.io/en/stable/console.html
+    console = Console(quiet=quiet)
+    if quiet and report_file is None:
+        max_diffs = 0
+
+    # If the user wants statistics, collect them (including about the commands we send while validating options).
+    stats = ComparisonStats() if show_stats else None
+    if stats is not None and workers > 1:
+        raise ValueError("The `--stats` and `--workers` options cannot be used together.")
+
+    # If the user specified a snapshot to use instead of either collection, open it (and use its identifier field).
+    if snapshot_a is not None and snapshot_b is not None:
+        raise ValueError("The `--snapshot-a` and `--snapshot-b` options cannot be used together.")
+    snapshot = None
+    if snapshot_a is not None:
+        snapshot = FingerprintSnapshot(snapshot_a)
+        identifier_field_name_a = snapshot.identifier_field_name
+    elif snapshot_b is not None:
+        snapshot = FingerprintSnapshot(snapshot_b)
+        identifier_field_name_b = snapshot.identifier_field_name
+
+    # For any collection B-related options that were omitted, use the values that were specified for collection A.
+    database_name_b = database_name_a if database_name_b is None else database_name_b
+    collection_name_b = collection_name_a if collection_name_b is None else collection_name_b
+    identifier_field_name_b = identifier_field_name_a if identifier_field_name_b is None else identifier_field_name_b
+    if mongo_uri_b is None:
+        mongo_uri_b = mongo_uri_a
+
+    # Validate the MongoDB connection strings, database names, and collection names.
+    collections: list[Optional[Collection]] = []
+    mongo_clients: dict[str, MongoClient] = {}
+    for (label, snapshot_path, mongo_uri, database_name, collection_name) in [
+        ("A", snapshot_a, mongo_uri_a, database_name_a, collection_name_a),
+        ("B", snapshot_b, mongo_uri_b, database_name_b, collection_name_b),
+    ]:
+        if snapshot_path is not None:
+            collections.append(None)
+            continue
+        if mongo_uri is None or database_name is None or collection_name is None:
+            raise ValueError(f"Collection {label} requires a connection string, a database name, and a collection "
+                             f"name (or use `--snapshot-{label.lower()}` to use a snapshot instead).")
+        database = connect_to_database(console, mongo_uri, database_name, mongo_clients, stats)
+        with (timeout(5)):  # if any message exchange takes > 5 seconds, this will raise an exception
+
+            # Check whether the collection exists in the database.
+            if collection_name not in database.list_collection_names():
+                raise ValueError(f'Collection "{collection_name}" not found in database "{database_name}".')
+
+            # Store a reference to the collection.
+            collection = database[collection_name]
+            collections.append(collection)
+
+    # Make more intuitive aliases for the collections.
+    collection_a = collections[0]
+    collection_b = collections[1]
+
+    # If the user specified a filter, parse it (so we can apply it to both collections).
+    pymongo_filter = None
+    if filter_json is not None:
+        pymongo_filter = json_util.loads(filter_json)
+        if not isinstance(pymongo_filter, dict):
+            raise ValueError(f"The filter must be a JSON object. Filter: {filter_json}")
+
+    # If the user wants to compare samples of the collections, check that they didn't ask for a full comparison mode.
+    is_sampling = sample_size is not None or sample_rate is not None
+    if is_sampling:
+        if sample_size is not None and sample_rate is not None:
+            raise ValueError("The `--sample` and `--sample-rate` options cannot be used together.")
+        if sample_rate == 0:
+            raise ValueError("The sample rate must be greater than 0.")
+        if (use_async or workers > 1 or resume is not None or checkpoint_file is not None
+                or incremental_state is not None):
+            raise ValueError("The sampling options cannot be used with the `--async`, `--workers`, checkpoint, "
+                             "or `--incremental-state` options.")
+
+    # If the user wants to compare a collection with a snapshot, check that they didn't ask for another comparison mode.
+    if snapshot is not None:
+        if (is_sampling or use_async or workers > 1 or resume is not None or checkpoint_file is not None
+                or incremental_state is not None or strategy is not None):
+            raise ValueError("The snapshot options cannot be used with the sampling, `--async`, `--workers`, "
+                             "checkpoint, `--incremental-state`, or strategy options.")
+
+    # If the user wants to save (or resume from) checkpoints, use the merge strategy, since it processes documents in
+    # identifier order; which allows us to resume the comparison from the last identifier value processed.
+    checkpointer = None
+    if resume is not None or checkpoint_file is not None:
+        if use_async or workers > 1:
+            raise ValueError("Checkpoints cannot be used with the `--async` or `--workers` options.")
+        if strategy not in (None, Strategy.MERGE):
+            raise ValueError("Checkpoints require the `merge` strategy.")
+        strategy = Strategy.MERGE
+        checkpointer = Checkpointer(
+            write_path=resume if checkpoint_file is None else checkpoint_file,
+            interval=checkpoint_interval,
+            read_path=resume,
+        )
+
+    # The asyncio-based comparator always reads both collections in identifier order (i.e. uses the merge strategy).
+    if use_async and strategy not in (None, Strategy.MERGE):
+        raise ValueError("The `--async` option cannot be used with another strategy than `merge`.")
+
+    # Plan the comparison (choosing a strategy, unless the user specified one) and display the plan.
+    if is_sampling:
+        if sample_size is not None:
+            console.print(f"Sampling: {sample_size:,} documents from each collection", highlight=False)
+        else:
+            console.print(f"Sampling: {sample_rate:.4%} of documents from each collection", highlight=False)
+    elif snapshot is not None:
+        created_at = "unknown" if snapshot.created_at is None else f"{snapshot.created_at:%Y-%m-%d %H:%M:%S} UTC"
+        console.print(f"Snapshot {'A' if snapshot_a is not None else 'B'}: {escape(snapshot.namespace)} "
+                      f"({len(snapshot):,} documents, taken {created_at})",
+                      highlight=False)
+    elif use_async:
+        console.print("Strategy: merge (reading both collections at the same time, via `--async`)", highlight=False)
+    else:
+        with nullcontext() if stats is None else stats.time_phase("planning"):
+            plan = plan_comparison(
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                filter_a=pymongo_filter,
+                filter_b=pymongo_filter,
+                batch_size=batch_size,
+                strategy=strategy,
+            )
+        strategy = plan.strategy
+        console.print(f"Strategy: {strategy.value} ({escape(plan.reason)})", highlight=False)
+        console.print(f"Estimated cost: ~{plan.num_documents_examined:,} documents examined, "
+                      f"~{plan.num_queries:,} queries", highlight=False)
+        if plan.is_quadratic:
+            console.print("[yellow]Warning: This strategy's cost grows quadratically with the number of documents. "
+                          "Consider indexing the identifier field, or using the `hash` strategy.[/yellow]")
+
+    # If the user specified a report file, stream the records of the result to it (instead of keeping them in memory).
+    # If we are resuming a comparison, append to the report file it was writing (discarding anything written to it
+    # after the checkpoint).
+    report_sink = None
+    if report_file is not None:
+        if checkpointer is not None and checkpointer.state is not None:
+            if "report_file_size" not in checkpointer.state:
+                raise ValueError("The checkpoint was saved by a comparison that did not use a report file.")
+            report_sink = ReportSink.for_path(report_file, resume_at=checkpointer.state["report_file_size"])
+        else:
+            report_sink = ReportSink.for_path(report_file)
+            report_sink.write_header(identifier_field_name_a, identifier_field_name_b)
+
+    try:
+        # Compare the collections with one another.
+        equality_rules = EqualityRules(
+            compare_numbers_by_value=not strict_number_types,
+            compare_decimals_by_value=decimals_by_value,
+            bool_equals_number=not strict_booleans,
+            nan_equals_nan=not strict_nan,
+            ignore_field_order=not field_order_matters,
+            double_tolerance=0 if exact_doubles else sys.float_info.epsilon,
+        )
+        comparator = Comparator(console=None if quiet else console, equality_rules=equality_rules,
+                                max_diffs=max_diffs, stats=stats)
+        options = dict(
+            identifier_field_name_a=identifier_field_name_a,
+            identifier_field_name_b=identifier_field_name_b,
+            ignore_oid=not include_oid,
+            strategy=strategy,
+            batch_size=batch_size,
+            use_raw_bson=raw_bson,
+            memory_limit=memory_limit * 1024 * 1024,
+            filter_a=pymongo_filter,
+            filter_b=pymongo_filter,
+            only_field_names=only_field_names,
+            ignored_field_names=ignored_field_names,
+            report_sink=report_sink,
+        )
+        if checkpointer is not None:
+            options["checkpointer"] = checkpointer
+        if snapshot is not None:
+            report = comparator.compare_collection_with_snapshot(
+                collection_a=collection_a,
+                collection_b=collection_b,
+                snapshot=snapshot,
+                **options,
+            )
+        elif is_sampling:
+            report = comparator.compare_collection_samples(
+                collection_a=collection_a,
+                collection_b=collection_b,
+                sample_size=sample_size,
+                sample_rate=sample_rate,
+                **options,
+            )
+        elif incremental_state is not None:
+            if use_async or workers > 1 or checkpointer is not None:
+                raise ValueError("The `--incremental-state` option cannot be used with the `--async`, `--workers`, "
+                                 "or checkpoint options.")
+            report = comparator.compare_collections_incrementally(
+                collection_a=collection_a,
+                collection_b=collection_b,
+                state_path=incremental_state,
+                **options,
+            )
+        elif use_async:
+            if workers > 1:
+                raise ValueError("The `--async` and `--workers` options cannot be used together.")
+            report = asyncio.run(compare_collections_asynchronously(
+                console=None if quiet else console,
+                mongo_uri_a=mongo_uri_a,
+                mongo_uri_b=mongo_uri_b,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=not include_oid,
+                prefetch_size=batch_size,
+                use_raw_bson=raw_bson,
+                equality_rules=equality_rules,
+                max_diffs=max_diffs,
+                stats=stats,
+                filter_a=pymongo_filter,
+                filter_b=pymongo_filter,
+                only_field_names=only_field_names,
+                ignored_field_names=ignored_field_names,
+                report_sink=report_sink,
+            ))
+        elif workers > 1:
+            report = comparator.compare_collections_in_parallel(
+                mongo_uri_a=mongo_uri_a,
+                mongo_uri_b=mongo_uri_b,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                num_workers=workers,
+                **options,
+            )
+        else:
+            report = comparator.compare_collections(collection_a=collection_a, collection_b=collection_b, **options)
+
+        if report_sink is not None:
+            report_sink.write_summary(report)
+    finally:
+        if report_sink is not None:
+            report_sink.close()
+        if snapshot is not None:
+            snapshot.close()
+
+    # Display a table summarizing the result.
+    console.quiet = False
+    console.print()
+    console.print(report.get_summary_table())
+    console.print()
+    if stats is not None:
+        console.print("Statistics:")
+        console.print_json(data=stats.get_profile())
+        console.print()
+    if report_sink is not None:
+        console.print(f'Report saved to: "{report_sink.path}"')
+        console.print()
+
+
+@app.command("diff-databases")
+def diff_databases(
+        mongo_uri_a: Annotated[str, typer.Option(
+            envvar="MONGO_URI_A",
+            help="Connection string for accessing the MongoDB server containing database A.",
+            show_default=False,
+            rich_help_panel="Database A",
+        )],
+        database_name_a: Annotated[str, typer.Option(
+            help="Name of database A.",
+            show_default=False,
+            rich_help_panel="Database A",
+        )],
+        identifier_field_name_a: Annotated[str, typer.Option(
+            help="Name of the field of each document in each collection in database A "
+                 "to use to identify a corresponding document in the same-named collection in database B. "
+                 "The values in this field must be unique within each collection.",
+            rich_help_panel="Database A",
+        )] = "_id",
+        mongo_uri_b: Annotated[Optional[str], typer.Option(
+            envvar="MONGO_URI_B",
+            help="Connection string for accessing the MongoDB server containing database B "
+                 "(if different from that specified for database A).",
+            show_default=False,
+            rich_help_panel="Database B",
+        )] = None,
+        database_name_b: Annotated[Optional[str], typer.Option(
+            help="Name of database B (if different from that specified for database A).",
+            show_default=False,
+            rich_help_panel="Database B",
+        )] = None,
+        identifier_field_name_b: Annotated[Optional[str], typer.Option(
+            help="Name of the field of each document in each collection in database B "
+                 "to use to identify a corresponding document in the same-named collection in database A "
+                 "(if different from that specified for database A).",
+            show_default=False,
+            rich_help_panel="Database B",
+        )] = None,
+        collection_names: Annotated[Optional[list[str]], typer.Option(
+            "--collection",
+            help="Name of a collection to compare (instead of all of them). Can be specified multiple times.",
+            show_default=False,
+        )] = None,
+        include_oid: Annotated[bool, typer.Option(
+            "--include-oid",
+            help="Include the `_id` field when comparing documents.",
+        )] = False,
+        strict_number_types: Annotated[bool, typer.Option(
+            "--strict-number-types",
+            help="Consider numbers of different BSON types (e.g. the int32 `1` and the double `1.0`) to be different.",
+        )] = False,
+        field_order_matters: Annotated[bool, typer.Option(
+            "--field-order-matters",
+            help="Consider documents whose fields are in different orders to be different.",
+        )] = False,
+        decimals_by_value: Annotated[bool, typer.Option(
+            "--decimals-by-value",
+            help="Consider decimal128 numbers to be equal to other numbers having the same value (e.g. the "
+                 "decimal128 `1.0` and the int32 `1`), as MongoDB does in queries.",
+        )] = False,
+        strict_booleans: Annotated[bool, typer.Option(
+            "--strict-booleans",
+            help="Consider `true` and `false` to be different from the numbers `1` and `0`.",
+        )] = False,
+        strict_nan: Annotated[bool, typer.Option(
+            "--strict-nan",
+            help='Consider a "not a number" value to be different from another one.',
+        )] = False,
+        exact_doubles: Annotated[bool, typer.Option(
+            "--exact-doubles",
+            help="Consider doubles to be different from numbers whose values differ from theirs at all, rather than "
+                 "only by more than the machine epsilon (relative to their magnitude).",
+        )] = False,
+        ignored_field_names: Annotated[Optional[list[str]], typer.Option(
+            "--ignore-field",
+            help="Name (or dotted path) of a field to ignore when comparing documents. "
+                 "Can be specified multiple times.",
+            show_default=False,
+        )] = None,
+        strategy: Annotated[Optional[Strategy], typer.Option(
+            help="Strategy to use to pair up documents from each pair of collections. "
+                 "If omitted, the tool chooses one for each pair of collections (see `diff-collections`).",
+            show_default=False,
+        )] = None,
+        raw_bson: Annotated[bool, typer.Option(
+            "--raw-bson",
+            help="Read documents as raw BSON, and only decode the ones whose BSON representations differ.",
+        )] = False,
+        concurrency: Annotated[int, typer.Option(
+            help="Maximum number of pairs of collections to compare at a time (largest collections first).",
+            min=1,
+        )] = 4,
+        batch_size: Annotated[int, typer.Option(
+            help="Number of documents whose counterparts to look up at a time (see `diff-collections`).",
+            min=1,
+        )] = 1000,
+        report_directory: Annotated[Optional[str], typer.Option(
+            help="Path to a directory in which to save a report file for each pair of collections "
+                 "(named after the collection, in JSON Lines format), which you can display via `render-report`. "
+                 "Otherwise, the tool does not generate any diffs.",
+            show_default=False,
+        )] = None,
+) -> None:
+    r"""
+    Compare each collection in one MongoDB database with the same-named collection in another one.
+
+    Those databases can reside on either a single server or two separate servers.
+    """
+
+    console = Console()
+
+    # For any database B-related options that were omitted, use the values that were specified for database A.
+    database_name_b = database_name_a if database_name_b is None else database_name_b
+    identifier_field_name_b = identifier_field_name_a if identifier_field_name_b is None else identifier_field_name_b
+    if mongo_uri_b is None:
+        mongo_uri_b = mongo_uri_a
+
+    # Validate the MongoDB connection strings and database names (connecting to each server only once).
+    mongo_clients: dict[str, MongoClient] = {}
+    database_a = connect_to_database(console, mongo_uri_a, database_name_a, mongo_clients)
+    database_b = connect_to_database(console, mongo_uri_b, database_name_b, mongo_clients)
+    if report_directory is not None:
+        os.makedirs(report_directory, exist_ok=True)
+
+    # Compare the databases with one another (only generating diffs if something will display them).
+    comparator = Comparator(
+        console=console,
+        equality_rules=EqualityRules(
+            compare_numbers_by_value=not strict_number_types,
+            compare_decimals_by_value=decimals_by_value,
+            bool_equals_number=not strict_booleans,
+            nan_equals_nan=not strict_nan,
+            ignore_field_order=not field_order_matters,
+            double_tolerance=0 if exact_doubles else sys.float_info.epsilon,
+        ),
+        max_diffs=None if report_directory is not None else 0,
+    )
+    database_result = comparator.compare_databases(
+        database_a=database_a,
+        database_b=database_b,
+        identifier_field_name_a=identifier_field_name_a,
+        identifier_field_name_b=identifier_field_name_b,
+        ignore_oid=not include_oid,
+        collection_names=collection_names,
+        max_concurrency=concurrency,
+        report_directory=report_directory,
+        strategy=strategy,
+        batch_size=batch_size,
+        use_raw_bson=raw_bson,
+        ignored_field_names=ignored_field_names,
+    )
+
+    # Display a table summarizing the result.
+    console.print()
+    console.print(database_result.get_summary_table())
+    console.print()
+    if report_directory is not None:
+        console.print(f'Reports saved to: "{report_directory}"')
+        console.print()
+    if database_result.errors_by_collection_name:
+        raise typer.Exit(code=1)
+
+
+@app.command("snapshot")
+def snapshot(
+        mongo_uri: Annotated[str, typer.Option(
+            envvar="MONGO_URI",
+            help="Connection string for accessing the MongoDB server containing the collection.",
+            show_default=False,
+        )],
+        database_name: Annotated[str, typer.Option(
+            help="Name of the database containing the collection.",
+            show_default=False,
+        )],
+        collection_name: Annotated[str, typer.Option(
+            help="Name of the collection.",
+            show_default=False,
+        )],
+        snapshot_file: Annotated[str, typer.Option(
+            help="Path to the file to which to save the snapshot.",
+            show_default=False,
+        )],
+        identifier_field_name: Annotated[str, typer.Option(
+            help="Name of the field of each document to use to identify a corresponding document in the collection "
+                 "you later compare with the snapshot. The values in this field must be unique within the collection.",
+        )] = "id",
+        include_oid: Annotated[bool, typer.Option(
+            "--include-oid",
+            help="Include the `_id` field in the digests (then, also use this option when comparing).",
+        )] = False,
+        filter_json: Annotated[Optional[str], typer.Option(
+            "--filter",
+            help="A query filter, in (Extended) JSON format, that limits the snapshot to the documents that match it "
+                 "(then, also use this filter when comparing).",
+            show_default=False,
+        )] = None,
+        ignored_field_names: Annotated[Optional[list[str]], typer.Option(
+            "--ignore-field",
+            help="Name (or dotted path) of a field to leave out of the digests (then, also ignore it when comparing). "
+                 "Can be specified multiple times.",
+            show_default=False,
+        )] = None,
+        only_field_names: Annotated[Optional[list[str]], typer.Option(
+            "--only-field",
+            help="Name (or dotted path) of a field to include in the digests, leaving out all others (then, also "
+                 "limit the comparison to it). Can be specified multiple times.",
+            show_default=False,
+        )] = None,
+) -> None:
+    r"""
+    Save a snapshot of a MongoDB collection, which you can later compare with a collection via the
+    `--snapshot-a` or `--snapshot-b` option of the `diff-collections` command.
+
+    The snapshot contains the identifier value and a digest of each document (not the documents themselves).
+    """
+
+    console = Console()
+
+    # Validate the MongoDB connection string, database name, and collection name.
+    database = connect_to_database(console, mongo_uri, database_name, {})
+    with (timeout(5)):  # if any message exchange takes > 5 seconds, this will raise an exception
+        if collection_name not in database.list_collection_names():
+            raise ValueError(f'Collection "{collection_name}" not found in database "{database_name}".')
+    collection = database[collection_name]
+
+    # If the user specified a filter, parse it.
+    pymongo_filter = None
+    if filter_json is not None:
+        pymongo_filter = json_util.loads(filter_json)
+        if not isinstance(pymongo_filter, dict):
+            raise ValueError(f"The filter must be a JSON object. Filter: {filter_json}")
+
+    # Write the snapshot.
+    console.print()
+    with ThrottledProgress(console=console) as progress:
+        num_documents = FingerprintSnapshot.write(
+            path=snapshot_file,
+            collection=collection,
+            identifier_field_name=identifier_field_name,
+            ignore_oid=not include_oid,
+            filter=pymongo_filter,
+            projection=make_pymongo_projection_for_fields(identifier_field_name, only_field_names,
+                                                          ignored_field_names),
+            progress=progress,
+        )
+    console.print()
+    console.print(f'Snapshot of {num_documents:,} documents saved to: "{snapshot_file}"')
+    console.print()
+
+
+@app.command("render-report")
+def render_report(
+        report_file: Annotated[str, typer.Argument(
+            help="Path to a report file created via the `--report-file` option of `diff-collections`.",
+            show_default=False,
+        )],
+) -> None:
+    r"""
+    Display a report that was saved to a file, without connecting to any MongoDB servers.
+    """
+
+    console = Console()
+    comparator = Comparator(console=console)
+
+    identifier_field_name_a = identifier_field_name_b = "id"
+    summary_record = None
+    for record in ReportSink.read_records(report_file):
+        kind = record["kind"]
+        if kind == ReportSink.RECORD_KIND_HEADER:
+            identifier_field_name_a = record["identifier_field_name_a"]
+            identifier_field_name_b = record["identifier_field_name_b"]
+        elif kind == ReportSink.RECORD_KIND_SUMMARY:
+            summary_record = record
+        else:
+            comparator.display_record(kind, identifier_field_name_a, identifier_field_name_b,
+                                      record["identifier"], record.get("diff_lines"))
+    comparator.flush_output()
+
+    # Display a table summarizing the result (if the report is complete).
+    if summary_record is None:
+        raise ValueError(f'Report file "{report_file}" lacks a summary (the comparison may not have finished).')
+    console.print()
+    console.print(Result.from_summary_record(summary_record).get_summary_table())
+    console.print()
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,1356 @@
+r"""The comparator, which compares collections (or databases) with one another."""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+import os
+import tempfile
+import time
+from difflib import unified_diff
+from multiprocessing import get_context
+from types import SimpleNamespace
+from typing import Any, Iterator, Mapping, Optional
+
+from pymongo.collection import Collection
+from pymongo import MongoClient
+from pymongo.database import Database
+import bson
+from bson import json_util
+from bson.raw_bson import RawBSONDocument
+from rich.console import Console, Group, RenderableType
+from rich.text import Text
+
+from mongo_diff.equality import EqualityRules, fields_are_equal
+from mongo_diff.bson_utils import (
+    bson_sort_key,
+    encode_sort_key,
+    encode_identifier,
+    merge_sorted_streams,
+    decode_raw_bson_document,
+    remove_field_from_raw_bson,
+)
+from mongo_diff.queries import (
+    combine_pymongo_filters,
+    iterate_in_chunks,
+    find_documents_by_identifier_values,
+    iterate_sampled_documents,
+    make_pymongo_projection_for_identifier_field,
+    make_pymongo_projection_for_fields,
+    iterate_fingerprints,
+    estimate_number_of_documents,
+    compute_partition_boundaries,
+    make_pymongo_filters_for_partitions,
+)
+from mongo_diff.progress import ThrottledProgress
+from mongo_diff.stats import ComparisonStats
+from mongo_diff.storage import ExternalSorter
+from mongo_diff.reports import (
+    ReportSink,
+    Checkpointer,
+    read_extended_json_file,
+    write_extended_json_file,
+    make_report_file_name,
+)
+from mongo_diff.results import Result, SampleResult, DatabaseResult
+from mongo_diff.snapshot import FingerprintSnapshot
+from mongo_diff.change_streams import ChangeStreamGapError, get_current_resume_token, iterate_changed_identifier_values
+from mongo_diff.strategies import Strategy, StrategyMixin
+from mongo_diff.planning import plan_comparison
+
+
+# A reusable context manager that does nothing (see `Comparator._time_phase`).
+_NULL_CONTEXT = nullcontext()
+
+# The kinds of records, in the order in which `Result.iterate_combined_records` yields them.
+_COMBINED_RECORD_KINDS = [
+    ReportSink.RECORD_KIND_DIFFERING,
+    ReportSink.RECORD_KIND_COLLECTION_A_ONLY,
+    ReportSink.RECORD_KIND_COLLECTION_B_ONLY,
+]
+
+
+class Comparator(StrategyMixin):
+    """Compares MongoDB collections with one another."""
+
+    # The minimum number of seconds between writes of buffered output to the console (see `_display`).
+    OUTPUT_FLUSH_INTERVAL = 0.1
+
+    def __init__(
+        self,
+        console: Console | None = None,
+        equality_rules: Optional[EqualityRules] = None,
+        max_diffs: Optional[int] = None,
+        stats: Optional[ComparisonStats] = None,
+    ) -> None:
+        """
+        Initializes the comparator with the Rich `Console` instance, if any, onto which you want the
+        comparator to print progress messages; with the `EqualityRules`, if any, you want the comparator
+        to use when comparing documents; and with the maximum number of differing documents, if any, whose
+        diffs you want the comparator to generate per comparison. The comparator records the identifiers
+        of the remaining differing documents without generating their diffs (which is relatively costly).
+        If you pass it a `ComparisonStats` instance, the comparator times the phases of its comparisons in it,
+        and attaches it to their results.
+        """
+
+        self.equality_rules = EqualityRules() if equality_rules is None else equality_rules
+        self.max_diffs = max_diffs
+        self.stats = stats
+        self._output_buffer: list[RenderableType] = []
+        self._output_flushed_at = time.monotonic()
+
+        if isinstance(console, Console):
+            self.console = console
+            self.is_displaying = True
+        else:
+            # Use a placeholder class whose `print` method does nothing.
+            # Docs: https://docs.python.org/3/library/types.html#types.SimpleNamespace
+            self.console = SimpleNamespace(print=lambda *args, **kwargs: None)
+            self.is_displaying = False
+
+    @staticmethod
+    def compare_documents(
+        document_a: Mapping,
+        document_b: Mapping,
+        ignore_oid: bool = False,
+        equality_rules: Optional[EqualityRules] = None,
+    ) -> bool:
+        r"""
+        Returns `True` if the documents have the same fields and values as one another (according to
+        the `EqualityRules`, if any; see `values_are_equal`); otherwise `False`. Considers the `_id`
+        field unless you opt out via `ignore_oid`.
+
+        If both documents are `RawBSONDocument` instances, this function first checks whether their
+        BSON representations are identical, in which case it returns `True` without decoding them.
+        Otherwise, it decodes them and compares their fields and values (so, for example, documents
+        whose fields are merely in a different order are still considered to be the same, by default).
+
+        >>> Comparator.compare_documents({"a": 1}, {"a": 1})
+        True
+        >>> Comparator.compare_documents({"_id": 1, "a": 1}, {"_id": 2, "a": 1})
+        False
+        >>> Comparator.compare_documents({"_id": 1, "a": 1}, {"_id": 2, "a": 1}, ignore_oid=True)
+        True
+        >>> raw_a = RawBSONDocument(bson.encode({"_id": 1, "a": 1, "b": 2}))
+        >>> raw_b = RawBSONDocument(bson.encode({"_id": 2, "b": 2, "a": 1}))
+        >>> Comparator.compare_documents(raw_a, raw_b), Comparator.compare_documents(raw_a, raw_b, ignore_oid=True)
+        (False, True)
+        >>> strict_rules = EqualityRules(compare_numbers_by_value=False)
+        >>> Comparator.compare_documents({"a": 1}, {"a": 1.0})
+        True
+        >>> Comparator.compare_documents({"a": 1}, {"a": 1.0}, equality_rules=strict_rules)
+        False
+        """
+
+        if isinstance(document_a, RawBSONDocument) and isinstance(document_b, RawBSONDocument):
+            raw_a, raw_b = document_a.raw, document_b.raw
+            if ignore_oid:
+                raw_a = remove_field_from_raw_bson(raw_a, "_id")
+                raw_b = remove_field_from_raw_bson(raw_b, "_id")
+            if raw_a == raw_b:
+                return True
+        document_a = decode_raw_bson_document(document_a)
+        document_b = decode_raw_bson_document(document_b)
+
+        ignored_field_name = "_id" if ignore_oid else None
+        return fields_are_equal(document_a, document_b, equality_rules, ignored_field_name=ignored_field_name)
+
+    @staticmethod
+    def generate_diff(
+        document_a: dict,
+        document_b: dict,
+        label_a: str,
+        label_b: str,
+        ignore_oid: bool = False,
+    ) -> Iterator[str]:
+        r"""
+        Returns an iterator that yields the lines of a Git-like diff of the documents' canonical
+        JSON representations. Considers the `_id` field unless you opt out via `ignore_oid`.
+
+        Reference: https://pymongo.readthedocs.io/en/stable/api/bson/json_util.html
+
+        >>> document_a = dict(_id=1, id="123", name="adam")
+        >>> document_b = dict(_id=2, id="123", name="betty")
+        >>> document_c = dict(_id=1, id="123", name="betty")
+        >>> for line in list(Comparator.generate_diff(document_a, document_b, "left", "right")):
+        ...     print(line)
+        --- left
+        +++ right
+        @@ -1,7 +1,7 @@
+         {
+           "_id": {
+        -    "$numberInt": "1"
+        +    "$numberInt": "2"
+           },
+           "id": "123",
+        -  "name": "adam"
+        +  "name": "betty"
+         }
+        >>> for line in list(Comparator.generate_diff(document_a, document_b, "left", "right", ignore_oid=True)):
+        ...     print(line)
+        --- left
+        +++ right
+        @@ -1,4 +1,4 @@
+         {
+           "id": "123",
+        -  "name": "adam"
+        +  "name": "betty"
+         }
+        >>> for line in list(Comparator.generate_diff(document_b, document_c, "left", "right")):
+        ...     print(line)
+        --- left
+        +++ right
+        @@ -1,6 +1,6 @@
+         {
+           "_id": {
+        -    "$numberInt": "2"
+        +    "$numberInt": "1"
+           },
+           "id": "123",
+           "name": "betty"
+        >>> list(Comparator.generate_diff(document_b, document_c, "left", "right", ignore_oid=True))
+        []
+        """
+
+        candidate_a = document_a.copy()
+        candidate_b = document_b.copy()
+        if ignore_oid:
+            candidate_a.pop("_id", None)
+            candidate_b.pop("_id", None)
+
+        a_json = json_util.dumps(
+            candidate_a,
+            json_options=json_util.CANONICAL_JSON_OPTIONS,
+            indent=2,
+            sort_keys=True,
+        )
+        b_json = json_util.dumps(
+            candidate_b,
+            json_options=json_util.CANONICAL_JSON_OPTIONS,
+            indent=2,
+            sort_keys=True,
+        )
+        diff_lines = unified_diff(
+            a_json.splitlines(),
+            b_json.splitlines(),
+            fromfile=label_a,
+            tofile=label_b,
+            lineterm="",
+        )
+        return diff_lines
+
+    def compare_collections(
+        self,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        strategy: Optional["Strategy"] = None,
+        batch_size: int = 1000,
+        max_identifiers_in_memory: int = 1_000_000,
+        memory_limit: int = 256 * 1024 * 1024,
+        use_raw_bson: bool = False,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        only_field_names: Optional[list[str]] = None,
+        ignored_field_names: Optional[list[str]] = None,
+        report_sink: Optional[ReportSink] = None,
+        checkpointer: Optional[Checkpointer] = None,
+    ) -> Result:
+        """
+        Compares one MongoDB collection with another one.
+
+        Identifies documents that (based on their identifier field) exist in one collection and not
+        in the other collection. Also identifies differences that exist between documents that
+        (based on their identifier field) exist in both collections, but do not match one another.
+
+        :param collection_a: One collection.
+        :param collection_b: The other collection.
+        :param identifier_field_name_a: The name of the field of each document in collection A to
+                                        use to identify a corresponding document in collection B.
+        :param identifier_field_name_b: The name of the field of each document in collection B to
+                                        use to identify a corresponding document in collection A.
+        :param ignore_oid: Whether to ignore the `_id` field when comparing documents.
+        :param strategy: The strategy to use to pair up documents from the two collections
+                         (see `Strategy`). Defaults to `Strategy.LOOKUP`.
+        :param batch_size: The number of documents whose counterparts to look up at a time, when
+                           using `Strategy.BATCH` or `Strategy.FINGERPRINT`.
+        :param max_identifiers_in_memory: The number of identifier values to keep in memory (when using
+                                          `Strategy.LOOKUP`, `Strategy.BATCH`, or `Strategy.HASH`) before
+                                          spilling them to a temporary file on disk.
+        :param memory_limit: The (approximate) number of bytes of digests to keep in memory (when using
+                             `Strategy.SORT`) before writing them, sorted, to temporary files on disk.
+        :param use_raw_bson: Whether to read documents as `RawBSONDocument` instances, so that documents
+                             whose BSON representations are identical can be recognized as such without
+                             decoding them (see `compare_documents`).
+        :param filter_a: A pymongo filter that limits the comparison to the documents in collection A
+                         that match it.
+        :param filter_b: A pymongo filter that limits the comparison to the documents in collection B
+                         that match it.
+        :param only_field_names: The names (or dotted paths) of the only fields to compare (besides the
+                                 identifier field and—unless ignored—the `_id` field).
+        :param ignored_field_names: The names (or dotted paths) of fields to ignore when comparing documents.
+        :param report_sink: A `ReportSink` to which the result will stream its records, instead of
+                            keeping them in memory.
+        :param checkpointer: A `Checkpointer` to use to periodically save the progress of the comparison
+                             (and, if it has a saved state, to resume the comparison from there).
+                             Requires `Strategy.MERGE`.
+
+        Note: The fields limits are applied by the server (see `make_pymongo_projection_for_fields`), so
+              the fields that aren't compared don't cross the network, and every subsequent step (e.g.
+              `compare_documents` and `generate_diff`) sees the same, projected, documents.
+
+        :returns: A `Result` instance containing the result of the comparison.
+        """
+
+        strategy = Strategy.LOOKUP if strategy is None else Strategy(strategy)
+        if checkpointer is not None and strategy != Strategy.MERGE:
+            raise ValueError("Checkpoints require the `merge` strategy, which processes documents in identifier order.")
+        if use_raw_bson:
+            collection_a = collection_a.with_options(
+                codec_options=collection_a.codec_options.with_options(document_class=RawBSONDocument),
+            )
+            collection_b = collection_b.with_options(
+                codec_options=collection_b.codec_options.with_options(document_class=RawBSONDocument),
+            )
+
+        # Initialize the report we will return.
+        filter_a = {} if filter_a is None else filter_a
+        filter_b = {} if filter_b is None else filter_b
+        projection_a = make_pymongo_projection_for_fields(
+            identifier_field_name_a, only_field_names, ignored_field_names,
+        )
+        projection_b = make_pymongo_projection_for_fields(
+            identifier_field_name_b, only_field_names, ignored_field_names,
+        )
+        #
+        # Note: Until we've processed every document, the report contains estimates of the numbers of documents
+        #       (see `estimate_number_of_documents`), which the progress bars use as their totals.
+        #
+        with self._time_phase("counting documents"):
+            num_documents_in_collection_a = estimate_number_of_documents(collection_a, filter_a)
+            num_documents_in_collection_b = estimate_number_of_documents(collection_b, filter_b)
+        report = Result(num_documents_in_collection_a, num_documents_in_collection_b, sink=report_sink)
+        report.stats = self.stats
+
+        # Set up the progress bar functionality.
+        self.console.print()
+        with self._create_progress() as progress, self._time_phase("comparing collections"):
+            try:
+                (num_documents_a, num_documents_b) = self._dispatch_comparison(
+                    strategy=strategy,
+                    report=report,
+                    progress=progress,
+                    collection_a=collection_a,
+                    collection_b=collection_b,
+                    identifier_field_name_a=identifier_field_name_a,
+                    identifier_field_name_b=identifier_field_name_b,
+                    ignore_oid=ignore_oid,
+                    batch_size=batch_size,
+                    max_identifiers_in_memory=max_identifiers_in_memory,
+                    memory_limit=memory_limit,
+                    filter_a=filter_a,
+                    filter_b=filter_b,
+                    projection_a=projection_a,
+                    projection_b=projection_b,
+                    checkpointer=checkpointer,
+                )
+            finally:
+                self.flush_output()
+
+        # Now that we've processed every document, replace the estimates with the actual numbers of documents.
+        report.num_documents_in_collection_a = num_documents_a
+        report.num_documents_in_collection_b = num_documents_b
+
+        return report
+
+    def compare_collections_in_parallel(
+        self,
+        mongo_uri_a: str,
+        mongo_uri_b: str,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        num_workers: int,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        report_sink: Optional[ReportSink] = None,
+        memory_limit: int = 256 * 1024 * 1024,
+        **options: Any,
+    ) -> Result:
+        r"""
+        Compares one MongoDB collection with another one, by splitting the identifier values into
+        ranges and comparing each range in a separate worker process (each of which connects to the
+        MongoDB server(s) on its own).
+
+        The ranges are chosen so that they contain roughly the same number of documents from
+        collection A (see `compute_partition_boundaries`). Each worker process streams the records of
+        its range to a temporary "spill" file. Once every range has been compared, the records in those
+        files are sorted (see `ExternalSorter`), combined and displayed, ordered as `Result.combine`
+        orders them; so the output is the same regardless of the number of worker processes, and
+        neither this process nor the worker processes hold every record in memory at once.
+
+        :param mongo_uri_a: Connection string for accessing the MongoDB server containing collection A.
+        :param mongo_uri_b: Connection string for accessing the MongoDB server containing collection B.
+        :param num_workers: The number of worker processes to use (and of ranges to compare).
+        :param report_sink: A `ReportSink` to which the combined result will stream its records, instead
+                            of keeping them in memory.
+        :param memory_limit: The (approximate) number of bytes of records to keep in memory while sorting
+                             them (which is also passed to `compare_collections`).
+
+        The remaining parameters are the same as those of `compare_collections`, to which any additional
+        keyword arguments (e.g. `strategy`) are passed.
+
+        :returns: A `Result` instance containing the result of the comparison.
+        """
+
+        boundaries = compute_partition_boundaries(collection_a, identifier_field_name_a, num_workers, filter_a)
+        partition_filters_a = make_pymongo_filters_for_partitions(identifier_field_name_a, boundaries)
+        partition_filters_b = make_pymongo_filters_for_partitions(identifier_field_name_b, boundaries)
+        spill_directory = tempfile.TemporaryDirectory(prefix="mongo-diff-")
+        jobs = [
+            dict(
+                spill_path=os.path.join(spill_directory.name, f"partition-{partition_index}.bson"),
+                mongo_uri_a=mongo_uri_a,
+                database_name_a=collection_a.database.name,
+                collection_name_a=collection_a.name,
+                mongo_uri_b=mongo_uri_b,
+                database_name_b=collection_b.database.name,
+                collection_name_b=collection_b.name,
+                equality_rules=self.equality_rules,
+                max_diffs=self.max_diffs,
+                options=dict(
+                    identifier_field_name_a=identifier_field_name_a,
+                    identifier_field_name_b=identifier_field_name_b,
+                    ignore_oid=ignore_oid,
+                    filter_a=combine_pymongo_filters(filter_a, partition_filter_a),
+                    filter_b=combine_pymongo_filters(filter_b, partition_filter_b),
+                    memory_limit=memory_limit,
+                    **options,
+                ),
+            )
+            for (partition_index, (partition_filter_a, partition_filter_b)) in enumerate(
+                zip(partition_filters_a, partition_filters_b)
+            )
+        ]
+
+        # Compare the partitions in worker processes.
+        #
+        # Note: We use the "spawn" start method so that the worker processes do not inherit (via "fork") the
+        #       `MongoClient` instances of this process, which PyMongo does not support.
+        #       Reference: https://pymongo.readthedocs.io/en/stable/faq.html#using-pymongo-with-multiprocessing
+        #
+        self.console.print()
+        self.console.print(f"Comparing collections in {len(jobs)} partition(s), using {num_workers} worker(s).")
+        with spill_directory, ExternalSorter(memory_limit) as sorter:
+            with self._create_progress() as progress:
+                task = progress.add_task("Comparing partitions of collections", total=len(jobs))
+                with ProcessPoolExecutor(max_workers=num_workers, mp_context=get_context("spawn")) as executor:
+                    futures = [executor.submit(_compare_collection_partition, job) for job in jobs]
+                    for _ in as_completed(futures):
+                        progress.update(task, advance=1)
+                    partial_reports = [future.result() for future in futures]
+
+            # Sort the records in the spill files the way `Result.iterate_combined_records` orders them: by kind
+            # (differing documents first), then by identifier value.
+            for job in jobs:
+                for record in ReportSink.read_records(job["spill_path"]):
+                    kind_index = _COMBINED_RECORD_KINDS.index(record["kind"])
+                    sorter.add(bytes([kind_index]) + encode_sort_key(record["identifier"]), bson.encode(record))
+
+            # Combine the partial results and display them.
+            #
+            # Note: Each worker generates up to `max_diffs` diffs, so we drop the diffs beyond that number here.
+            #
+            report = Result(
+                num_documents_in_collection_a=sum(partial_report.num_documents_in_collection_a
+                                                  for partial_report in partial_reports),
+                num_documents_in_collection_b=sum(partial_report.num_documents_in_collection_b
+                                                  for partial_report in partial_reports),
+                sink=report_sink,
+            )
+            num_diffs = 0
+            for (_, encoded_record) in sorter:
+                record = bson.decode(encoded_record)
+                (kind, identifier_value, diff_lines) = (record["kind"], record["identifier"], record.get("diff_lines"))
+                if diff_lines is not None:
+                    if self.max_diffs is not None and num_diffs >= self.max_diffs:
+                        diff_lines = None
+                    else:
+                        num_diffs += 1
+                report.add_record(kind, identifier_value, record.get("oid"), diff_lines)
+                self.display_record(kind, identifier_field_name_a, identifier_field_name_b, identifier_value,
+                                    diff_lines)
+            self.flush_output()
+
+        return report
+
+    def compare_collections_incrementally(
+        self,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        state_path: str,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        only_field_names: Optional[list[str]] = None,
+        ignored_field_names: Optional[list[str]] = None,
+        report_sink: Optional[ReportSink] = None,
+        batch_size: int = 1000,
+        **options: Any,
+    ) -> Result:
+        r"""
+        Compares one MongoDB collection with another one, re-comparing only the documents that have
+        changed since the previous comparison.
+
+        The first time, this compares the collections in full (via `compare_collections`) and saves a
+        change stream resume token for each collection—along with the identifier values of the documents
+        that differ (or exist in one collection only)—to the state file. On later runs, this reads each
+        collection's change stream from its resume token, and re-compares only the documents whose identifier
+        values appear in the changes or in the state file (i.e. that differed the previous time); so the
+        result includes every document that differs now, and the state file only grows with the number of
+        differences. In that case, the numbers of documents in the result are those reported by
+        `estimate_number_of_documents`, since this doesn't read every document.
+
+        If a change stream cannot account for every change (see `iterate_changed_identifier_values`),
+        this falls back to comparing the collections in full.
+
+        Either way, if there is a `report_sink`, the result streams its records to that sink; and this reads
+        the identifier values for the state file back from the sink's file, rather than keeping the records.
+
+        Note: Change streams require a replica set (or sharded cluster); a single-node replica set suffices.
+              Reference: https://www.mongodb.com/docs/manual/changeStreams/
+
+        :param state_path: Path to the file containing the state of the previous comparison (if it exists),
+                           to which this saves the state of this comparison.
+        :param batch_size: The number of changed documents to look up at a time (and, for a full
+                           comparison, the value to pass to `compare_collections`).
+
+        The remaining parameters are the same as those of `compare_collections`, to which any additional
+        keyword arguments (e.g. `strategy`) are passed.
+
+        :returns: A `Result` instance containing the result of the comparison.
+        """
+
+        filter_a = {} if filter_a is None else filter_a
+        filter_b = {} if filter_b is None else filter_b
+        projection_a = make_pymongo_projection_for_fields(
+            identifier_field_name_a, only_field_names, ignored_field_names,
+        )
+        projection_b = make_pymongo_projection_for_fields(
+            identifier_field_name_b, only_field_names, ignored_field_names,
+        )
+
+        # Describe the comparison, so we can tell whether the saved state belongs to it.
+        state_context = dict(
+            collection_a=collection_a.full_name,
+            collection_b=collection_b.full_name,
+            identifier_field_name_a=identifier_field_name_a,
+            identifier_field_name_b=identifier_field_name_b,
+            ignore_oid=ignore_oid,
+            filter_a=filter_a,
+            filter_b=filter_b,
+            projection_a=projection_a,
+            projection_b=projection_b,
+        )
+
+        # If there is a saved state, gather the identifier values of the documents that have changed since then,
+        # along with those of the documents that differed then.
+        previous_state = read_extended_json_file(state_path) if os.path.exists(state_path) else None
+        identifier_values_to_compare: dict[bytes, Any] = {}
+        if previous_state is not None:
+            for (name, value) in state_context.items():
+                if previous_state.get(name) != value:
+                    raise ValueError(
+                        f"State file does not match this comparison (its `{name}` is {previous_state.get(name)!r})."
+                    )
+            try:
+                (identifier_values_a, resume_token_a) = iterate_changed_identifier_values(
+                    collection_a, identifier_field_name_a, previous_state["resume_token_a"],
+                )
+                (identifier_values_b, resume_token_b) = iterate_changed_identifier_values(
+                    collection_b, identifier_field_name_b, previous_state["resume_token_b"],
+                )
+            except ChangeStreamGapError as error:
+                self.console.print(f"Comparing collections in full, because: {error}", highlight=False)
+                previous_state = None
+            else:
+                for identifier_value in [*identifier_values_a, *identifier_values_b]:
+                    identifier_values_to_compare[encode_identifier(identifier_value)] = identifier_value
+                num_changed_documents = len(identifier_values_to_compare)
+                for identifier_value in previous_state["differing_identifiers"]:
+                    identifier_values_to_compare[encode_identifier(identifier_value)] = identifier_value
+
+        # Compare either those documents, or—if there is no (usable) saved state—all of them; streaming the records
+        # to the sink (if any) as we go, and noting where they start in its file (so we can read them back later).
+        records_offset = None if report_sink is None else report_sink.size
+        if previous_state is None:
+            # Note: We get the resume tokens before comparing the collections, so that the next comparison
+            #       re-compares any documents that change while this one is in progress.
+            resume_token_a = get_current_resume_token(collection_a, identifier_field_name_a)
+            resume_token_b = get_current_resume_token(collection_b, identifier_field_name_b)
+            result = self.compare_collections(
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                only_field_names=only_field_names,
+                ignored_field_names=ignored_field_names,
+                report_sink=report_sink,
+                batch_size=batch_size,
+                **options,
+            )
+        else:
+            self.console.print()
+            self.console.print(f"Re-comparing {num_changed_documents} document(s) changed since the previous "
+                               f"comparison, and {len(previous_state['differing_identifiers'])} document(s) that "
+                               f"differed then.")
+            result = Result(
+                num_documents_in_collection_a=estimate_number_of_documents(collection_a, filter_a),
+                num_documents_in_collection_b=estimate_number_of_documents(collection_b, filter_b),
+                sink=report_sink,
+            )
+            result.stats = self.stats
+            sorted_identifier_values = sorted(identifier_values_to_compare.values(), key=bson_sort_key)
+            for identifier_values in iterate_in_chunks(sorted_identifier_values, batch_size):
+                documents_a = find_documents_by_identifier_values(
+                    collection_a, identifier_field_name_a, identifier_values, projection_a, filter_a,
+                )
+                documents_b = find_documents_by_identifier_values(
+                    collection_b, identifier_field_name_b, identifier_values, projection_b, filter_b,
+                )
+                for identifier_value in identifier_values:
+                    document_a = documents_a.get(bson_sort_key(identifier_value))
+                    document_b = documents_b.get(bson_sort_key(identifier_value))
+                    if document_a is not None and document_b is not None:
+                        self._process_document_pair(
+                            report=result,
+                            document_a=document_a,
+                            document_b=document_b,
+                            identifier_field_name_a=identifier_field_name_a,
+                            identifier_field_name_b=identifier_field_name_b,
+                            ignore_oid=ignore_oid,
+                        )
+                    elif document_a is not None:
+                        self._process_document_in_collection_a_only(result, identifier_field_name_a, identifier_value)
+                    elif document_b is not None:
+                        self._process_document_in_collection_b_only(result, identifier_field_name_b, identifier_value)
+            self.flush_output()
+
+        # Save the state for the next comparison.
+        if report_sink is None:
+            differing_identifiers = [record[1] for record in Result.iterate_combined_records([result])]
+        else:
+            report_sink.file.flush()
+            differing_identifiers = [
+                record["identifier"] for record in ReportSink.read_records(report_sink.path, records_offset)
+                if record["kind"] != ReportSink.RECORD_KIND_HEADER and record["kind"] != ReportSink.RECORD_KIND_SUMMARY
+            ]
+        write_extended_json_file(state_path, dict(
+            state_context,
+            resume_token_a=resume_token_a,
+            resume_token_b=resume_token_b,
+            differing_identifiers=sorted(differing_identifiers, key=bson_sort_key),
+        ))
+        return result
+
+    def compare_databases(
+        self,
+        database_a: Database,
+        database_b: Database,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        collection_names: Optional[list[str]] = None,
+        max_concurrency: int = 4,
+        report_directory: Optional[str] = None,
+        **options: Any,
+    ) -> DatabaseResult:
+        r"""
+        Compares each collection in database A with the collection having the same name in database B.
+
+        Compares up to `max_concurrency` pairs of collections at a time, each in a separate thread (via its own
+        `Comparator`, which doesn't display anything). The threads share the databases' `MongoClient` instances
+        and, so, their connection pools. It starts with the largest collections (according to their metadata),
+        so that a large collection doesn't start last and prolong the whole comparison. For each pair of
+        collections, unless the caller specifies a strategy, it uses the one `plan_comparison` chooses.
+
+        :param database_a: One database.
+        :param database_b: The other database.
+        :param identifier_field_name_a: The name of the identifier field of the documents in each collection
+                                        in database A (see `compare_collections`).
+        :param identifier_field_name_b: The name of the identifier field of the documents in each collection
+                                        in database B.
+        :param ignore_oid: Whether to ignore the `_id` field when comparing documents.
+        :param collection_names: The names of the collections to compare. Defaults to those of all collections
+                                 (but not views or system collections) in either database.
+        :param max_concurrency: The maximum number of pairs of collections to compare at a time.
+        :param report_directory: Path to a directory in which to save a report file for each pair of collections
+                                 (named after the collection), instead of keeping the records in memory.
+
+        The remaining keyword arguments (e.g. `strategy`) are passed to `compare_collections`.
+
+        :returns: A `DatabaseResult` instance containing the result of the comparison.
+        """
+
+        # Determine which collections exist in which database.
+        collection_names_a = {
+            name for name in database_a.list_collection_names(filter={"type": "collection"})
+            if not name.startswith("system.")
+        }
+        collection_names_b = {
+            name for name in database_b.list_collection_names(filter={"type": "collection"})
+            if not name.startswith("system.")
+        }
+        if collection_names is not None:
+            collection_names_a &= set(collection_names)
+            collection_names_b &= set(collection_names)
+        database_result = DatabaseResult()
+        database_result.collection_names_in_database_a_only = sorted(collection_names_a - collection_names_b)
+        database_result.collection_names_in_database_b_only = sorted(collection_names_b - collection_names_a)
+
+        # Schedule the largest collections first.
+        collection_sizes = {
+            collection_name: max(database_a[collection_name].estimated_document_count(),
+                                 database_b[collection_name].estimated_document_count())
+            for collection_name in collection_names_a & collection_names_b
+        }
+        scheduled_collection_names = sorted(collection_sizes, key=lambda name: (-collection_sizes[name], name))
+
+        self.console.print()
+        self.console.print(f"Comparing {len(scheduled_collection_names)} collection(s), "
+                           f"up to {max_concurrency} at a time.")
+        with self._create_progress() as progress:
+            task = progress.add_task("Comparing collections", total=len(scheduled_collection_names))
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                futures = {
+                    executor.submit(
+                        self._compare_collections_in_databases,
+                        collection_a=database_a[collection_name],
+                        collection_b=database_b[collection_name],
+                        identifier_field_name_a=identifier_field_name_a,
+                        identifier_field_name_b=identifier_field_name_b,
+                        ignore_oid=ignore_oid,
+                        report_path=(None if report_directory is None
+                                     else os.path.join(report_directory, make_report_file_name(collection_name))),
+                        **options,
+                    ): collection_name
+                    for collection_name in scheduled_collection_names
+                }
+                for future in as_completed(futures):
+                    collection_name = futures[future]
+                    try:
+                        database_result.results_by_collection_name[collection_name] = future.result()
+                    except Exception as error:  # report the error, but finish comparing the other collections
+                        database_result.errors_by_collection_name[collection_name] = str(error)
+                    progress.update(task, advance=1)
+
+        return database_result
+
+    def _compare_collections_in_databases(
+        self,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        report_path: Optional[str] = None,
+        strategy: Optional["Strategy"] = None,
+        batch_size: int = 1000,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        **options: Any,
+    ) -> Result:
+        r"""
+        Compares a pair of collections on behalf of `compare_databases` (in a worker thread), saving the
+        report to the specified path (if any).
+        """
+
+        plan = plan_comparison(
+            collection_a=collection_a,
+            collection_b=collection_b,
+            identifier_field_name_a=identifier_field_name_a,
+            identifier_field_name_b=identifier_field_name_b,
+            filter_a=filter_a,
+            filter_b=filter_b,
+            batch_size=batch_size,
+            strategy=strategy,
+        )
+        comparator = Comparator(equality_rules=self.equality_rules, max_diffs=self.max_diffs)
+        report_sink = None if report_path is None else ReportSink.for_path(report_path)
+        try:
+            if report_sink is not None:
+                report_sink.write_header(identifier_field_name_a, identifier_field_name_b)
+            result = comparator.compare_collections(
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                strategy=plan.strategy,
+                batch_size=batch_size,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                report_sink=report_sink,
+                **options,
+            )
+            if report_sink is not None:
+                report_sink.write_summary(result)
+        finally:
+            if report_sink is not None:
+                report_sink.close()
+        return result
+
+    def compare_collection_samples(
+        self,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        sample_size: Optional[int] = None,
+        sample_rate: Optional[float] = None,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        only_field_names: Optional[list[str]] = None,
+        ignored_field_names: Optional[list[str]] = None,
+        report_sink: Optional[ReportSink] = None,
+        batch_size: int = 1000,
+        confidence: float = 0.95,
+        **options: Any,
+    ) -> SampleResult:
+        r"""
+        Compares a sample of the documents in collection A with their counterparts in collection B, and checks
+        whether the documents in a sample of collection B have counterparts in collection A; then estimates
+        how many documents are in either collection only, or differ, in the collections as a whole.
+
+        Since this only reads the sampled documents (and their counterparts), how long it takes depends on the
+        sample size rather than on the sizes of the collections (given that the identifier fields are indexed).
+
+        :param sample_size: The number of documents to sample from each collection, which the servers choose
+                            at random (see `iterate_sampled_documents`).
+        :param sample_rate: The fraction of documents to sample from each collection (i.e. an alternative to
+                            `sample_size`, from which this derives each collection's sample size).
+        :param batch_size: The number of sampled documents whose counterparts to look up at a time.
+        :param confidence: The confidence level of the intervals in the result (see `SampleResult`).
+
+        The remaining parameters are the same as those of `compare_collections`. Any additional keyword
+        arguments (e.g. `strategy`) are ignored, since this always looks up the counterparts of the
+        sampled documents.
+
+        :returns: A `SampleResult` instance containing the result of the comparison.
+        """
+
+        if (sample_size is None) == (sample_rate is None):
+            raise ValueError("Either a sample size or a sample rate (but not both) must be specified.")
+        if sample_rate is not None and not 0 < sample_rate <= 1:
+            raise ValueError(f"The sample rate must be greater than 0 and at most 1. Sample rate: {sample_rate}")
+        filter_a = {} if filter_a is None else filter_a
+        filter_b = {} if filter_b is None else filter_b
+        projection_a = make_pymongo_projection_for_fields(
+            identifier_field_name_a, only_field_names, ignored_field_names,
+        )
+        projection_b = make_pymongo_projection_for_fields(
+            identifier_field_name_b, only_field_names, ignored_field_names,
+        )
+        with self._time_phase("counting documents"):
+            report = SampleResult(
+                num_documents_in_collection_a=estimate_number_of_documents(collection_a, filter_a),
+                num_documents_in_collection_b=estimate_number_of_documents(collection_b, filter_b),
+                sink=report_sink,
+                confidence=confidence,
+            )
+        report.stats = self.stats
+        if sample_rate is not None:
+            sample_size_a = max(1, round(sample_rate * report.num_documents_in_collection_a))
+            sample_size_b = max(1, round(sample_rate * report.num_documents_in_collection_b))
+        else:
+            sample_size_a = sample_size_b = sample_size
+
+        self.console.print()
+        with self._create_progress() as progress, self._time_phase("comparing collections"):
+            try:
+                # Compare the sampled documents from collection A with their counterparts (if any) in collection B.
+                task_a = progress.add_task(
+                    "Comparing sampled documents of collection A",
+                    total=min(sample_size_a, report.num_documents_in_collection_a),
+                )
+                sampled_documents_a = iterate_sampled_documents(
+                    collection_a, identifier_field_name_a, sample_size_a, filter_a, projection_a,
+                )
+                for documents_a in iterate_in_chunks(sampled_documents_a, batch_size):
+                    identifier_values = [
+                        self.get_identifier_value(document_a, identifier_field_name_a, "A")
+                        for document_a in documents_a
+                    ]
+                    documents_b = find_documents_by_identifier_values(
+                        collection_b, identifier_field_name_b, identifier_values, projection_b, filter_b,
+                    )
+                    for (identifier_value, document_a) in zip(identifier_values, documents_a):
+                        document_b = documents_b.get(bson_sort_key(identifier_value))
+                        if document_b is None:
+                            self._process_document_in_collection_a_only(report, identifier_field_name_a,
+                                                                        identifier_value)
+                        else:
+                            self._process_document_pair(
+                                report=report,
+                                document_a=document_a,
+                                document_b=document_b,
+                                identifier_field_name_a=identifier_field_name_a,
+                                identifier_field_name_b=identifier_field_name_b,
+                                ignore_oid=ignore_oid,
+                            )
+                    report.num_sampled_documents_in_collection_a += len(documents_a)
+                    progress.update(task_a, advance=len(documents_a))
+
+                # Check whether the sampled documents from collection B have counterparts in collection A.
+                task_b = progress.add_task(
+                    "Checking sampled documents of collection B",
+                    total=min(sample_size_b, report.num_documents_in_collection_b),
+                )
+                sampled_documents_b = iterate_sampled_documents(
+                    collection_b, identifier_field_name_b, sample_size_b, filter_b,
+                    make_pymongo_projection_for_identifier_field(identifier_field_name_b),
+                )
+                for documents_b in iterate_in_chunks(sampled_documents_b, batch_size):
+                    identifier_values = [
+                        self.get_identifier_value(document_b, identifier_field_name_b, "B")
+                        for document_b in documents_b
+                    ]
+                    documents_a = find_documents_by_identifier_values(
+                        collection_a, identifier_field_name_a, identifier_values,
+                        make_pymongo_projection_for_identifier_field(identifier_field_name_a), filter_a,
+                    )
+                    for identifier_value in identifier_values:
+                        if bson_sort_key(identifier_value) not in documents_a:
+                            self._process_document_in_collection_b_only(report, identifier_field_name_b,
+                                                                        identifier_value)
+                    report.num_sampled_documents_in_collection_b += len(documents_b)
+                    progress.update(task_b, advance=len(documents_b))
+            finally:
+                self.flush_output()
+
+        return report
+
+    def compare_collection_with_snapshot(
+        self,
+        collection_a: Optional[Collection],
+        collection_b: Optional[Collection],
+        snapshot: "FingerprintSnapshot",
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        batch_size: int = 1000,
+        filter_a: Optional[dict] = None,
+        filter_b: Optional[dict] = None,
+        only_field_names: Optional[list[str]] = None,
+        ignored_field_names: Optional[list[str]] = None,
+        report_sink: Optional[ReportSink] = None,
+        **options: Any,
+    ) -> Result:
+        r"""
+        Compares a collection with a snapshot of a collection (see `FingerprintSnapshot`), which takes the
+        place of either collection A or collection B (whichever is `None`).
+
+        Merges the fingerprints in the snapshot with those of the documents in the collection—computed the
+        same way the snapshot's were—and only fetches the documents whose digests differ again.
+        Since the snapshot doesn't contain the documents themselves, the diff of each differing document only
+        shows the document in the collection; and the documents are compared based on their digests alone
+        (e.g. a document whose fields are merely in a different order is considered to differ).
+
+        :param snapshot: The snapshot. It must have been taken with the same `ignore_oid` setting, filter,
+                         and field limits as this comparison uses (see `FingerprintSnapshot.check_compatibility`).
+        :param batch_size: The number of differing documents to fetch from the collection at a time.
+
+        The remaining parameters are the same as those of `compare_collections`. Any additional keyword
+        arguments (e.g. `strategy`) are ignored, since this always merges fingerprints.
+
+        :returns: A `Result` instance containing the result of the comparison.
+        """
+
+        if (collection_a is None) == (collection_b is None):
+            raise ValueError("The snapshot must take the place of exactly one of the collections.")
+        if collection_a is None:
+            (snapshot_label, collection_label) = ("A", "B")
+            (collection, identifier_field_name, filter) = (collection_b, identifier_field_name_b, filter_b)
+            snapshot_filter = filter_a
+        else:
+            (snapshot_label, collection_label) = ("B", "A")
+            (collection, identifier_field_name, filter) = (collection_a, identifier_field_name_a, filter_a)
+            snapshot_filter = filter_b
+        assert collection is not None
+        filter = {} if filter is None else filter
+        projection = make_pymongo_projection_for_fields(identifier_field_name, only_field_names, ignored_field_names)
+        snapshot.check_compatibility(
+            ignore_oid=ignore_oid,
+            filter=snapshot_filter,
+            projection=make_pymongo_projection_for_fields(
+                snapshot.identifier_field_name, only_field_names, ignored_field_names,
+            ),
+        )
+
+        with self._time_phase("counting documents"):
+            num_documents_in_collection = estimate_number_of_documents(collection, filter)
+        if snapshot_label == "A":
+            report = Result(len(snapshot), num_documents_in_collection, sink=report_sink)
+        else:
+            report = Result(num_documents_in_collection, len(snapshot), sink=report_sink)
+        report.stats = self.stats
+
+        self.console.print()
+        with self._create_progress() as progress, self._time_phase("comparing collections"):
+            try:
+                task_snapshot = progress.add_task(f"Comparing with snapshot (snapshot {snapshot_label})",
+                                                  total=len(snapshot))
+                task_collection = progress.add_task(f"Comparing with snapshot (collection {collection_label})",
+                                                    total=num_documents_in_collection)
+                keyed_snapshot_fingerprints = (
+                    (bson_sort_key(fingerprint["identifier"]), fingerprint) for fingerprint in snapshot
+                )
+                keyed_collection_fingerprints = (
+                    (bson_sort_key(self.get_identifier_value(fingerprint, "identifier", collection_label)),
+                     fingerprint)
+                    for fingerprint in iterate_fingerprints(
+                        collection, identifier_field_name, ignore_oid, filter, projection,
+                    )
+                )
+
+                # Collect the identifier values of documents whose digests differ from those in the snapshot, and
+                # fetch those documents a batch at a time (via a single query per batch).
+                mismatched_identifier_values: list = []
+                num_documents_by_label = {snapshot_label: 0, collection_label: 0}
+
+                def process_mismatched_documents() -> None:
+                    documents_by_key = find_documents_by_identifier_values(
+                        collection, identifier_field_name, mismatched_identifier_values, projection, filter,
+                    )
+                    for document in documents_by_key.values():
+                        self._process_document_differing_from_snapshot(
+                            report=report,
+                            document=document,
+                            snapshot=snapshot,
+                            snapshot_label=snapshot_label,
+                            identifier_field_name_a=identifier_field_name_a,
+                            identifier_field_name_b=identifier_field_name_b,
+                            ignore_oid=ignore_oid,
+                        )
+                    mismatched_identifier_values.clear()
+
+                if snapshot_label == "A":
+                    merged_fingerprints = merge_sorted_streams(keyed_snapshot_fingerprints,
+                                                               keyed_collection_fingerprints)
+                else:
+                    merged_fingerprints = merge_sorted_streams(keyed_collection_fingerprints,
+                                                               keyed_snapshot_fingerprints)
+                for fingerprint_a, fingerprint_b in merged_fingerprints:
+                    if fingerprint_a is not None and fingerprint_b is not None:
+                        if fingerprint_a["digest"] != fingerprint_b["digest"]:
+                            mismatched_identifier_values.append(fingerprint_a["identifier"])
+                            if len(mismatched_identifier_values) >= batch_size:
+                                process_mismatched_documents()
+                    elif fingerprint_a is not None:
+                        self._process_document_in_collection_a_only(report, identifier_field_name_a,
+                                                                     fingerprint_a["identifier"])
+                    else:
+                        self._process_document_in_collection_b_only(report, identifier_field_name_b,
+                                                                     fingerprint_b["identifier"])
+
+                    # Advance the progress bar(s) by 1.
+                    fingerprint_in_snapshot = fingerprint_a if snapshot_label == "A" else fingerprint_b
+                    fingerprint_in_collection = fingerprint_b if snapshot_label == "A" else fingerprint_a
+                    if fingerprint_in_snapshot is not None:
+                        progress.update(task_snapshot, advance=1)
+                        num_documents_by_label[snapshot_label] += 1
+                    if fingerprint_in_collection is not None:
+                        progress.update(task_collection, advance=1)
+                        num_documents_by_label[collection_label] += 1
+
+                process_mismatched_documents()
+            finally:
+                self.flush_output()
+
+        # Now that we've processed every document, replace the estimates with the actual numbers of documents.
+        report.num_documents_in_collection_a = num_documents_by_label["A"]
+        report.num_documents_in_collection_b = num_documents_by_label["B"]
+
+        return report
+
+    @staticmethod
+    def get_identifier_value(document: dict, identifier_field_name: str, collection_label: str) -> Any:
+        r"""
+        Returns the value of the identifier field of the document; or raises a `ValueError` if the
+        document lacks that field.
+
+        >>> Comparator.get_identifier_value({"id": None}, "id", "A") is None
+        True
+        >>> Comparator.get_identifier_value({"_id": 1}, "id", "A")
+        Traceback (most recent call last):
+        ...
+        ValueError: Document from collection A lacks identifier field: 'id'. Document: {'_id': 1}
+        """
+
+        if identifier_field_name not in document:
+            raise ValueError(
+                f"Document from collection {collection_label} lacks identifier field: '{identifier_field_name}'. "
+                f"Document: {document}"
+            )
+        return decode_raw_bson_document(document[identifier_field_name])
+
+    def _process_document_pair(
+        self,
+        report: Result,
+        document_a: dict,
+        document_b: dict,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+    ) -> None:
+        r"""
+        Compares a pair of documents that (based on their identifier field) correspond to one another,
+        and—if they differ—records the difference in the report and displays a diff of them.
+        """
+
+        with self._time_phase("comparing documents"):
+            are_the_same = self.compare_documents(
+                document_a=document_a,
+                document_b=document_b,
+                ignore_oid=ignore_oid,
+                equality_rules=self.equality_rules,
+            )
+        if are_the_same:
+            return
+
+        identifier_value_a = self.get_identifier_value(document_a, identifier_field_name_a, "A")
+        oid_value_a = decode_raw_bson_document(document_a["_id"])
+
+        # If we've already generated as many diffs as we want, only record the identifier value (and `_id` value).
+        if self.max_diffs is not None and report.num_differing_documents >= self.max_diffs:
+            report.add_differing_document(identifier_value_a, oid_value_a, None)
+            self._display_differing_document(identifier_field_name_a, identifier_value_a, None)
+            return
+
+        # Generate a diff of the two documents' canonical JSON representations.
+        with self._time_phase("generating diffs"):
+            document_a = decode_raw_bson_document(document_a)
+            document_b = decode_raw_bson_document(document_b)
+            identifier_value_b = document_b[identifier_field_name_b]
+            diff_lines: Iterator[str] = self.generate_diff(
+                document_a=document_a,
+                document_b=document_b,
+                label_a=f"Collection A: {identifier_field_name_a}={identifier_value_a!r}",
+                label_b=f"Collection B: {identifier_field_name_b}={identifier_value_b!r}",
+                ignore_oid=ignore_oid,
+            )
+            diff_lines_list = list(diff_lines)  # exhausts the iterator
+
+        # Update the report.
+        report.add_differing_document(identifier_value_a, oid_value_a, diff_lines_list)
+
+        # Display a colorized version of the diff.
+        self._display_differing_document(identifier_field_name_a, identifier_value_a, diff_lines_list)
+
+    def _process_document_differing_from_snapshot(
+        self,
+        report: Result,
+        document: dict,
+        snapshot: "FingerprintSnapshot",
+        snapshot_label: str,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+    ) -> None:
+        r"""
+        Records in the report—and displays—that the document (from the collection) differs from its
+        counterpart in the snapshot. Since the snapshot doesn't contain that counterpart, the "diff"
+        consists of the document's canonical JSON representation, as added (if the snapshot is A) or
+        removed (if the snapshot is B) lines.
+        """
+
+        (collection_label, identifier_field_name) = (
+            ("B", identifier_field_name_b) if snapshot_label == "A" else ("A", identifier_field_name_a)
+        )
+        identifier_value = self.get_identifier_value(document, identifier_field_name, collection_label)
+        oid_value = decode_raw_bson_document(document.get("_id"))
+
+        # If we've already generated as many diffs as we want, only record the identifier value (and `_id` value).
+        if self.max_diffs is not None and report.num_differing_documents >= self.max_diffs:
+            report.add_differing_document(identifier_value, oid_value, None)
+            self._display_differing_document(identifier_field_name_a, identifier_value, None)
+            return
+
+        with self._time_phase("generating diffs"):
+            document = decode_raw_bson_document(document).copy()
+            if ignore_oid:
+                document.pop("_id", None)
+            document_json = json_util.dumps(
+                document,
+                json_options=json_util.CANONICAL_JSON_OPTIONS,
+                indent=2,
+                sort_keys=True,
+            )
+        label_snapshot = (f"Snapshot {snapshot_label}: {snapshot.identifier_field_name}={identifier_value!r} "
+                          f"(document not stored in snapshot)")
+        label_collection = f"Collection {collection_label}: {identifier_field_name}={identifier_value!r}"
+        if snapshot_label == "A":
+            (label_a, label_b, sign) = (label_snapshot, label_collection, "+")
+        else:
+            (label_a, label_b, sign) = (label_collection, label_snapshot, "-")
+        diff_lines = [f"--- {label_a}", f"+++ {label_b}"] + [f"{sign}{line}" for line in document_json.splitlines()]
+
+        report.add_differing_document(identifier_value, oid_value, diff_lines)
+        self._display_differing_document(identifier_field_name_a, identifier_value, diff_lines)
+
+    def display_record(
+        self,
+        kind: str,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        identifier_value: Any,
+        diff_lines: Optional[list[str]] = None,
+    ) -> None:
+        r"""
+        Displays a record of the specified kind (one of the `ReportSink.RECORD_KIND_*` values); e.g. one
+        read from a report file. The output is buffered, so call `flush_output` once you're done.
+        """
+
+        if kind == ReportSink.RECORD_KIND_DIFFERING:
+            self._display_differing_document(identifier_field_name_a, identifier_value, diff_lines)
+        elif kind == ReportSink.RECORD_KIND_COLLECTION_A_ONLY:
+            self._display_document_in_collection_a_only(identifier_field_name_a, identifier_value)
+        elif kind == ReportSink.RECORD_KIND_COLLECTION_B_ONLY:
+            self._display_document_in_collection_b_only(identifier_field_name_b, identifier_value)
+
+    def _display_differing_document(
+        self,
+        identifier_field_name_a: str,
+        identifier_value_a: Any,
+        diff_lines: Optional[list[str]],
+    ) -> None:
+        r"""
+        Displays a colorized version of the diff of a pair of documents that differ from one another; or,
+        if the diff was not generated, the identifier value of the documents.
+        """
+
+        if not self.is_displaying:
+            return
+        if diff_lines is None:
+            self._display(Text.assemble(
+                "Document differs between collections (diff not generated): ",
+                (f"{identifier_field_name_a}={identifier_value_a!r}", "yellow"),
+            ))
+            return
+        self._display(
+            Text("Document differs between collections:"),
+            *Result.colorize_diff_lines(diff_lines=diff_lines),
+            Text(""),
+        )
+
+    def _process_document_in_collection_a_only(
+        self,
+        report: Result,
+        identifier_field_name_a: str,
+        identifier_value_a: Any,
+    ) -> None:
+        r"""Records in the report—and displays—that the document exists in collection A only."""
+
+        report.add_document_in_collection_a_only(identifier_value_a)
+        self._display_document_in_collection_a_only(identifier_field_name_a, identifier_value_a)
+
+    def _display_document_in_collection_a_only(self, identifier_field_name_a: str, identifier_value_a: Any) -> None:
+        r"""Displays that the document exists in collection A only."""
+
+        if self.is_displaying:
+            self._display(Text.assemble(
+                "Document exists in collection A only: ",
+                (f"{identifier_field_name_a}={identifier_value_a!r}", "red"),
+            ))
+
+    def _process_document_in_collection_b_only(
+        self,
+        report: Result,
+        identifier_field_name_b: str,
+        identifier_value_b: Any,
+    ) -> None:
+        r"""Records in the report—and displays—that the document exists in collection B only."""
+
+        report.add_document_in_collection_b_only(identifier_value_b)
+        self._display_document_in_collection_b_only(identifier_field_name_b, identifier_value_b)
+
+    def _display_document_in_collection_b_only(self, identifier_field_name_b: str, identifier_value_b: Any) -> None:
+        r"""Displays that the document exists in collection B only."""
+
+        if self.is_displaying:
+            self._display(Text.assemble(
+                "Document exists in collection B only: ",
+                (f"{identifier_field_name_b}={identifier_value_b!r}", "green"),
+            ))
+
+    def _display(self, *renderables: RenderableType) -> None:
+        r"""
+        Adds the renderables (i.e. lines of output) to a buffer, which this writes to the console every
+        `OUTPUT_FLUSH_INTERVAL` seconds (and which callers write to the console via `flush_output` once
+        they're done producing output). Printing each line separately would have Rich re-render the
+        progress bars each time.
+        """
+
+        self._output_buffer.extend(renderables)
+        if time.monotonic() - self._output_flushed_at >= self.OUTPUT_FLUSH_INTERVAL:
+            self.flush_output()
+
+    def flush_output(self) -> None:
+        r"""Writes the buffered output (if any) to the console, via a single `print` call."""
+
+        if self._output_buffer:
+            with self._time_phase("rendering output"):
+                self.console.print(Group(*self._output_buffer))
+            self._output_buffer = []
+        self._output_flushed_at = time.monotonic()
+
+    def _time_phase(self, phase_name: str) -> Any:
+        r"""
+        Returns a context manager that adds the time spent within it to the specified phase of the
+        comparator's statistics (see `ComparisonStats.time_phase`); or one that does nothing, if the
+        comparator isn't collecting statistics.
+        """
+
+        if self.stats is None:
+            return _NULL_CONTEXT
+        return self.stats.time_phase(phase_name)
+
+    def _create_progress(self) -> ThrottledProgress:
+        r"""Returns a progress display that uses the console (or is disabled, if there isn't one)."""
+
+        return ThrottledProgress(
+            console=self.console if self.is_displaying else None,
+            disable=not self.is_displaying,
+        )
+
+
+def _compare_collection_partition(job: dict) -> Result:
+    r"""
+    Compares one partition of the collections described by the job (see
+    `Comparator.compare_collections_in_parallel`), streaming the records to the job's spill file, and
+    returns the result (which only holds counts). This runs in a worker process, so it connects to the
+    MongoDB server(s) on its own and does not display anything.
+    """
+
+    mongo_client_a: MongoClient = MongoClient(host=job["mongo_uri_a"], directConnection=True)
+    mongo_client_b: MongoClient = MongoClient(host=job["mongo_uri_b"], directConnection=True)
+    try:
+        collection_a = mongo_client_a[job["database_name_a"]][job["collection_name_a"]]
+        collection_b = mongo_client_b[job["database_name_b"]][job["collection_name_b"]]
+        comparator = Comparator(equality_rules=job["equality_rules"], max_diffs=job["max_diffs"])
+        with ReportSink.for_path(job["spill_path"]) as spill_sink:
+            result = comparator.compare_collections(collection_a=collection_a, collection_b=collection_b,
+                                                    report_sink=spill_sink, **job["options"])
+        result.sink = None  # the sink can't be sent back to the main process (and is closed, anyway)
+        return result
+    finally:
+        mongo_client_a.close()
+        mongo_client_b.close()
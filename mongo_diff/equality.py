@@ -0,0 +1,224 @@
+r"""Rules for, and functions that check, whether BSON values are equal to one another."""
+
+import datetime
+import math
+import sys
+from decimal import Decimal
+from typing import Any, Mapping, Optional
+
+import bson
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+
+
+class EqualityRules:
+    r"""
+    Rules that determine which BSON values `values_are_equal` considers to be equal to one another
+    (beyond values of the same type that are equal to one another).
+
+    The default rules match the way the tool compared values when it used `dictdiffer`: int32, int64, and
+    double numbers are equal when their values are equal, with doubles being equal to numbers within a
+    relative tolerance of the machine epsilon (as `dictdiffer` compared them via `math.isclose`); decimal128
+    numbers are only equal to decimal128 numbers having the same representation; `true` and `false` are
+    equal to `1` and `0`; "not a number" values are equal to one another; and field order doesn't matter.
+
+    Note: `dictdiffer` also applied that tolerance to pairs of integers (converting them to doubles first, so
+          e.g. the int64 values `2**62` and `2**62 + 1` were equal); we compare integers exactly.
+    """
+
+    def __init__(
+        self,
+        compare_numbers_by_value: bool = True,
+        compare_decimals_by_value: bool = False,
+        bool_equals_number: bool = True,
+        nan_equals_nan: bool = True,
+        ignore_field_order: bool = True,
+        double_tolerance: float = sys.float_info.epsilon,
+    ) -> None:
+        r"""
+        Initializes the rules.
+
+        :param compare_numbers_by_value: Whether numbers of different BSON types (i.e. int32, int64, and
+                                         double) are equal when their values are equal; as opposed to only
+                                         when their types are also the same.
+        :param compare_decimals_by_value: Whether decimal128 numbers are equal to other numbers (subject to
+                                          `compare_numbers_by_value`) and to one another when their values
+                                          are equal (e.g. `Decimal128("1.0")` and `1`, as MongoDB considers
+                                          them to be in queries); as opposed to only when their
+                                          representations are the same.
+        :param bool_equals_number: Whether `true` and `false` are equal to the numbers `1` and `0`.
+        :param nan_equals_nan: Whether a "not a number" value is equal to another one.
+        :param ignore_field_order: Whether documents (including embedded ones) whose fields are in
+                                   different orders can still be equal.
+        :param double_tolerance: The relative tolerance (see `math.isclose`) within which a double is equal
+                                 to another double, int32, or int64 number; `0` means it must be equal exactly.
+        """
+        self.compare_numbers_by_value = compare_numbers_by_value
+        self.compare_decimals_by_value = compare_decimals_by_value
+        self.bool_equals_number = bool_equals_number
+        self.nan_equals_nan = nan_equals_nan
+        self.ignore_field_order = ignore_field_order
+        self.double_tolerance = double_tolerance
+
+
+def values_are_equal(value_a: Any, value_b: Any, equality_rules: Optional[EqualityRules] = None) -> bool:
+    r"""
+    Returns `True` if the (decoded) BSON values are equal to one another, according to the `EqualityRules`
+    (or the default ones); otherwise `False`. Compares documents and arrays recursively, returning as soon
+    as it finds a difference.
+
+    Values of different BSON types are never equal, except for numbers (and booleans and numbers), if the
+    rules say so. Arrays are equal when their elements are equal, in order.
+
+    >>> values_are_equal({"a": [1, {"b": 2.0}], "c": "d"}, {"c": "d", "a": [1.0, {"b": bson.Int64(2)}]})
+    True
+    >>> values_are_equal({"a": 1, "c": "d"}, {"c": "d", "a": 1}, EqualityRules(ignore_field_order=False))
+    False
+    >>> values_are_equal([1, 2], [2, 1]), values_are_equal(True, 1), values_are_equal(float("nan"), float("nan"))
+    (False, True, True)
+    >>> values_are_equal(1, bson.Int64(1), EqualityRules(compare_numbers_by_value=False))
+    False
+    >>> values_are_equal(1.0, 1.0000000000000002), values_are_equal(1.0, 1.0000000000000004)
+    (True, False)
+    >>> values_are_equal(1.0, 1.0000000000000002, EqualityRules(double_tolerance=0))
+    False
+    >>> values_are_equal(Decimal128("1.0"), 1), values_are_equal(Decimal128("1.0"), Decimal128("1"))
+    (False, False)
+    >>> values_are_equal(Decimal128("1.0"), 1, EqualityRules(compare_decimals_by_value=True))
+    True
+    """
+
+    rules = _DEFAULT_EQUALITY_RULES if equality_rules is None else equality_rules
+
+    # Handle the most common case—two values of the same scalar type—before doing any `isinstance` checks.
+    type_a = type(value_a)
+    if type_a is type(value_b):
+        if type_a in _SIMPLE_BSON_TYPES:
+            if value_a == value_b:
+                return True
+            return type_a is float and _doubles_are_equal(value_a, value_b, rules)
+        if type_a is Decimal128 and value_a == value_b:
+            return True
+
+    if isinstance(value_a, Mapping):
+        return isinstance(value_b, Mapping) and fields_are_equal(value_a, value_b, rules)
+
+    if isinstance(value_a, list):
+        if not isinstance(value_b, list) or len(value_a) != len(value_b):
+            return False
+        for (element_a, element_b) in zip(value_a, value_b):
+            if type(element_a) is type(element_b) and type(element_a) in _SIMPLE_BSON_TYPES and element_a == element_b:
+                continue
+            if not values_are_equal(element_a, element_b, rules):
+                return False
+        return True
+
+    is_number_a = isinstance(value_a, (int, float, Decimal128))
+    is_number_b = isinstance(value_b, (int, float, Decimal128))
+    if is_number_a and is_number_b:
+        # Note: `bool` is a subclass of `int` in Python, but booleans are not numbers in BSON.
+        if isinstance(value_a, bool) or isinstance(value_b, bool):
+            if not rules.bool_equals_number:
+                return False
+        elif not rules.compare_numbers_by_value and type_a is not type(value_b):
+            return False
+        if (type_a is Decimal128 or type(value_b) is Decimal128) and not rules.compare_decimals_by_value:
+            return False
+        return _numbers_are_equal(value_a, value_b, rules)
+
+    return type_a is type(value_b) and value_a == value_b
+
+
+def fields_are_equal(
+    document_a: Mapping,
+    document_b: Mapping,
+    equality_rules: Optional[EqualityRules] = None,
+    ignored_field_name: Optional[str] = None,
+) -> bool:
+    r"""
+    Returns `True` if the (decoded) documents have the same fields (other than the ignored one, if any) and
+    those fields have equal values (see `values_are_equal`); otherwise `False`.
+
+    >>> fields_are_equal({"_id": 1, "a": 1}, {"a": 1, "_id": 2}, ignored_field_name="_id")
+    True
+    >>> fields_are_equal({"_id": 1, "a": 1}, {"a": 1}, ignored_field_name="_id")
+    True
+    >>> fields_are_equal({"a": 1}, {"a": 1, "b": 2})
+    False
+    """
+
+    rules = _DEFAULT_EQUALITY_RULES if equality_rules is None else equality_rules
+    num_fields_a = len(document_a) - (ignored_field_name is not None and ignored_field_name in document_a)
+    num_fields_b = len(document_b) - (ignored_field_name is not None and ignored_field_name in document_b)
+    if num_fields_a != num_fields_b:
+        return False
+    if not rules.ignore_field_order:
+        field_names_a = [field_name for field_name in document_a.keys() if field_name != ignored_field_name]
+        field_names_b = [field_name for field_name in document_b.keys() if field_name != ignored_field_name]
+        if field_names_a != field_names_b:
+            return False
+
+    for (field_name, value_a) in document_a.items():
+        if field_name == ignored_field_name:
+            continue
+        try:
+            value_b = document_b[field_name]
+        except KeyError:
+            return False
+
+        # Inline the check for the most common case, to avoid a function call per field (see `values_are_equal`).
+        if type(value_a) is type(value_b) and type(value_a) in _SIMPLE_BSON_TYPES and value_a == value_b:
+            continue
+        if not values_are_equal(value_a, value_b, rules):
+            return False
+    return True
+
+
+def _numbers_are_equal(number_a: Any, number_b: Any, rules: EqualityRules) -> bool:
+    r"""
+    Returns `True` if the numbers (which can be of different types) have the same value, or—when either is
+    a double—are within the rules' relative tolerance of one another; or—if the rules say so—if both are
+    "not a number"; otherwise `False`.
+
+    Note: Python compares `int`, `float`, and `Decimal` values with one another exactly (e.g. `0.1` is not
+          equal to `Decimal("0.1")`, since the former is actually `0.1000000000000000055511151231257827...`).
+    """
+
+    if isinstance(number_a, Decimal128):
+        number_a = number_a.to_decimal()
+    if isinstance(number_b, Decimal128):
+        number_b = number_b.to_decimal()
+    is_nan_a = _is_nan(number_a)
+    is_nan_b = _is_nan(number_b)
+    if is_nan_a or is_nan_b:
+        return is_nan_a and is_nan_b and rules.nan_equals_nan
+    if number_a == number_b:
+        return True
+    is_double_a = isinstance(number_a, float)
+    is_double_b = isinstance(number_b, float)
+    return ((is_double_a or is_double_b) and not isinstance(number_a, Decimal) and not isinstance(number_b, Decimal)
+            and math.isclose(number_a, number_b, rel_tol=rules.double_tolerance))
+
+
+def _doubles_are_equal(double_a: float, double_b: float, rules: EqualityRules) -> bool:
+    r"""
+    Returns `True` if the (unequal, per `==`) doubles are within the rules' relative tolerance of one
+    another; or—if the rules say so—if both are "not a number"; otherwise `False`.
+    """
+
+    if math.isnan(double_a) or math.isnan(double_b):
+        return rules.nan_equals_nan and math.isnan(double_a) and math.isnan(double_b)
+    return math.isclose(double_a, double_b, rel_tol=rules.double_tolerance)
+
+
+def _is_nan(number: Any) -> bool:
+    r"""Returns `True` if the number is a "not a number" `float` or `Decimal`; otherwise `False`."""
+
+    if isinstance(number, float):
+        return math.isnan(number)
+    return isinstance(number, Decimal) and number.is_nan()
+
+
+# The rules `values_are_equal` uses by default; and the types of values it compares via `==` alone, when both have them.
+_DEFAULT_EQUALITY_RULES = EqualityRules()
+_SIMPLE_BSON_TYPES = frozenset({str, int, float, bool, bytes, ObjectId, datetime.datetime, type(None)})
@@ -0,0 +1,214 @@
+r"""Planning of comparisons: choosing a strategy based upon the collections' indexes and estimated costs."""
+
+import math
+from typing import Any, Mapping, Optional, Tuple
+
+from pymongo.collection import Collection
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from mongo_diff.queries import (
+    combine_pymongo_filters,
+    make_pymongo_projection_for_identifier_field,
+    estimate_number_of_documents,
+)
+from mongo_diff.strategies import Strategy
+
+
+class ComparisonPlan:
+    r"""A strategy for comparing two collections, along with the reason it was chosen and its estimated cost."""
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        reason: str,
+        num_documents_examined: int,
+        num_queries: int,
+        is_quadratic: bool = False,
+    ) -> None:
+        r"""
+        Initializes the plan.
+
+        :param strategy: The strategy to use.
+        :param reason: Why that strategy was chosen.
+        :param num_documents_examined: Roughly how many documents (or index keys) the servers will examine.
+        :param num_queries: Roughly how many queries the comparator will send to the servers.
+        :param is_quadratic: Whether each lookup scans a whole collection (so the cost grows quadratically).
+        """
+        self.strategy = strategy
+        self.reason = reason
+        self.num_documents_examined = num_documents_examined
+        self.num_queries = num_queries
+        self.is_quadratic = is_quadratic
+
+
+def estimate_comparison_cost(
+    strategy: Strategy,
+    num_documents_a: int,
+    num_documents_b: int,
+    lookups_use_index: bool,
+    batch_size: int = 1000,
+) -> Tuple[int, int]:
+    r"""
+    Returns rough estimates of the number of documents (or index keys) the servers will examine, and of
+    the number of queries the comparator will send to them, when comparing collections containing the
+    specified numbers of documents via the specified strategy. Disregards the work of fetching documents
+    whose digests differ (for the strategies that do that), since we can't know how many will differ.
+
+    >>> estimate_comparison_cost(Strategy.MERGE, 1000, 1000, lookups_use_index=False)
+    (2000, 2)
+    >>> estimate_comparison_cost(Strategy.LOOKUP, 1000, 1000, lookups_use_index=True)
+    (3000, 1002)
+    >>> estimate_comparison_cost(Strategy.LOOKUP, 1000, 1000, lookups_use_index=False)
+    (1002000, 1002)
+    >>> estimate_comparison_cost(Strategy.BATCH, 1000, 1000, lookups_use_index=False, batch_size=100)
+    (12000, 12)
+    """
+
+    num_scanned = num_documents_a + num_documents_b
+    if strategy == Strategy.LOOKUP:
+        num_examined_per_lookup = 1 if lookups_use_index else num_documents_b
+        return num_scanned + num_documents_a * num_examined_per_lookup, num_documents_a + 2
+    if strategy == Strategy.BATCH:
+        num_batches = math.ceil(num_documents_a / batch_size)
+        num_examined_by_lookups = num_documents_a if lookups_use_index else num_batches * num_documents_b
+        return num_scanned + num_examined_by_lookups, num_batches + 2
+    return num_scanned, 2
+
+
+def get_explained_stages(collection: Collection, filter: dict, sort: Optional[list] = None) -> Optional[list[str]]:
+    r"""
+    Returns the names of the stages (e.g. `IXSCAN`, `COLLSCAN`, `SORT`) of the plan the server would use
+    to run the specified query; or `None` if the server can't explain the query.
+
+    Reference: https://www.mongodb.com/docs/manual/reference/explain-results/
+    """
+
+    try:
+        explanation = collection.find(filter, sort=sort).explain()
+    except OperationFailure:
+        return None
+
+    stage_names = []
+
+    def collect_stage_names(value: Any) -> None:
+        if isinstance(value, Mapping):
+            if isinstance(value.get("stage"), str):
+                stage_names.append(value["stage"])
+            for (field_name, nested_value) in value.items():
+                if field_name not in ("rejectedPlans", "executionStats"):
+                    collect_stage_names(nested_value)
+        elif isinstance(value, list):
+            for nested_value in value:
+                collect_stage_names(nested_value)
+
+    collect_stage_names(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+    return stage_names
+
+
+def query_uses_index(collection: Collection, filter: dict, sort: Optional[list] = None) -> Optional[bool]:
+    r"""
+    Returns `True` if the server would use an index to run the specified query—without scanning the
+    collection or sorting the documents in memory—; `False` if it wouldn't; or `None` if the server
+    can't explain the query.
+    """
+
+    stage_names = get_explained_stages(collection, filter, sort)
+    if stage_names is None:
+        return None
+    uses_index = any("IXSCAN" in stage_name or "IDHACK" in stage_name for stage_name in stage_names)
+    return uses_index and "COLLSCAN" not in stage_names and "SORT" not in stage_names
+
+
+def plan_comparison(
+    collection_a: Collection,
+    collection_b: Collection,
+    identifier_field_name_a: str,
+    identifier_field_name_b: str,
+    filter_a: Optional[dict] = None,
+    filter_b: Optional[dict] = None,
+    batch_size: int = 1000,
+    strategy: Optional[Strategy] = None,
+) -> ComparisonPlan:
+    r"""
+    Inspects the collections' indexes, and the plans the servers would use to run the comparator's queries
+    (see `query_uses_index`), and returns a plan for comparing the collections. Unless a strategy is specified,
+    the plan uses the cheapest one available:
+
+    - `Strategy.MERGE`, if the servers can read both collections sorted by their identifier fields via indexes.
+    - `Strategy.BATCH`, if the server can look up documents in collection B by identifier value via an index.
+    - `Strategy.HASH`, otherwise; since looking up documents by an unindexed field would scan collection B
+      once per lookup (or batch of lookups), making the cost of the comparison grow quadratically.
+    """
+
+    filter_a = {} if filter_a is None else filter_a
+    filter_b = {} if filter_b is None else filter_b
+    num_documents_a = estimate_number_of_documents(collection_a, filter_a)
+    num_documents_b = estimate_number_of_documents(collection_b, filter_b)
+
+    # Check whether the servers would use indexes to read the collections in identifier order.
+    is_sorted_via_index = {}
+    for (label, collection, identifier_field_name, filter) in [
+        ("A", collection_a, identifier_field_name_a, filter_a),
+        ("B", collection_b, identifier_field_name_b, filter_b),
+    ]:
+        uses_index = query_uses_index(collection, filter, sort=[(identifier_field_name, ASCENDING)])
+        if uses_index is None:
+            uses_index = has_index_on_field(collection, identifier_field_name)
+        is_sorted_via_index[label] = uses_index
+
+    # Check whether the server would use an index to look up a document in collection B by identifier value.
+    #
+    # Note: We use an identifier value from collection A, since the server may plan queries differently depending
+    #       upon the type of the value (e.g. it can't use a hashed index to look up a range of values).
+    #
+    sample_document = collection_a.find_one(
+        filter_a, make_pymongo_projection_for_identifier_field(identifier_field_name_a),
+    )
+    sample_value = None if sample_document is None else sample_document.get(identifier_field_name_a)
+    lookup_filter = combine_pymongo_filters(filter_b, {identifier_field_name_b: sample_value})
+    lookups_use_index = query_uses_index(collection_b, lookup_filter)
+    if lookups_use_index is None:
+        lookups_use_index = is_sorted_via_index["B"]
+
+    if strategy is not None:
+        reason = "specified by the user"
+        if strategy in (Strategy.LOOKUP, Strategy.BATCH) and not lookups_use_index:
+            reason += f"; collection B is not indexed on '{identifier_field_name_b}', so each lookup scans it"
+    elif is_sorted_via_index["A"] and is_sorted_via_index["B"]:
+        strategy = Strategy.MERGE
+        reason = "both collections can be read in identifier order via indexes"
+    elif lookups_use_index:
+        strategy = Strategy.BATCH
+        reason = f"collection B can be looked up via an index on '{identifier_field_name_b}'"
+    else:
+        strategy = Strategy.HASH
+        reason = (f"collection B is not indexed on '{identifier_field_name_b}', so lookups would scan it; "
+                  f"instead, the smaller collection's identifiers will be indexed on the client")
+    (num_documents_examined, num_queries) = estimate_comparison_cost(
+        strategy, num_documents_a, num_documents_b, lookups_use_index, batch_size,
+    )
+    is_quadratic = strategy in (Strategy.LOOKUP, Strategy.BATCH) and not lookups_use_index
+    return ComparisonPlan(strategy, reason, num_documents_examined, num_queries, is_quadratic)
+
+
+def has_index_on_field(collection: Collection, field_name: str) -> bool:
+    r"""
+    Returns `True` if the collection has an index that MongoDB can use to return the collection's
+    documents sorted by the specified field; otherwise `False`.
+
+    Only considers indexes whose first key is that field and which cover every document in the
+    collection (i.e. not sparse or partial indexes) and which use simple (binary) string comparison.
+    """
+
+    for index_info in collection.index_information().values():
+        (first_field_name, direction) = index_info["key"][0]
+        if (
+            first_field_name == field_name
+            and direction in (1, -1)
+            and not index_info.get("sparse", False)
+            and "partialFilterExpression" not in index_info
+            and "collation" not in index_info
+        ):
+            return True
+    return False
@@ -0,0 +1,59 @@
+r"""A progress display that throttles its updates."""
+
+from collections import defaultdict
+import time
+from typing import Any, Optional
+
+from rich.progress import Progress, TaskID
+
+
+class ThrottledProgress(Progress):
+    r"""
+    A Rich `Progress` that applies advances to its tasks at most once per `update_interval` seconds.
+
+    Comparisons advance their progress bars once per document (or batch of documents), and each advance
+    involves acquiring a lock and recording a speed sample; so this accumulates the advances passed to
+    `update` (when nothing else is being updated) and applies them all at once, every so often. Call
+    `flush` to apply any pending advances (e.g. before reading the tasks' `completed` values).
+
+    Note: Only the thread that updates the tasks should call `flush` (the display's refresh thread doesn't).
+
+    >>> progress = ThrottledProgress(disable=True, update_interval=60)
+    >>> task = progress.add_task("Comparing", total=10)
+    >>> progress.update(task, advance=3)
+    >>> progress.tasks[0].completed
+    0
+    >>> progress.flush()
+    >>> progress.tasks[0].completed
+    3.0
+    """
+
+    def __init__(self, *args: Any, update_interval: float = 0.1, **kwargs: Any) -> None:
+        r"""Initializes the progress display (see `Progress`)."""
+        super().__init__(*args, **kwargs)
+        self.update_interval = update_interval
+        self._pending_advances: dict[TaskID, float] = defaultdict(float)
+        self._last_flushed_at = time.monotonic()
+
+    def update(self, task_id: TaskID, *, advance: Optional[float] = None, **kwargs: Any) -> None:
+        r"""Updates the task (see `Progress.update`), deferring the advance if that is the only update."""
+        if advance is not None and not kwargs:
+            self._pending_advances[task_id] += advance
+            if time.monotonic() - self._last_flushed_at >= self.update_interval:
+                self.flush()
+            return
+        self.flush()
+        super().update(task_id, advance=advance, **kwargs)
+
+    def flush(self) -> None:
+        r"""Applies any pending advances."""
+        (pending_advances, self._pending_advances) = (self._pending_advances, defaultdict(float))
+        for (task_id, advance) in pending_advances.items():
+            super().update(task_id, advance=advance)
+        self._last_flushed_at = time.monotonic()
+
+    def stop(self) -> None:
+        r"""Applies any pending advances, then stops the progress display (see `Progress.stop`)."""
+        self.flush()
+        super().stop()
+
@@ -0,0 +1,377 @@
+r"""Helpers for building the queries the comparator sends to the servers, and for reading documents via them."""
+
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+from bson.raw_bson import RawBSONDocument
+from pymongo.collection import Collection
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from mongo_diff.bson_utils import bson_sort_key, encode_identifier, decode_raw_bson_document, compute_digest
+
+
+def make_pymongo_filter_for_field_having_value_null(field_name: str) -> dict:
+    r"""
+    Returns a pymongo filter for documents in which the specified field exists and contains `null`.
+
+    This helper function is useful because MongoDB interprets the filter `{"field_name": None}` as
+    matching both (a) documents in which the specified field contains `null`, and (b) documents in
+    which the specified field does not exist. This helper function disambiguates between the two.
+
+    Reference: https://www.mongodb.com/docs/manual/tutorial/query-for-null-fields/
+
+    >>> make_pymongo_filter_for_field_having_value_null("id")
+    {'$and': [{'id': {'$exists': True}}, {'id': None}]}
+    """
+    return {
+        "$and": [
+            {field_name: {"$exists": True}},
+            {field_name: None},
+        ]
+    }
+
+
+def combine_pymongo_filters(*filters: Optional[dict]) -> dict:
+    r"""
+    Returns a pymongo filter for documents that match all of the specified filters (ignoring empty ones).
+
+    >>> combine_pymongo_filters({}, {"a": 1})
+    {'a': 1}
+    >>> combine_pymongo_filters({"a": 1}, None, {"b": 2})
+    {'$and': [{'a': 1}, {'b': 2}]}
+    >>> combine_pymongo_filters()
+    {}
+    """
+
+    non_empty_filters = [f for f in filters if f]
+    if len(non_empty_filters) == 0:
+        return {}
+    if len(non_empty_filters) == 1:
+        return non_empty_filters[0]
+    return {"$and": non_empty_filters}
+
+
+def make_pymongo_filter_for_field_having_value_after(field_name: str, value: Any) -> dict:
+    r"""
+    Returns a pymongo filter for documents in which the specified field contains a value that MongoDB
+    would sort after the specified value (see `bson_sort_key`), even if the values have different types.
+
+    This helper function is useful because MongoDB only compares values having the same (or comparable)
+    types when it evaluates comparison operators like `$gt`; so we also match—via `$type`—values whose
+    types MongoDB sorts after the type of the specified value.
+
+    Reference: https://www.mongodb.com/docs/manual/reference/bson-type-comparison-order/
+
+    >>> make_pymongo_filter_for_field_having_value_after("id", True)
+    {'$or': [{'id': {'$gt': True}}, {'id': {'$type': ['date', 'timestamp', 'regex', 'maxKey']}}]}
+    >>> make_pymongo_filter_for_field_having_value_after("id", None)["$or"][1]["id"]["$type"][:3]
+    ['number', 'string', 'symbol']
+    """
+
+    # The names of BSON types, in the order in which MongoDB sorts them (grouped by the `bson_sort_key` type order).
+    type_names_by_type_order = {
+        1: ["minKey"], 2: ["null"], 3: ["number"], 4: ["string", "symbol"], 5: ["object"], 6: ["array"],
+        7: ["binData"], 8: ["objectId"], 9: ["bool"], 10: ["date"], 11: ["timestamp"], 12: ["regex"], 13: ["maxKey"],
+    }
+    type_order = bson_sort_key(value)[0]
+    later_type_names = [
+        type_name
+        for (other_type_order, type_names) in type_names_by_type_order.items()
+        if other_type_order > type_order
+        for type_name in type_names
+    ]
+    return {"$or": [{field_name: {"$gt": value}}, {field_name: {"$type": later_type_names}}]}
+
+
+def iterate_in_chunks(iterable: Iterable[Any], chunk_size: int) -> Iterator[list]:
+    r"""
+    Returns an iterator that yields lists of up to `chunk_size` consecutive items from the iterable.
+
+    >>> list(iterate_in_chunks(range(5), chunk_size=2))
+    [[0, 1], [2, 3], [4]]
+    """
+
+    if chunk_size < 1:
+        raise ValueError("The chunk size must be at least 1.")
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+def make_pymongo_filter_for_field_having_any_value(field_name: str, values: list) -> dict:
+    r"""
+    Returns a pymongo filter for documents in which the specified field contains any of the specified values.
+
+    If the values include `None`, the filter uses `make_pymongo_filter_for_field_having_value_null` to
+    match documents in which the field contains `null`—but not documents in which the field does not
+    exist at all (which a basic `$in` filter would also match).
+
+    >>> make_pymongo_filter_for_field_having_any_value("id", [1, 2])
+    {'id': {'$in': [1, 2]}}
+    >>> make_pymongo_filter_for_field_having_any_value("id", [1, None])
+    {'$or': [{'id': {'$in': [1]}}, {'$and': [{'id': {'$exists': True}}, {'id': None}]}]}
+    """
+
+    non_null_values = [value for value in values if value is not None]
+    filters = []
+    if len(non_null_values) > 0:
+        filters.append({field_name: {"$in": non_null_values}})
+    if len(non_null_values) < len(values):
+        filters.append(make_pymongo_filter_for_field_having_value_null(field_name))
+    if len(filters) == 1:
+        return filters[0]
+    return {"$or": filters}
+
+
+def find_documents_by_identifier_values(
+    collection: Collection,
+    identifier_field_name: str,
+    identifier_values: list,
+    projection: Optional[dict] = None,
+    filter: Optional[dict] = None,
+) -> dict[tuple, dict]:
+    r"""
+    Fetches—via a single query—the documents in the collection whose identifier field contains any
+    of the specified values (and which match the filter, if any), and returns them in a dictionary
+    keyed by the `bson_sort_key` of their identifier values (which, unlike some identifier values,
+    are hashable).
+    """
+
+    if len(identifier_values) == 0:
+        return {}
+    pymongo_filter = combine_pymongo_filters(
+        filter,
+        make_pymongo_filter_for_field_having_any_value(identifier_field_name, identifier_values),
+    )
+    documents_by_key = {}
+    for document in collection.find(pymongo_filter, projection):
+        if identifier_field_name in document:
+            documents_by_key[bson_sort_key(document[identifier_field_name])] = document
+    return documents_by_key
+
+
+def iterate_sampled_documents(
+    collection: Collection,
+    identifier_field_name: str,
+    sample_size: int,
+    filter: Optional[dict] = None,
+    projection: Optional[dict] = None,
+) -> Iterator[dict]:
+    r"""
+    Returns an iterator that yields `sample_size` documents chosen at random by the server, via the
+    `$sample` stage, from the documents in the collection (that match the filter, if any); omitting any
+    document the server happens to choose more than once.
+
+    Note: When there is no filter (and the sample is small relative to the collection), the server reads
+          random documents directly, instead of scanning the collection; so how long this takes depends
+          upon the sample size rather than upon the size of the collection. Otherwise, the server scans
+          the documents that match the filter (using an index, if it can).
+          Reference: https://www.mongodb.com/docs/manual/reference/operator/aggregation/sample/#behavior
+    """
+
+    match_stages = [{"$match": filter}] if filter else []
+    projection_stages = [{"$project": projection}] if projection else []
+    pipeline = [*match_stages, {"$sample": {"size": sample_size}}, *projection_stages]
+    yielded_identifier_digests = set()
+    for document in collection.aggregate(pipeline, allowDiskUse=True):
+        identifier_digest = encode_identifier(decode_raw_bson_document(document.get(identifier_field_name)))
+        if identifier_digest not in yielded_identifier_digests:
+            yielded_identifier_digests.add(identifier_digest)
+            yield document
+
+
+def make_pymongo_projection_for_identifier_field(field_name: str) -> dict:
+    r"""
+    Returns a pymongo projection that includes only the specified (identifier) field.
+
+    >>> make_pymongo_projection_for_identifier_field("id")
+    {'id': True, '_id': False}
+    >>> make_pymongo_projection_for_identifier_field("_id")
+    {'_id': True}
+    """
+
+    projection = {field_name: True}
+    if field_name != "_id":
+        projection["_id"] = False
+    return projection
+
+
+def make_pymongo_projection_for_fields(
+    identifier_field_name: str,
+    only_field_names: Optional[list[str]] = None,
+    ignored_field_names: Optional[list[str]] = None,
+) -> Optional[dict]:
+    r"""
+    Returns a pymongo projection that includes only the specified fields (along with the identifier
+    field and the `_id` field), or that excludes the ignored fields; or `None` if neither are specified.
+    The field names can be dotted paths (e.g. `audit.blob`), which MongoDB applies to embedded documents,
+    including those in arrays.
+
+    Note: MongoDB doesn't allow a projection to both include and exclude fields (other than `_id`), so
+          this raises a `ValueError` if both are specified. It also raises one if the identifier field
+          or the `_id` field is among the ignored fields, since we need those to pair up documents
+          (the `_id` field is ignored by default, anyway).
+          Reference: https://www.mongodb.com/docs/manual/tutorial/project-fields-from-query-results/
+
+    >>> make_pymongo_projection_for_fields("id", only_field_names=["a", "b.c"])
+    {'a': True, 'b.c': True, 'id': True}
+    >>> make_pymongo_projection_for_fields("id", ignored_field_names=["audit.blob"])
+    {'audit.blob': False}
+    >>> make_pymongo_projection_for_fields("id") is None
+    True
+    >>> make_pymongo_projection_for_fields("id", ignored_field_names=["id"])
+    Traceback (most recent call last):
+    ...
+    ValueError: Cannot ignore field: 'id'. It is needed to pair up documents.
+    """
+
+    if only_field_names and ignored_field_names:
+        raise ValueError("Cannot both limit the comparison to some fields and ignore other fields.")
+    if only_field_names:
+        projection = {field_name: True for field_name in only_field_names}
+        projection[identifier_field_name] = True
+        return projection
+    if ignored_field_names:
+        for field_name in ignored_field_names:
+            if field_name in ("_id", identifier_field_name) or identifier_field_name.startswith(f"{field_name}."):
+                raise ValueError(f"Cannot ignore field: '{field_name}'. It is needed to pair up documents.")
+        return {field_name: False for field_name in ignored_field_names}
+    return None
+
+
+def iterate_fingerprints(
+    collection: Collection,
+    identifier_field_name: str,
+    ignore_oid: bool,
+    filter: Optional[dict] = None,
+    projection: Optional[dict] = None,
+    sort: bool = True,
+) -> Iterator[dict]:
+    r"""
+    Returns an iterator that yields a "fingerprint" (i.e. a dictionary having an `identifier` field
+    and a `digest` field) of each document in the collection (that matches the filter, if any),
+    sorted by the identifier field.
+
+    The full documents are fetched—as `RawBSONDocument` instances, so they are never decoded—and the
+    digests are computed locally, from their raw bytes (via `compute_digest`). If a projection is
+    specified, the digests only cover the fields it includes. If `sort` is `False`, the fingerprints are
+    yielded in whatever order the server reads the documents, and they also have an `oid` field
+    containing the `_id` value.
+
+    Note: This transfers as many bytes from the server as reading the documents themselves does; what it
+          saves is the client-side work of decoding them (and of comparing those whose digests match).
+    """
+
+    collection = collection.with_options(
+        codec_options=collection.codec_options.with_options(document_class=RawBSONDocument),
+    )
+    if sort:
+        cursor = collection.find(
+            filter or {}, projection, sort=[(identifier_field_name, ASCENDING)], allow_disk_use=True,
+        )
+    else:
+        cursor = collection.find(filter or {}, projection)
+    for document in cursor:
+        fingerprint = {"digest": compute_digest(document, ignore_oid=ignore_oid)}
+        if identifier_field_name in document:
+            fingerprint["identifier"] = decode_raw_bson_document(document[identifier_field_name])
+        if not sort:
+            fingerprint["oid"] = decode_raw_bson_document(document["_id"])
+        yield fingerprint
+
+
+def estimate_number_of_documents(collection: Collection, filter: Optional[dict] = None) -> int:
+    r"""
+    Returns the number of documents in the collection that match the filter; or, if there is no filter,
+    the number of documents in the collection according to the collection's metadata.
+
+    Note: Unlike `count_documents`, `estimated_document_count` doesn't scan the collection (or an index),
+          so it returns instantly, even for huge collections. But it can be inaccurate (e.g. after an
+          unclean shutdown, or when a sharded cluster contains orphaned documents).
+          Reference: https://www.mongodb.com/docs/manual/reference/method/db.collection.estimatedDocumentCount/
+    """
+
+    if filter:
+        return collection.count_documents(filter)
+    return collection.estimated_document_count()
+
+
+def compute_partition_boundaries(
+    collection: Collection,
+    identifier_field_name: str,
+    num_partitions: int,
+    filter: Optional[dict] = None,
+) -> list:
+    r"""
+    Returns up to `num_partitions - 1` identifier values (in ascending order) that split the documents
+    in the collection (that match the filter, if any) into ranges containing roughly the same number
+    of documents.
+
+    Uses the `$bucketAuto` aggregation stage if the server supports it; otherwise, uses the identifier
+    values found at evenly-spaced positions when the documents are sorted by identifier value.
+
+    Note: MongoDB only compares values having the same (or comparable) types in query filters, so the
+          returned values all have the same type—the most common type among the candidate values.
+          Reference: https://www.mongodb.com/docs/manual/reference/method/db.collection.find/#type-bracketing
+
+    Reference: https://www.mongodb.com/docs/manual/reference/operator/aggregation/bucketAuto/
+    """
+
+    if num_partitions < 2:
+        return []
+    match_stages = [{"$match": filter}] if filter else []
+    try:
+        bucket_auto_stage = {"$bucketAuto": {"groupBy": f"${identifier_field_name}", "buckets": num_partitions}}
+        pipeline = match_stages + [bucket_auto_stage]
+        candidates = [bucket["_id"]["min"] for bucket in collection.aggregate(pipeline, allowDiskUse=True)][1:]
+    except OperationFailure:
+        num_documents = estimate_number_of_documents(collection, filter)
+        candidates = []
+        for partition_index in range(1, num_partitions):
+            cursor = collection.find(
+                filter or {},
+                make_pymongo_projection_for_identifier_field(identifier_field_name),
+                sort=[(identifier_field_name, ASCENDING)],
+                skip=partition_index * num_documents // num_partitions,
+                limit=1,
+                allow_disk_use=True,
+            )
+            candidates.extend(
+                document[identifier_field_name] for document in cursor if identifier_field_name in document
+            )
+
+    # Discard values that don't make useful boundaries (e.g. `null`, arrays, regular expressions), then keep the
+    # ones of the most common type. Note: The first element of a `bson_sort_key` indicates the type of the value.
+    keyed_candidates = {
+        bson_sort_key(value): value for value in candidates if bson_sort_key(value)[0] in (3, 4, 5, 7, 8, 9, 10, 11)
+    }
+    type_orders = [key[0] for key in keyed_candidates]
+    if len(type_orders) == 0:
+        return []
+    most_common_type_order = max(set(type_orders), key=type_orders.count)
+    return [value for (key, value) in sorted(keyed_candidates.items()) if key[0] == most_common_type_order]
+
+
+def make_pymongo_filters_for_partitions(field_name: str, boundaries: list) -> list[dict]:
+    r"""
+    Returns a list of pymongo filters that, together, match every document exactly once; where each
+    filter matches the documents whose specified field contains a value within one of the ranges
+    delimited by the boundaries (which must be in ascending order and have comparable types).
+
+    The first filter also matches documents whose field contains a value of another type (or `null`,
+    or does not exist at all), since those documents are not in any of the other ranges.
+
+    >>> make_pymongo_filters_for_partitions("id", [10, 20])
+    [{'id': {'$not': {'$gte': 10}}}, {'id': {'$gte': 10, '$lt': 20}}, {'id': {'$gte': 20}}]
+    >>> make_pymongo_filters_for_partitions("id", [])
+    [{}]
+    """
+
+    if len(boundaries) == 0:
+        return [{}]
+    filters: list[dict] = [{field_name: {"$not": {"$gte": boundaries[0]}}}]
+    for (lower_bound, upper_bound) in zip(boundaries, boundaries[1:]):
+        filters.append({field_name: {"$gte": lower_bound, "$lt": upper_bound}})
+    filters.append({field_name: {"$gte": boundaries[-1]}})
+    return filters
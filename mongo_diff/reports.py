@@ -0,0 +1,211 @@
+r"""Report files to which results stream their records, and checkpoint files from which comparisons resume."""
+
+from abc import ABC, abstractmethod
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+from urllib.parse import quote
+
+import bson
+from bson import json_util
+
+if TYPE_CHECKING:  # results stream their records to report sinks, so importing results here would be circular
+    from mongo_diff.results import Result
+
+
+class ReportSink(ABC):
+    r"""
+    A destination to which a `Result` can stream the records it would otherwise keep in memory
+    (i.e. the identifiers of documents that exist in one collection only and the diffs of
+    documents that differ between the collections).
+
+    Each record is a dictionary whose `kind` field contains one of the `RECORD_KIND_*` values.
+    Subclasses determine how records are encoded in the file (see `encode_record`).
+
+    >>> ReportSink(os.path.join(tempfile.mkdtemp(), "report"))  # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+    TypeError: Can't instantiate abstract class ReportSink
+    """
+
+    RECORD_KIND_HEADER = "header"
+    RECORD_KIND_COLLECTION_A_ONLY = "collection_a_only"
+    RECORD_KIND_COLLECTION_B_ONLY = "collection_b_only"
+    RECORD_KIND_DIFFERING = "differing"
+    RECORD_KIND_SUMMARY = "summary"
+
+    def __init__(self, path: str, resume_at: Optional[int] = None) -> None:
+        r"""
+        Initializes the sink, creating (or overwriting) the file at the specified path; or—if `resume_at`
+        is specified—truncating the existing file to that many bytes and appending to it from there
+        (e.g. when resuming a comparison from a checkpoint).
+        """
+        self.path = path
+        if resume_at is None:
+            self.file = open(path, "wb")
+        else:
+            self.file = open(path, "r+b")
+            self.file.truncate(resume_at)
+            self.file.seek(resume_at)
+
+    @property
+    def size(self) -> int:
+        r"""The number of bytes written to the file so far (flushing any that are buffered)."""
+        self.file.flush()
+        return self.file.tell()
+
+    def __enter__(self) -> "ReportSink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @staticmethod
+    def for_path(path: str, resume_at: Optional[int] = None) -> "ReportSink":
+        r"""
+        Returns a sink that writes to the file at the specified path, in the format indicated by its
+        extension: BSON if it ends with `.bson`; otherwise, JSON Lines.
+        """
+        sink_class = BsonReportSink if path.endswith(".bson") else JsonLinesReportSink
+        return sink_class(path, resume_at=resume_at)
+
+    @staticmethod
+    def read_records(path: str, offset: int = 0) -> Iterator[dict]:
+        r"""
+        Returns an iterator that yields the records in a file written by the sink returned by `for_path`
+        (starting at the specified offset, which must be that of a record; e.g. a former `size` of the sink).
+        """
+        with open(path, "rb") as file:
+            file.seek(offset)
+            if path.endswith(".bson"):
+                yield from bson.decode_file_iter(file)
+            else:
+                for line in file:
+                    yield json_util.loads(line, json_options=json_util.CANONICAL_JSON_OPTIONS)
+
+    @abstractmethod
+    def encode_record(self, record: dict) -> bytes:
+        r"""Returns the encoded form of the record, as it will appear in the file."""
+
+    def write_record(self, record: dict) -> None:
+        r"""Writes the record to the file."""
+        self.file.write(self.encode_record(record))
+
+    def write_header(self, identifier_field_name_a: str, identifier_field_name_b: str) -> None:
+        r"""Writes a record containing information needed to render the report later."""
+        self.write_record({
+            "kind": self.RECORD_KIND_HEADER,
+            "identifier_field_name_a": identifier_field_name_a,
+            "identifier_field_name_b": identifier_field_name_b,
+        })
+
+    def write_summary(self, result: "Result") -> None:
+        r"""Writes the result's summary record (see `Result.get_summary_record`)."""
+        self.write_record(result.get_summary_record())
+
+    def close(self) -> None:
+        r"""Closes the file."""
+        self.file.close()
+
+
+class JsonLinesReportSink(ReportSink):
+    r"""
+    A sink that writes each record as a line of canonical Extended JSON (so that BSON types are preserved).
+
+    Reference: https://jsonlines.org/
+    """
+
+    def encode_record(self, record: dict) -> bytes:
+        return json_util.dumps(record, json_options=json_util.CANONICAL_JSON_OPTIONS).encode("utf-8") + b"\n"
+
+
+class BsonReportSink(ReportSink):
+    r"""A sink that writes each record as a BSON document (which is more compact than JSON, and faster to read)."""
+
+    def encode_record(self, record: dict) -> bytes:
+        return bson.encode(record)
+
+
+class Checkpointer:
+    r"""
+    Periodically saves the progress of a comparison to a file, so that an interrupted comparison can
+    be resumed from where it left off (see `Comparator.compare_collections`).
+
+    A checkpoint contains the identifier value up to which (inclusive) the comparison has processed
+    both collections, along with the quantities in the partial result. That relies upon the collections
+    being processed in order of identifier value, which is why checkpoints require `Strategy.MERGE`.
+    When the comparison is resumed, it only processes documents whose identifier values come after the
+    one in the checkpoint (see `make_pymongo_filter_for_field_having_value_after`).
+
+    The checkpoint file contains canonical Extended JSON, so that BSON types are preserved.
+    """
+
+    def __init__(self, write_path: str, interval: float = 60.0, read_path: Optional[str] = None) -> None:
+        r"""
+        Initializes the checkpointer.
+
+        :param write_path: Path to the file to which to save checkpoints.
+        :param interval: The minimum number of seconds between checkpoints.
+        :param read_path: Path to a file containing a checkpoint from which to resume (which can be the same
+                          as `write_path`); or `None` to start over.
+
+        >>> (old_path, new_path) = (os.path.join(tempfile.mkdtemp(), name) for name in ("old.json", "new.json"))
+        >>> Checkpointer(old_path).save({"num_processed": 1})
+        >>> checkpointer = Checkpointer(new_path, read_path=old_path)
+        >>> checkpointer.state, os.path.exists(new_path)
+        ({'num_processed': 1}, False)
+        """
+        self.write_path = write_path
+        self.read_path = read_path
+        self.interval = interval
+        self.state: Optional[dict] = None if read_path is None else self.read(read_path)
+        self._last_saved_at = time.monotonic()
+
+    @staticmethod
+    def read(path: str) -> dict:
+        r"""Returns the checkpoint in the specified file."""
+        return read_extended_json_file(path)
+
+    @property
+    def is_due(self) -> bool:
+        r"""Whether at least `interval` seconds have passed since the last checkpoint was saved."""
+        return time.monotonic() - self._last_saved_at >= self.interval
+
+    def save(self, state: dict) -> None:
+        r"""Saves the checkpoint to the file at `write_path`."""
+        write_extended_json_file(self.write_path, state)
+        self.state = state
+        self._last_saved_at = time.monotonic()
+
+
+def read_extended_json_file(path: str) -> Any:
+    r"""Returns the value in the specified file, which contains canonical Extended JSON."""
+    with open(path, "r") as file:
+        return json_util.loads(file.read(), json_options=json_util.CANONICAL_JSON_OPTIONS)
+
+
+def write_extended_json_file(path: str, value: Any) -> None:
+    r"""
+    Writes the value to the specified file, as canonical Extended JSON (so that BSON types are preserved).
+
+    Note: We write the value to a temporary file and then rename that file, so that an interruption
+          while writing cannot leave a partially-written file behind.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(json_util.dumps(value, json_options=json_util.CANONICAL_JSON_OPTIONS, indent=2))
+    os.replace(temporary_path, path)
+
+
+def make_report_file_name(collection_name: str) -> str:
+    r"""
+    Returns the name of the report file for the collection having the specified name (see
+    `Comparator.compare_databases`): the collection name—with any character other than a letter, a digit,
+    `_`, `.`, `-`, or `~` percent-encoded—followed by `.jsonl`. Since collection names can contain path
+    separators (e.g. `../x`), using them as they are could refer to files outside the report directory.
+
+    >>> make_report_file_name("orders"), make_report_file_name("../etc/passwd"), make_report_file_name("a b")
+    ('orders.jsonl', '..%2Fetc%2Fpasswd.jsonl', 'a%20b.jsonl')
+    """
+
+    return f"{quote(collection_name, safe='')}.jsonl"
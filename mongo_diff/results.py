@@ -0,0 +1,522 @@
+r"""The results of comparisons, which record the documents in one collection only and the ones that differ."""
+
+from collections import defaultdict
+import math
+from statistics import NormalDist
+from typing import Any, Iterator, Optional, Tuple
+
+from rich.markup import escape
+from rich.table import Table, Column
+from rich.text import Text
+from rich import box
+
+from mongo_diff.bson_utils import bson_sort_key, encode_identifier
+from mongo_diff.stats import ComparisonStats
+from mongo_diff.reports import ReportSink
+
+
+class Result:
+    r"""
+    The result of the comparison.
+
+    If the result has a `ReportSink`, it streams its records (i.e. identifiers and diffs) to that
+    sink instead of keeping them in memory; in which case, it only keeps count of them. It also only
+    keeps count of the records that were recorded before a comparison was resumed from a checkpoint.
+    """
+
+    def __init__(
+        self,
+        num_documents_in_collection_a: int,
+        num_documents_in_collection_b: int,
+        sink: Optional[ReportSink] = None,
+    ) -> None:
+        r"""Initializes the result."""
+        self.num_documents_in_collection_a: int = num_documents_in_collection_a
+        self.num_documents_in_collection_b: int = num_documents_in_collection_b
+        self.identifiers_of_documents_in_collection_a_only: list[Any] = []
+        self.identifiers_of_documents_in_collection_b_only: list[Any] = []
+        self.identifiers_of_differing_documents: list[Any] = []
+
+        # Note: These are keyed by the `encode_identifier` digest of the identifier value of each differing document
+        #       (since identifier values needn't be hashable, and `_id` values needn't be unique across collections).
+        #       Use `get_diff_lines` and `get_oid_value` to look them up by identifier value.
+        self._diff_lines_of_differing_documents: dict[bytes, Optional[list[str]]] = {}
+        self._oid_values_of_differing_documents: dict[bytes, Any] = {}
+
+        self.sink = sink
+        self.num_records_streamed: dict[str, int] = defaultdict(int)
+        self.stats: Optional[ComparisonStats] = None
+    
+    @property
+    def num_documents_in_collection_a_only(self) -> int:
+        return (len(self.identifiers_of_documents_in_collection_a_only)
+                + self.num_records_streamed[ReportSink.RECORD_KIND_COLLECTION_A_ONLY])
+    
+    @property
+    def num_documents_in_collection_b_only(self) -> int:
+        return (len(self.identifiers_of_documents_in_collection_b_only)
+                + self.num_records_streamed[ReportSink.RECORD_KIND_COLLECTION_B_ONLY])
+    
+    @property
+    def num_differing_documents(self) -> int:
+        return (len(self.identifiers_of_differing_documents)
+                + self.num_records_streamed[ReportSink.RECORD_KIND_DIFFERING])
+
+    def add_document_in_collection_a_only(self, identifier_value: Any) -> None:
+        r"""Records that the document having the specified identifier value exists in collection A only."""
+        if self.sink is None:
+            self.identifiers_of_documents_in_collection_a_only.append(identifier_value)
+        else:
+            self._stream_record(ReportSink.RECORD_KIND_COLLECTION_A_ONLY, identifier=identifier_value)
+
+    def add_document_in_collection_b_only(self, identifier_value: Any) -> None:
+        r"""Records that the document having the specified identifier value exists in collection B only."""
+        if self.sink is None:
+            self.identifiers_of_documents_in_collection_b_only.append(identifier_value)
+        else:
+            self._stream_record(ReportSink.RECORD_KIND_COLLECTION_B_ONLY, identifier=identifier_value)
+
+    def add_differing_document(self, identifier_value: Any, oid_value: Any, diff_lines: Optional[list[str]]) -> None:
+        r"""
+        Records that the document having the specified identifier value differs between the collections,
+        along with the `_id` value of the document in collection A and the lines of the diff (or `None`,
+        if the diff was not generated; see `Comparator.__init__`).
+        """
+        if self.sink is None:
+            key = encode_identifier(identifier_value)
+            self.identifiers_of_differing_documents.append(identifier_value)
+            self._diff_lines_of_differing_documents[key] = diff_lines
+            self._oid_values_of_differing_documents[key] = oid_value
+        else:
+            self._stream_record(ReportSink.RECORD_KIND_DIFFERING,
+                                identifier=identifier_value, oid=oid_value, diff_lines=diff_lines)
+
+    def get_diff_lines(self, identifier_value: Any) -> Optional[list[str]]:
+        r"""
+        Returns the lines of the diff of the differing document having the specified identifier value (held
+        in memory); or `None`, if the diff was not generated or no such differing document was recorded.
+
+        >>> result = Result(2, 2)
+        >>> result.add_differing_document({"k": 1}, oid_value=1, diff_lines=["- x"])
+        >>> result.get_diff_lines({"k": 1}), result.get_diff_lines({"k": 2})
+        (['- x'], None)
+        """
+        return self._diff_lines_of_differing_documents.get(encode_identifier(identifier_value))
+
+    def get_oid_value(self, identifier_value: Any) -> Any:
+        r"""
+        Returns the `_id` value, in collection A, of the differing document having the specified identifier
+        value (held in memory); or `None`, if no such differing document was recorded.
+        """
+        return self._oid_values_of_differing_documents.get(encode_identifier(identifier_value))
+
+    def iterate_differing_documents(self) -> Iterator[Tuple[Any, Any, Optional[list[str]]]]:
+        r"""
+        Returns an iterator that yields an `(identifier_value, oid_value, diff_lines)` tuple for each
+        differing document held (in memory) by the result, in the order in which they were recorded.
+        """
+        for identifier_value in self.identifiers_of_differing_documents:
+            yield identifier_value, self.get_oid_value(identifier_value), self.get_diff_lines(identifier_value)
+
+    def restore_counts(
+        self,
+        num_documents_in_collection_a_only: int,
+        num_documents_in_collection_b_only: int,
+        num_differing_documents: int,
+    ) -> None:
+        r"""Counts records that were recorded elsewhere (e.g. before a comparison was resumed from a checkpoint)."""
+        self.num_records_streamed[ReportSink.RECORD_KIND_COLLECTION_A_ONLY] += num_documents_in_collection_a_only
+        self.num_records_streamed[ReportSink.RECORD_KIND_COLLECTION_B_ONLY] += num_documents_in_collection_b_only
+        self.num_records_streamed[ReportSink.RECORD_KIND_DIFFERING] += num_differing_documents
+
+    def _stream_record(self, kind: str, **fields: Any) -> None:
+        r"""Writes a record of the specified kind to the sink, and counts it."""
+        self.sink.write_record({"kind": kind, **fields})
+        self.num_records_streamed[kind] += 1
+
+    @staticmethod
+    def iterate_combined_records(results: list["Result"]) -> Iterator[Tuple[str, Any, Any, Optional[list[str]]]]:
+        r"""
+        Returns an iterator that yields a `(kind, identifier_value, oid_value, diff_lines)` tuple for
+        each record held (in memory) by the specified results: first those of differing documents,
+        then those of documents in collection A only, then those of documents in collection B only;
+        each group ordered by identifier value. The `kind` is one of the `ReportSink.RECORD_KIND_*` values.
+
+        >>> result = Result(2, 2)
+        >>> result.add_differing_document("y", oid_value=1, diff_lines=["- y"])
+        >>> result.add_differing_document("x", oid_value=1, diff_lines=["- x"])
+        >>> [record[1:] for record in Result.iterate_combined_records([result])]
+        [('x', 1, ['- x']), ('y', 1, ['- y'])]
+        """
+
+        differing_documents = []
+        for result in results:
+            differing_documents.extend(result.iterate_differing_documents())
+        differing_documents.sort(key=lambda differing_document: bson_sort_key(differing_document[0]))
+        for (identifier_value, oid_value, diff_lines) in differing_documents:
+            yield ReportSink.RECORD_KIND_DIFFERING, identifier_value, oid_value, diff_lines
+
+        for (kind, attribute_name) in [
+            (ReportSink.RECORD_KIND_COLLECTION_A_ONLY, "identifiers_of_documents_in_collection_a_only"),
+            (ReportSink.RECORD_KIND_COLLECTION_B_ONLY, "identifiers_of_documents_in_collection_b_only"),
+        ]:
+            identifier_values = [value for result in results for value in getattr(result, attribute_name)]
+            for identifier_value in sorted(identifier_values, key=bson_sort_key):
+                yield kind, identifier_value, None, None
+
+    def get_summary_record(self) -> dict:
+        r"""
+        Returns a record containing the quantities summarized by `get_summary_table`, along with the result's
+        statistics, if any (see `ReportSink.write_summary`).
+        """
+        record = {
+            "kind": ReportSink.RECORD_KIND_SUMMARY,
+            "num_documents_in_collection_a": self.num_documents_in_collection_a,
+            "num_documents_in_collection_b": self.num_documents_in_collection_b,
+            "num_documents_in_collection_a_only": self.num_documents_in_collection_a_only,
+            "num_documents_in_collection_b_only": self.num_documents_in_collection_b_only,
+            "num_differing_documents": self.num_differing_documents,
+        }
+        if self.stats is not None:
+            record["stats"] = self.stats.get_profile()
+        return record
+
+    @staticmethod
+    def from_summary_record(summary_record: dict) -> "Result":
+        r"""
+        Returns a result whose quantities are those in the summary record (see `ReportSink.write_summary`),
+        and which holds no records of its own. If the summary record describes a sample, returns a `SampleResult`.
+        """
+        if "num_sampled_documents_in_collection_a" in summary_record:
+            result = SampleResult(
+                num_documents_in_collection_a=summary_record["num_documents_in_collection_a"],
+                num_documents_in_collection_b=summary_record["num_documents_in_collection_b"],
+                confidence=summary_record["confidence"],
+            )
+            result.num_sampled_documents_in_collection_a = summary_record["num_sampled_documents_in_collection_a"]
+            result.num_sampled_documents_in_collection_b = summary_record["num_sampled_documents_in_collection_b"]
+        else:
+            result = Result(
+                num_documents_in_collection_a=summary_record["num_documents_in_collection_a"],
+                num_documents_in_collection_b=summary_record["num_documents_in_collection_b"],
+            )
+        result.restore_counts(
+            num_documents_in_collection_a_only=summary_record["num_documents_in_collection_a_only"],
+            num_documents_in_collection_b_only=summary_record["num_documents_in_collection_b_only"],
+            num_differing_documents=summary_record["num_differing_documents"],
+        )
+        return result
+
+    def add_record(self, kind: str, identifier_value: Any, oid_value: Any = None,
+                   diff_lines: Optional[list[str]] = None) -> None:
+        r"""Records a record of the specified kind (one of the `ReportSink.RECORD_KIND_*` values)."""
+        if kind == ReportSink.RECORD_KIND_DIFFERING:
+            self.add_differing_document(identifier_value, oid_value, diff_lines)
+        elif kind == ReportSink.RECORD_KIND_COLLECTION_A_ONLY:
+            self.add_document_in_collection_a_only(identifier_value)
+        elif kind == ReportSink.RECORD_KIND_COLLECTION_B_ONLY:
+            self.add_document_in_collection_b_only(identifier_value)
+        else:
+            raise ValueError(f"Unsupported record kind: {kind}")
+
+    @staticmethod
+    def combine(results: list["Result"], sink: Optional[ReportSink] = None) -> "Result":
+        r"""
+        Returns a single result that combines the specified results (e.g. of comparing different
+        ranges of identifier values), with its identifiers—and diffs—ordered by identifier value.
+
+        >>> result_1, result_2 = Result(2, 1), Result(1, 2)
+        >>> result_1.identifiers_of_documents_in_collection_a_only.extend(["c", "a"])
+        >>> result_2.identifiers_of_documents_in_collection_a_only.append("b")
+        >>> combined_result = Result.combine([result_1, result_2])
+        >>> combined_result.num_documents_in_collection_a, combined_result.identifiers_of_documents_in_collection_a_only
+        (3, ['a', 'b', 'c'])
+        """
+
+        combined_result = Result(
+            num_documents_in_collection_a=sum(result.num_documents_in_collection_a for result in results),
+            num_documents_in_collection_b=sum(result.num_documents_in_collection_b for result in results),
+            sink=sink,
+        )
+        for (kind, identifier_value, oid_value, diff_lines) in Result.iterate_combined_records(results):
+            combined_result.add_record(kind, identifier_value, oid_value, diff_lines)
+        return combined_result
+
+    @staticmethod
+    def colorize_if(raw_string: str, condition: bool, color: str) -> str:
+        r"""Surrounds the raw string with Rich color tags if the condition is true."""
+        return f"[{color}]{raw_string}[/{color}]" if condition else raw_string
+
+    @staticmethod
+    def colorize_diff_lines(diff_lines: list[str]) -> list[Text]:
+        r"""
+        Returns a list of Rich `Text` instances corresponding to the diff lines, with colorization.
+        The caller can then display those `Text` instances via plain `console.print()` calls.
+
+        References:
+        - https://rich.readthedocs.io/en/latest/text.html
+        - https://rich.readthedocs.io/en/latest/protocol.html
+        """
+
+        colorized_lines: list[Text] = []
+        for line in diff_lines:
+            if line.startswith("-"):
+                colorized_lines.append(Text(line, style="red"))
+            elif line.startswith("+"):
+                colorized_lines.append(Text(line, style="green"))
+            else:
+                colorized_lines.append(Text(line))
+        return colorized_lines
+
+    def get_all_colorized_diff_lines(self) -> list[Text]:
+        r"""
+        Returns a list of Rich `Text` instances that, together, represent the diffs of all differing
+        documents, with colorization.
+        """
+
+        colorized_lines: list[Text] = []
+        for (_, _, diff_lines) in self.iterate_differing_documents():
+            if diff_lines is None:
+                continue
+            colorized_lines_part = self.colorize_diff_lines(diff_lines=diff_lines)
+            colorized_lines.extend(colorized_lines_part)
+            colorized_lines.append(Text(""))
+        return colorized_lines
+
+    def get_summary_table(self, title: Optional[str] = "Result") -> Table:
+        r"""
+        Returns a Rich Table summarizing the result.
+
+        Reference: https://rich.readthedocs.io/en/stable/tables.html
+        """
+        table = Table(Column(header="Description"), Column(header="Quantity", justify="right"),
+                      title=title,
+                      box=box.ROUNDED,
+                      highlight=True)
+        table.add_row("Documents in collection A",
+                      str(self.num_documents_in_collection_a))
+        table.add_row("Documents in collection B",
+                      str(self.num_documents_in_collection_b))
+        table.add_section()
+        table.add_row("Documents in collection A [bold]only[/bold]",
+                      self.colorize_if(raw_string=str(self.num_documents_in_collection_a_only),
+                                       condition=self.num_documents_in_collection_a_only > 0,
+                                       color="red"))
+        table.add_row("Documents in collection B [bold]only[/bold]",
+                      self.colorize_if(raw_string=str(self.num_documents_in_collection_b_only),
+                                       condition=self.num_documents_in_collection_b_only > 0,
+                                       color="red"))
+        table.add_section()
+        table.add_row("Documents that differ between collections",
+                      self.colorize_if(raw_string=str(self.num_differing_documents),
+                                       condition=self.num_differing_documents > 0,
+                                       color="red"))
+        return table
+
+
+class SampleResult(Result):
+    r"""
+    The result of comparing samples of the collections (see `Comparator.compare_collection_samples`).
+
+    Its records (and quantities of documents in one collection only, or differing) describe the sampled
+    documents; while its numbers of documents in each collection describe the collections as a whole.
+    From those, it estimates—with confidence intervals—the quantities in the collections as a whole.
+    """
+
+    def __init__(
+        self,
+        num_documents_in_collection_a: int,
+        num_documents_in_collection_b: int,
+        sink: Optional[ReportSink] = None,
+        confidence: float = 0.95,
+    ) -> None:
+        r"""
+        Initializes the result.
+
+        :param confidence: The confidence level of the intervals this estimates (e.g. `0.95` for 95%).
+        """
+        super().__init__(num_documents_in_collection_a, num_documents_in_collection_b, sink=sink)
+        self.confidence = confidence
+        self.num_sampled_documents_in_collection_a = 0
+        self.num_sampled_documents_in_collection_b = 0
+
+    def get_summary_record(self) -> dict:
+        r"""Returns the summary record of the result (see `Result.get_summary_record`), including the sample sizes."""
+        record = super().get_summary_record()
+        record["num_sampled_documents_in_collection_a"] = self.num_sampled_documents_in_collection_a
+        record["num_sampled_documents_in_collection_b"] = self.num_sampled_documents_in_collection_b
+        record["confidence"] = self.confidence
+        return record
+
+    def get_estimates(self) -> list[Tuple[str, int, int, float, float, float]]:
+        r"""
+        Returns a list of `(description, num_sampled, num_found, estimate, low, high)` tuples: one for each
+        of the documents in collection A only, in collection B only, and that differ between the collections.
+        The estimate is the number of such documents in the whole collection, and `low` and `high` are the
+        bounds of its confidence interval (see `compute_confidence_interval`).
+
+        Note: The documents in collection B only are estimated from the sample of collection B; the others, from
+              the sample of collection A.
+
+        >>> result = SampleResult(num_documents_in_collection_a=1000, num_documents_in_collection_b=1000)
+        >>> result.num_sampled_documents_in_collection_a, result.num_sampled_documents_in_collection_b = 100, 100
+        >>> result.identifiers_of_differing_documents.extend(range(10))
+        >>> (description, num_sampled, num_found, estimate, low, high) = result.get_estimates()[2]
+        >>> (num_sampled, num_found, estimate, round(low), round(high))
+        (100, 10, 100.0, 55, 174)
+        """
+
+        estimates = []
+        for (description, num_sampled, num_found, num_documents) in [
+            ("Documents in collection A [bold]only[/bold]", self.num_sampled_documents_in_collection_a,
+             self.num_documents_in_collection_a_only, self.num_documents_in_collection_a),
+            ("Documents in collection B [bold]only[/bold]", self.num_sampled_documents_in_collection_b,
+             self.num_documents_in_collection_b_only, self.num_documents_in_collection_b),
+            ("Documents that differ between collections", self.num_sampled_documents_in_collection_a,
+             self.num_differing_documents, self.num_documents_in_collection_a),
+        ]:
+            proportion = num_found / num_sampled if num_sampled > 0 else 0.0
+            (low, high) = compute_confidence_interval(num_found, num_sampled, self.confidence)
+            estimates.append((description, num_sampled, num_found, proportion * num_documents,
+                              low * num_documents, high * num_documents))
+        return estimates
+
+    def get_summary_table(self, title: Optional[str] = "Result (estimated from samples)") -> Table:
+        r"""
+        Returns a Rich Table summarizing the result, including the estimates for the collections as a whole.
+
+        Reference: https://rich.readthedocs.io/en/stable/tables.html
+        """
+        table = Table(Column(header="Description"),
+                      Column(header="Sampled", justify="right"),
+                      Column(header="Found", justify="right"),
+                      Column(header="Estimated", justify="right"),
+                      Column(header=f"{self.confidence:.0%} confidence interval", justify="right"),
+                      title=title,
+                      box=box.ROUNDED,
+                      highlight=True)
+        table.add_row("Documents in collection A",
+                      str(self.num_sampled_documents_in_collection_a), "",
+                      str(self.num_documents_in_collection_a), "")
+        table.add_row("Documents in collection B",
+                      str(self.num_sampled_documents_in_collection_b), "",
+                      str(self.num_documents_in_collection_b), "")
+        for (description, num_sampled, num_found, estimate, low, high) in self.get_estimates():
+            table.add_section()
+            table.add_row(description,
+                          str(num_sampled),
+                          self.colorize_if(raw_string=str(num_found), condition=num_found > 0, color="red"),
+                          self.colorize_if(raw_string=f"{estimate:,.0f}", condition=num_found > 0, color="red"),
+                          f"{math.floor(low):,} – {math.ceil(high):,}")
+        return table
+
+
+class DatabaseResult:
+    r"""
+    The result of comparing the collections in one database with those in another (see
+    `Comparator.compare_databases`): a `Result` for each collection that exists in both databases (or
+    an error message, if comparing that collection failed), along with the names of the collections
+    that exist in only one of the databases.
+    """
+
+    def __init__(self) -> None:
+        r"""Initializes the result."""
+        self.results_by_collection_name: dict[str, Result] = {}
+        self.errors_by_collection_name: dict[str, str] = {}
+        self.collection_names_in_database_a_only: list[str] = []
+        self.collection_names_in_database_b_only: list[str] = []
+
+    def get_summary_table(self, title: Optional[str] = "Result") -> Table:
+        r"""
+        Returns a Rich Table summarizing the result, with a row for each collection (containing the quantities
+        in that collection's `Result` summary) and a row containing the totals.
+
+        Reference: https://rich.readthedocs.io/en/stable/tables.html
+        """
+        table = Table(Column(header="Collection"),
+                      Column(header="Documents in A", justify="right"),
+                      Column(header="Documents in B", justify="right"),
+                      Column(header="In A [bold]only[/bold]", justify="right"),
+                      Column(header="In B [bold]only[/bold]", justify="right"),
+                      Column(header="Differ", justify="right"),
+                      Column(header="Notes", max_width=60, no_wrap=True, overflow="ellipsis"),
+                      title=title,
+                      box=box.ROUNDED,
+                      highlight=True)
+        collection_names = sorted({
+            *self.results_by_collection_name, *self.errors_by_collection_name,
+            *self.collection_names_in_database_a_only, *self.collection_names_in_database_b_only,
+        })
+        for collection_name in collection_names:
+            if collection_name in self.results_by_collection_name:
+                result = self.results_by_collection_name[collection_name]
+                table.add_row(escape(collection_name), *self._get_row_values(result))
+            elif collection_name in self.errors_by_collection_name:
+                error = self.errors_by_collection_name[collection_name]
+                table.add_row(escape(collection_name), *[""] * 5, f"[red]Error: {escape(error)}[/red]")
+            elif collection_name in self.collection_names_in_database_a_only:
+                table.add_row(escape(collection_name), *[""] * 5, "[red]Collection exists in database A only[/red]")
+            else:
+                table.add_row(escape(collection_name), *[""] * 5, "[red]Collection exists in database B only[/red]")
+
+        # Add a row containing the totals.
+        total = Result(
+            num_documents_in_collection_a=sum(result.num_documents_in_collection_a
+                                              for result in self.results_by_collection_name.values()),
+            num_documents_in_collection_b=sum(result.num_documents_in_collection_b
+                                              for result in self.results_by_collection_name.values()),
+        )
+        total.restore_counts(
+            num_documents_in_collection_a_only=sum(result.num_documents_in_collection_a_only
+                                                   for result in self.results_by_collection_name.values()),
+            num_documents_in_collection_b_only=sum(result.num_documents_in_collection_b_only
+                                                   for result in self.results_by_collection_name.values()),
+            num_differing_documents=sum(result.num_differing_documents
+                                        for result in self.results_by_collection_name.values()),
+        )
+        table.add_section()
+        table.add_row("[bold]Total[/bold]", *self._get_row_values(total))
+        return table
+
+    @staticmethod
+    def _get_row_values(result: Result) -> list[str]:
+        r"""Returns the values of the quantities (see `Result.get_summary_table`) to display in a row."""
+        return [
+            str(result.num_documents_in_collection_a),
+            str(result.num_documents_in_collection_b),
+            Result.colorize_if(raw_string=str(result.num_documents_in_collection_a_only),
+                               condition=result.num_documents_in_collection_a_only > 0,
+                               color="red"),
+            Result.colorize_if(raw_string=str(result.num_documents_in_collection_b_only),
+                               condition=result.num_documents_in_collection_b_only > 0,
+                               color="red"),
+            Result.colorize_if(raw_string=str(result.num_differing_documents),
+                               condition=result.num_differing_documents > 0,
+                               color="red"),
+        ]
+
+
+def compute_confidence_interval(num_successes: int, num_trials: int, confidence: float = 0.95) -> Tuple[float, float]:
+    r"""
+    Returns the bounds of the Wilson score interval for the proportion of successes, at the specified
+    confidence level. Unlike the normal approximation, this interval remains meaningful when there are
+    few (or no) successes, which is the case we care about most (e.g. "no differences in the sample").
+
+    Reference: https://en.wikipedia.org/wiki/Binomial_proportion_confidence_interval#Wilson_score_interval
+
+    >>> [round(bound, 4) for bound in compute_confidence_interval(0, 1000)]
+    [0.0, 0.0038]
+    >>> [round(bound, 4) for bound in compute_confidence_interval(50, 100)]
+    [0.4038, 0.5962]
+    >>> compute_confidence_interval(0, 0)
+    (0.0, 1.0)
+    """
+
+    if num_trials == 0:
+        return (0.0, 1.0)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    proportion = num_successes / num_trials
+    denominator = 1 + z ** 2 / num_trials
+    center = (proportion + z ** 2 / (2 * num_trials)) / denominator
+    margin = z * math.sqrt(proportion * (1 - proportion) / num_trials + z ** 2 / (4 * num_trials ** 2)) / denominator
+    return (max(0.0, center - margin), min(1.0, center + margin))
@@ -0,0 +1,172 @@
+r"""Snapshots of collections (i.e. files of document fingerprints) that the comparator can compare collections with."""
+
+import datetime
+import mmap
+import os
+import tempfile
+from typing import Any, Iterable, Iterator, Optional
+
+from pymongo.collection import Collection
+import bson
+from rich.progress import Progress
+
+from mongo_diff.bson_utils import bson_sort_key, decode_raw_bson_document
+from mongo_diff.queries import iterate_fingerprints, estimate_number_of_documents
+
+
+class FingerprintSnapshot:
+    r"""
+    A file containing the fingerprint (see `iterate_fingerprints`) of each document in a collection,
+    sorted by identifier value, which you can compare with a collection later—e.g. after a migration,
+    when the original collection may be gone (see `Comparator.compare_collection_with_snapshot`).
+
+    The file consists of a magic number, the number of fingerprints (as a little-endian 64-bit integer),
+    a BSON document describing how the fingerprints were computed, and then the fingerprints themselves,
+    each as a BSON document (`{"i": <identifier value>, "d": <digest>}`). Since every BSON document
+    starts with its length, reading the fingerprints is a matter of walking along a memory-mapped view
+    of the file; so comparing a collection with a snapshot takes little memory, however large it is.
+
+    >>> path = os.path.join(tempfile.mkdtemp(), "example.snapshot")
+    >>> header = dict(namespace="db.c", identifier_field_name="id", ignore_oid=True, digest_kind="client")
+    >>> FingerprintSnapshot.write_fingerprints(path, header, [{"identifier": 1, "digest": b"x"}])
+    1
+    >>> with FingerprintSnapshot(path) as snapshot:
+    ...     (len(snapshot), snapshot.identifier_field_name, list(snapshot))
+    (1, 'id', [{'identifier': 1, 'digest': b'x'}])
+    """
+
+    MAGIC = b"MDSNAP01"
+    HEADER_OFFSET = len(MAGIC) + 8
+
+    def __init__(self, path: str) -> None:
+        r"""Opens (and memory-maps) the snapshot in the specified file."""
+
+        self.path = path
+        with open(path, "rb") as file:
+            if file.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f'File is not a snapshot: "{path}"')
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.num_fingerprints = int.from_bytes(self._mmap[len(self.MAGIC):self.HEADER_OFFSET], "little")
+        header_size = int.from_bytes(self._mmap[self.HEADER_OFFSET:self.HEADER_OFFSET + 4], "little")
+        self.header: dict = bson.decode(self._mmap[self.HEADER_OFFSET:self.HEADER_OFFSET + header_size])
+        self._fingerprints_offset = self.HEADER_OFFSET + header_size
+
+        self.namespace: str = self.header["namespace"]
+        self.identifier_field_name: str = self.header["identifier_field_name"]
+        self.ignore_oid: bool = self.header["ignore_oid"]
+        self.digest_kind: str = self.header["digest_kind"]
+        self.filter: dict = self.header.get("filter") or {}
+        self.projection: Optional[dict] = self.header.get("projection")
+        self.created_at: Optional[datetime.datetime] = self.header.get("created_at")
+
+    def __enter__(self) -> "FingerprintSnapshot":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.num_fingerprints
+
+    def __iter__(self) -> Iterator[dict]:
+        r"""Returns an iterator that yields the fingerprints, in the same form as `iterate_fingerprints` does."""
+
+        position = self._fingerprints_offset
+        while position < len(self._mmap):
+            size = int.from_bytes(self._mmap[position:position + 4], "little")
+            entry = bson.decode(self._mmap[position:position + size])
+            position += size
+            yield {"identifier": entry["i"], "digest": entry["d"]}
+
+    def close(self) -> None:
+        r"""Unmaps the file."""
+        self._mmap.close()
+
+    def check_compatibility(self, ignore_oid: bool, filter: Optional[dict], projection: Optional[dict]) -> None:
+        r"""
+        Raises a `ValueError` if documents fingerprinted with the specified settings cannot be compared
+        with the ones in the snapshot (i.e. if their digests would differ even when the documents didn't,
+        or if the comparison would cover different documents).
+        """
+
+        if self.digest_kind != "client":
+            # Note: Earlier versions let the server compute the digests (via `$toHashedIndexKey`), which truncates
+            #       fractional numbers to integers; so those snapshots can't reveal some differences.
+            raise ValueError("The snapshot contains digests computed by the server. Take a new snapshot.")
+        if ignore_oid != self.ignore_oid:
+            raise ValueError(f"The snapshot was taken {'without' if self.ignore_oid else 'with'} the `_id` field.")
+        if (filter or {}) != self.filter:
+            raise ValueError(f"The snapshot was taken with a different filter. Filter: {self.filter}")
+        if projection != self.projection:
+            raise ValueError(f"The snapshot was taken with different field limits. Projection: {self.projection}")
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        collection: Collection,
+        identifier_field_name: str,
+        ignore_oid: bool,
+        filter: Optional[dict] = None,
+        projection: Optional[dict] = None,
+        progress: Optional[Progress] = None,
+    ) -> int:
+        r"""
+        Writes a snapshot of the collection (or of the documents in it that match the filter) to the
+        specified file, and returns the number of documents in it. The digests are computed locally (see
+        `compute_digest`).
+        """
+
+        header = dict(
+            namespace=collection.full_name,
+            identifier_field_name=identifier_field_name,
+            ignore_oid=ignore_oid,
+            digest_kind="client",
+            filter=filter or {},
+            projection=projection,
+            created_at=datetime.datetime.now(datetime.timezone.utc),
+        )
+        task = None
+        if progress is not None:
+            task = progress.add_task("Writing snapshot", total=estimate_number_of_documents(collection, filter))
+
+        def iterate_and_track_fingerprints() -> Iterator[dict]:
+            for fingerprint in iterate_fingerprints(
+                collection, identifier_field_name, ignore_oid, filter, projection,
+            ):
+                yield fingerprint
+                if progress is not None and task is not None:
+                    progress.update(task, advance=1)
+
+        return cls.write_fingerprints(path, header, iterate_and_track_fingerprints())
+
+    @classmethod
+    def write_fingerprints(cls, path: str, header: dict, fingerprints: Iterable[dict]) -> int:
+        r"""
+        Writes the fingerprints—which must be sorted by identifier value—to a snapshot file having the
+        specified header, and returns the number of them.
+
+        Note: We write the snapshot to a temporary file and then rename that file, so that an interruption
+              while writing cannot leave a partially-written snapshot behind.
+        """
+
+        temporary_path = f"{path}.tmp"
+        num_fingerprints = 0
+        previous_key: Any = None
+        with open(temporary_path, "wb") as file:
+            file.write(cls.MAGIC + bytes(8))
+            file.write(bson.encode(header))
+            for fingerprint in fingerprints:
+                if "identifier" not in fingerprint:
+                    raise ValueError(f"Document lacks identifier field: '{header['identifier_field_name']}'.")
+                identifier_value = decode_raw_bson_document(fingerprint["identifier"])
+                key = bson_sort_key(identifier_value)
+                if num_fingerprints > 0 and not previous_key < key:
+                    raise ValueError("Fingerprints are not sorted by identifier value (or contain duplicates).")
+                file.write(bson.encode({"i": identifier_value, "d": fingerprint["digest"]}))
+                previous_key = key
+                num_fingerprints += 1
+            file.seek(len(cls.MAGIC))
+            file.write(num_fingerprints.to_bytes(8, "little"))
+        os.replace(temporary_path, path)
+        return num_fingerprints
@@ -0,0 +1,116 @@
+r"""Statistics about a comparison: how long its phases take, and which commands it sends to the servers."""
+
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any, Iterator, Tuple
+
+from pymongo import monitoring
+import bson
+
+
+class ComparisonStats(monitoring.CommandListener):
+    r"""
+    Collects statistics about a comparison: how long each of its client-side phases (e.g. comparing documents,
+    generating diffs, rendering output) takes; and—since this is also a PyMongo command listener—how many commands
+    (i.e. round trips) the client sends to the servers, how many bytes those commands and the servers' replies
+    to them contain, and how long they take, per type of command and per server.
+
+    To collect the latter, pass this to each `MongoClient` (via its `event_listeners` argument) before passing
+    it to the `Comparator` (which attaches it to the `Result` of each comparison it performs). The byte counts
+    are the sizes of the BSON representations of the commands and replies (computing them takes time, too).
+
+    Reference: https://pymongo.readthedocs.io/en/stable/api/pymongo/monitoring.html
+
+    >>> stats = ComparisonStats()
+    >>> with stats.time_phase("comparing documents"):
+    ...     pass
+    >>> stats.record_command(("localhost", 27017), "find", num_bytes_sent=100, num_bytes_received=2000, seconds=0.5)
+    >>> profile = stats.get_profile()
+    >>> (profile["phases"]["comparing documents"]["count"], profile["commands"]["find"]["round_trips"])
+    (1, 1)
+    >>> profile["servers"]["localhost:27017"]["bytes_received"]
+    2000
+    """
+
+    def __init__(self) -> None:
+        r"""Initializes the (empty) statistics."""
+        self.seconds_by_phase: dict[str, float] = defaultdict(float)
+        self.count_by_phase: dict[str, int] = defaultdict(int)
+        self.command_stats_by_name: dict[str, dict[str, float]] = defaultdict(self._make_command_stats)
+        self.command_stats_by_server: dict[str, dict[str, float]] = defaultdict(self._make_command_stats)
+        self._num_bytes_sent_by_request: dict[Tuple[Any, int], int] = {}
+        self._lock = threading.Lock()  # commands can complete on multiple threads (e.g. in `compare_databases`)
+
+    @staticmethod
+    def _make_command_stats() -> dict[str, float]:
+        return dict(round_trips=0, bytes_sent=0, bytes_received=0, seconds=0.0)
+
+    @contextmanager
+    def time_phase(self, phase_name: str) -> Iterator[None]:
+        r"""Returns a context manager that adds the time spent within it to the specified phase."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.seconds_by_phase[phase_name] += time.perf_counter() - started_at
+                self.count_by_phase[phase_name] += 1
+
+    def record_command(
+        self,
+        server_address: Any,
+        command_name: str,
+        num_bytes_sent: int,
+        num_bytes_received: int,
+        seconds: float,
+    ) -> None:
+        r"""Records a command sent to the server having the specified `(host, port)` address."""
+        server_name = ":".join(str(part) for part in server_address) if server_address else "unknown"
+        with self._lock:
+            for command_stats in (self.command_stats_by_name[command_name],
+                                  self.command_stats_by_server[server_name]):
+                command_stats["round_trips"] += 1
+                command_stats["bytes_sent"] += num_bytes_sent
+                command_stats["bytes_received"] += num_bytes_received
+                command_stats["seconds"] += seconds
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        num_bytes_sent = len(bson.encode(event.command))
+        with self._lock:
+            self._num_bytes_sent_by_request[(event.connection_id, event.request_id)] = num_bytes_sent
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record_completed_command(event, num_bytes_received=len(bson.encode(event.reply)))
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record_completed_command(event, num_bytes_received=0)
+
+    def _record_completed_command(self, event: Any, num_bytes_received: int) -> None:
+        with self._lock:
+            num_bytes_sent = self._num_bytes_sent_by_request.pop((event.connection_id, event.request_id), 0)
+        self.record_command(event.connection_id, event.command_name, num_bytes_sent, num_bytes_received,
+                            seconds=event.duration_micros / 1_000_000)
+
+    def get_profile(self) -> dict:
+        r"""Returns the statistics as a dictionary that can be serialized as JSON."""
+
+        def round_command_stats(command_stats: dict[str, float]) -> dict[str, float]:
+            return {**command_stats, "seconds": round(command_stats["seconds"], 6)}
+
+        with self._lock:
+            return dict(
+                phases={
+                    phase_name: dict(seconds=round(seconds, 6), count=self.count_by_phase[phase_name])
+                    for (phase_name, seconds) in self.seconds_by_phase.items()
+                },
+                commands={
+                    command_name: round_command_stats(command_stats)
+                    for (command_name, command_stats) in sorted(self.command_stats_by_name.items())
+                },
+                servers={
+                    server_name: round_command_stats(command_stats)
+                    for (server_name, command_stats) in sorted(self.command_stats_by_server.items())
+                },
+            )
@@ -0,0 +1,307 @@
+r"""Bounded-memory storage the strategies use for identifier values and digests, spilling to disk when it must."""
+
+import heapq
+import os
+import sqlite3
+import tempfile
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+import bson
+
+from mongo_diff.bson_utils import encode_identifier
+
+
+class IdentifierSet:
+    r"""
+    A set of identifier values, each of which is stored as a compact digest (see `encode_identifier`)
+    rather than as a Python object. Once the set contains more than `max_identifiers_in_memory` values,
+    it spills them to a temporary SQLite database on disk, so the set can grow larger than memory.
+
+    Use it as a context manager, so the temporary database (if any) gets deleted when you're done.
+
+    >>> with IdentifierSet(max_identifiers_in_memory=2) as identifiers:
+    ...     for value in ["a", None, 1, {"b": 2}]:
+    ...         identifiers.add(value)
+    ...     (1.0 in identifiers, None in identifiers, "b" in identifiers, len(identifiers), identifiers.is_spilled)
+    (True, True, False, 4, True)
+    """
+
+    def __init__(self, max_identifiers_in_memory: int = 1_000_000) -> None:
+        r"""Initializes the (empty) set."""
+        self.max_identifiers_in_memory = max_identifiers_in_memory
+        self._digests_in_memory: set[bytes] = set()
+        self._temporary_directory: Optional[tempfile.TemporaryDirectory] = None
+        self._database: Optional[sqlite3.Connection] = None
+        self._num_digests_on_disk = 0
+
+    def __enter__(self) -> "IdentifierSet":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def is_spilled(self) -> bool:
+        r"""Whether the set has spilled any identifiers to disk."""
+        return self._database is not None
+
+    def __len__(self) -> int:
+        return len(self._digests_in_memory) + self._num_digests_on_disk
+
+    def add(self, identifier_value: Any) -> None:
+        r"""Adds the identifier value to the set."""
+        self._digests_in_memory.add(encode_identifier(identifier_value))
+        if len(self._digests_in_memory) > self.max_identifiers_in_memory:
+            self._spill()
+
+    def __contains__(self, identifier_value: Any) -> bool:
+        digest = encode_identifier(identifier_value)
+        if digest in self._digests_in_memory:
+            return True
+        if self._database is None:
+            return False
+        row = self._database.execute("SELECT 1 FROM digests WHERE digest = ?", (digest,)).fetchone()
+        return row is not None
+
+    def _spill(self) -> None:
+        r"""Moves the digests that are in memory, into the database on disk (creating it if necessary)."""
+        if self._database is None:
+            (self._temporary_directory, self._database) = create_temporary_sqlite_database(
+                "CREATE TABLE digests (digest BLOB PRIMARY KEY) WITHOUT ROWID"
+            )
+        cursor = self._database.executemany(
+            "INSERT OR IGNORE INTO digests (digest) VALUES (?)",
+            ((digest,) for digest in self._digests_in_memory),
+        )
+        self._database.commit()
+        self._num_digests_on_disk += cursor.rowcount
+        self._digests_in_memory.clear()
+
+    def close(self) -> None:
+        r"""Discards the contents of the set, deleting its temporary database (if any)."""
+        self._digests_in_memory.clear()
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
+        self._num_digests_on_disk = 0
+
+
+class IdentifierIndex:
+    r"""
+    A mapping from identifier values to small dictionaries (e.g. of a document's `_id` value and digest),
+    each of which is stored as BSON and keyed by a compact digest of the identifier value (see
+    `encode_identifier`). Like `IdentifierSet`, once the mapping contains more than `max_entries_in_memory`
+    entries, it spills them to a temporary SQLite database on disk.
+
+    Use it as a context manager, so the temporary database (if any) gets deleted when you're done.
+
+    >>> with IdentifierIndex(max_entries_in_memory=1) as index:
+    ...     index["a"] = {"oid": 1}
+    ...     index[2] = {"oid": 2}
+    ...     (index.pop(2.0), index.pop(2.0), len(index), list(index.values()), index.is_spilled)
+    ({'oid': 2}, None, 1, [{'oid': 1}], True)
+    """
+
+    def __init__(self, max_entries_in_memory: int = 1_000_000) -> None:
+        r"""Initializes the (empty) mapping."""
+        self.max_entries_in_memory = max_entries_in_memory
+        self._entries_in_memory: dict[bytes, bytes] = {}
+        self._temporary_directory: Optional[tempfile.TemporaryDirectory] = None
+        self._database: Optional[sqlite3.Connection] = None
+        self._num_entries_on_disk = 0
+
+    def __enter__(self) -> "IdentifierIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def is_spilled(self) -> bool:
+        r"""Whether the mapping has spilled any entries to disk."""
+        return self._database is not None
+
+    def __len__(self) -> int:
+        return len(self._entries_in_memory) + self._num_entries_on_disk
+
+    def __setitem__(self, identifier_value: Any, entry: dict) -> None:
+        r"""Maps the identifier value to the entry."""
+        self._entries_in_memory[encode_identifier(identifier_value)] = bson.encode(entry)
+        if len(self._entries_in_memory) > self.max_entries_in_memory:
+            self._spill()
+
+    def pop(self, identifier_value: Any) -> Optional[dict]:
+        r"""Removes the identifier value from the mapping and returns its entry; or returns `None` if it isn't there."""
+        digest = encode_identifier(identifier_value)
+        encoded_entry = self._entries_in_memory.pop(digest, None)
+        if encoded_entry is None and self._database is not None:
+            row = self._database.execute("SELECT entry FROM entries WHERE digest = ?", (digest,)).fetchone()
+            if row is not None:
+                self._database.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+                self._num_entries_on_disk -= 1
+                encoded_entry = row[0]
+        return None if encoded_entry is None else bson.decode(encoded_entry)
+
+    def values(self) -> Iterator[dict]:
+        r"""Returns an iterator that yields every entry in the mapping."""
+        for encoded_entry in self._entries_in_memory.values():
+            yield bson.decode(encoded_entry)
+        if self._database is not None:
+            for (encoded_entry,) in self._database.execute("SELECT entry FROM entries"):
+                yield bson.decode(encoded_entry)
+
+    def _spill(self) -> None:
+        r"""Moves the entries that are in memory, into the database on disk (creating it if necessary)."""
+        if self._database is None:
+            (self._temporary_directory, self._database) = create_temporary_sqlite_database(
+                "CREATE TABLE entries (digest BLOB PRIMARY KEY, entry BLOB) WITHOUT ROWID"
+            )
+        cursor = self._database.executemany(
+            "INSERT OR REPLACE INTO entries (digest, entry) VALUES (?, ?)",
+            self._entries_in_memory.items(),
+        )
+        self._database.commit()
+        self._num_entries_on_disk += cursor.rowcount
+        self._entries_in_memory.clear()
+
+    def close(self) -> None:
+        r"""Discards the contents of the mapping, deleting its temporary database (if any)."""
+        self._entries_in_memory.clear()
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
+        self._num_entries_on_disk = 0
+
+
+class ExternalSorter:
+    r"""
+    Sorts `(key, entry)` pairs of byte strings by key, using a bounded amount of memory. Whenever the pairs
+    held in memory take up more than `memory_limit` bytes (roughly), this sorts them and writes them to a
+    temporary file on disk (a "run"); and, once you've added every pair, it merges the runs—reading each
+    one sequentially—to yield every pair in order. It merges at most `max_runs_per_merge` runs at once, so
+    it never has more files than that open; when there are more runs, it first merges them, in groups of
+    that many, into longer runs (as often as it takes).
+
+    Use it as a context manager, so the temporary files (if any) get deleted when you're done.
+
+    >>> with ExternalSorter(memory_limit=1) as sorter:
+    ...     for key in [b"c", b"a", b"b"]:
+    ...         sorter.add(key, key.upper())
+    ...     (list(sorter), sorter.num_runs)
+    ([(b'a', b'A'), (b'b', b'B'), (b'c', b'C')], 3)
+    """
+
+    # The approximate number of bytes Python uses to hold a pair in memory, beyond the bytes in it.
+    PAIR_OVERHEAD = 128
+
+    def __init__(self, memory_limit: int = 256 * 1024 * 1024, max_runs_per_merge: int = 64) -> None:
+        r"""Initializes the (empty) sorter."""
+        if max_runs_per_merge < 2:
+            raise ValueError("The sorter must be able to merge at least 2 runs at once.")
+        self.memory_limit = memory_limit
+        self.max_runs_per_merge = max_runs_per_merge
+        self._pairs_in_memory: list[Tuple[bytes, bytes]] = []
+        self._num_bytes_in_memory = 0
+        self._temporary_directory: Optional[tempfile.TemporaryDirectory] = None
+        self._run_paths: list[str] = []
+        self._num_runs = 0
+        self._num_files = 0
+
+    def __enter__(self) -> "ExternalSorter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def num_runs(self) -> int:
+        r"""The number of runs the sorter has written to disk (not counting the longer runs it merges them into)."""
+        return self._num_runs
+
+    def add(self, key: bytes, entry: bytes) -> None:
+        r"""Adds the pair to the sorter."""
+        self._pairs_in_memory.append((key, entry))
+        self._num_bytes_in_memory += len(key) + len(entry) + self.PAIR_OVERHEAD
+        if self._num_bytes_in_memory > self.memory_limit:
+            self._write_run()
+
+    def __iter__(self) -> Iterator[Tuple[bytes, bytes]]:
+        r"""Returns an iterator that yields every pair in the sorter, sorted by key."""
+        self._pairs_in_memory.sort(key=lambda pair: pair[0])
+        while len(self._run_paths) > self.max_runs_per_merge:
+            self._merge_runs()
+        runs = [self._read_run(run_path) for run_path in self._run_paths]
+        return heapq.merge(*runs, iter(self._pairs_in_memory), key=lambda pair: pair[0])
+
+    def _write_run(self) -> None:
+        r"""Sorts the pairs that are in memory, and moves them into a new run on disk."""
+        self._pairs_in_memory.sort(key=lambda pair: pair[0])
+        self._run_paths.append(self._write_run_file(self._pairs_in_memory))
+        self._num_runs += 1
+        self._pairs_in_memory = []
+        self._num_bytes_in_memory = 0
+
+    def _merge_runs(self) -> None:
+        r"""Merges each group of (up to) `max_runs_per_merge` runs into a single run, deleting the original runs."""
+        (run_paths, self._run_paths) = (self._run_paths, [])
+        for start in range(0, len(run_paths), self.max_runs_per_merge):
+            group = run_paths[start:start + self.max_runs_per_merge]
+            runs = [self._read_run(run_path) for run_path in group]
+            self._run_paths.append(self._write_run_file(heapq.merge(*runs, key=lambda pair: pair[0])))
+            for run_path in group:
+                os.remove(run_path)
+
+    def _write_run_file(self, pairs: Iterable[Tuple[bytes, bytes]]) -> str:
+        r"""Writes the (sorted) pairs to a new file in the temporary directory, and returns the file's path."""
+        if self._temporary_directory is None:
+            self._temporary_directory = tempfile.TemporaryDirectory(prefix="mongo-diff-")
+        run_path = os.path.join(self._temporary_directory.name, f"run-{self._num_files}")
+        self._num_files += 1
+        with open(run_path, "wb") as file:
+            for (key, entry) in pairs:
+                file.write(len(key).to_bytes(4, "little") + key + len(entry).to_bytes(4, "little") + entry)
+        return run_path
+
+    @staticmethod
+    def _read_run(run_path: str) -> Iterator[Tuple[bytes, bytes]]:
+        r"""Returns an iterator that yields the pairs in the run."""
+        with open(run_path, "rb") as file:
+            while key_size_bytes := file.read(4):
+                key = file.read(int.from_bytes(key_size_bytes, "little"))
+                entry = file.read(int.from_bytes(file.read(4), "little"))
+                yield key, entry
+
+    def close(self) -> None:
+        r"""Discards the contents of the sorter, deleting its temporary files (if any)."""
+        self._pairs_in_memory = []
+        self._num_bytes_in_memory = 0
+        self._run_paths = []
+        self._num_runs = 0
+        self._num_files = 0
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+            self._temporary_directory = None
+
+
+def create_temporary_sqlite_database(
+    create_table_statement: str,
+) -> Tuple[tempfile.TemporaryDirectory, sqlite3.Connection]:
+    r"""
+    Creates a SQLite database (containing a table created via the specified statement) in a new temporary
+    directory, and returns that directory (so the caller can delete it) along with a connection to the database.
+
+    Note: We disable the journal and synchronous writes, since the database is only ever used as scratch space.
+    """
+
+    temporary_directory = tempfile.TemporaryDirectory(prefix="mongo-diff-")
+    database = sqlite3.connect(os.path.join(temporary_directory.name, "scratch.sqlite3"))
+    database.execute("PRAGMA journal_mode = OFF")
+    database.execute("PRAGMA synchronous = OFF")
+    database.execute(create_table_statement)
+    return temporary_directory, database
@@ -0,0 +1,847 @@
+r"""The strategies via which the comparator pairs up the documents in one collection with those in another."""
+
+from enum import Enum
+from typing import Any, Optional, Tuple
+
+from pymongo.collection import Collection
+from pymongo import ASCENDING
+import bson
+from rich.progress import Progress
+
+from mongo_diff.bson_utils import (
+    bson_sort_key,
+    encode_sort_key,
+    merge_sorted_streams,
+    decode_raw_bson_document,
+    compute_digest,
+)
+from mongo_diff.queries import (
+    make_pymongo_filter_for_field_having_value_null,
+    combine_pymongo_filters,
+    make_pymongo_filter_for_field_having_value_after,
+    iterate_in_chunks,
+    find_documents_by_identifier_values,
+    make_pymongo_projection_for_identifier_field,
+    iterate_fingerprints,
+)
+from mongo_diff.storage import IdentifierSet, IdentifierIndex, ExternalSorter
+from mongo_diff.progress import ThrottledProgress
+from mongo_diff.reports import Checkpointer
+from mongo_diff.results import Result
+
+
+class Strategy(str, Enum):
+    r"""
+    A strategy the comparator can use to pair up documents from collection A with documents from
+    collection B.
+    """
+
+    LOOKUP = "lookup"
+    r"""Look up each document's counterpart via a `find_one` query (works without indexes, but slowly)."""
+
+    MERGE = "merge"
+    r"""Read both collections sorted by their identifier fields and merge them (best when both are indexed)."""
+
+    BATCH = "batch"
+    r"""Look up the counterparts of a batch of documents at a time, via a single `$in` query per batch."""
+
+    FINGERPRINT = "fingerprint"
+    r"""Merge per-document digests of the raw BSON, and decode and compare only documents whose digests differ."""
+
+    HASH = "hash"
+    r"""Index the smaller collection's identifiers on the client, then scan the other one (works without indexes)."""
+
+    SORT = "sort"
+    r"""Sort both collections' digests on the client, spilling to disk, then merge them (works without indexes)."""
+
+
+class StrategyMixin:
+    r"""
+    The implementations of the strategies (see `Strategy`) via which a `Comparator`—which inherits these
+    methods—pairs up the documents in collection A with those in collection B. They hand each pair of
+    documents (and each document that has no counterpart) to the comparator's `_process_*` methods, and
+    return the numbers of documents they read from collections A and B (counting each document once).
+    """
+
+    def _dispatch_comparison(
+        self,
+        strategy: "Strategy",
+        report: Result,
+        progress: ThrottledProgress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        batch_size: int,
+        max_identifiers_in_memory: int,
+        memory_limit: int,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+        checkpointer: Optional[Checkpointer],
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections via the method that implements the specified strategy, and returns the numbers
+        of documents it read from collections A and B.
+        """
+
+        if strategy == Strategy.MERGE:
+            return self._compare_collections_via_merge(
+                report=report,
+                progress=progress,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                projection_a=projection_a,
+                projection_b=projection_b,
+                checkpointer=checkpointer,
+            )
+        elif strategy == Strategy.BATCH:
+            return self._compare_collections_via_batched_lookups(
+                report=report,
+                progress=progress,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                batch_size=batch_size,
+                max_identifiers_in_memory=max_identifiers_in_memory,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                projection_a=projection_a,
+                projection_b=projection_b,
+            )
+        elif strategy == Strategy.HASH:
+            return self._compare_collections_via_hash_index(
+                report=report,
+                progress=progress,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                batch_size=batch_size,
+                max_identifiers_in_memory=max_identifiers_in_memory,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                projection_a=projection_a,
+                projection_b=projection_b,
+            )
+        elif strategy == Strategy.SORT:
+            return self._compare_collections_via_external_sort(
+                report=report,
+                progress=progress,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                batch_size=batch_size,
+                memory_limit=memory_limit,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                projection_a=projection_a,
+                projection_b=projection_b,
+            )
+        elif strategy == Strategy.FINGERPRINT:
+            return self._compare_collections_via_fingerprints(
+                report=report,
+                progress=progress,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                batch_size=batch_size,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                projection_a=projection_a,
+                projection_b=projection_b,
+            )
+        else:
+            return self._compare_collections_via_lookups(
+                report=report,
+                progress=progress,
+                collection_a=collection_a,
+                collection_b=collection_b,
+                identifier_field_name_a=identifier_field_name_a,
+                identifier_field_name_b=identifier_field_name_b,
+                ignore_oid=ignore_oid,
+                max_identifiers_in_memory=max_identifiers_in_memory,
+                filter_a=filter_a,
+                filter_b=filter_b,
+                projection_a=projection_a,
+                projection_b=projection_b,
+            )
+
+    def _compare_collections_via_lookups(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        max_identifiers_in_memory: int,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections by iterating over collection A and looking up, in collection B, the
+        document having the same identifier value (i.e. one `find_one` per document); then iterating
+        over the identifiers in collection B and checking which ones were not matched along the way.
+        """
+
+        with IdentifierSet(max_identifiers_in_memory=max_identifiers_in_memory) as matched_identifiers:
+
+            # Compare the collections, using collection A as the reference.
+            #
+            # Note: In this stage, we get each document from collection A and check whether it exists in collection B.
+            #       If it does, we compare the two documents and display any differences. If it doesn't, we display the
+            #       identifier value from collection A (i.e. the identifier value we failed to find in collection B).
+            #
+            task_a = progress.add_task("Comparing collections, using collection A as reference",
+                                       total=report.num_documents_in_collection_a)
+            num_documents_a = 0
+            for document_a in collection_a.find(filter_a, projection_a):
+
+                # Get the identifier value from the document from collection A.
+                identifier_value_a = self.get_identifier_value(document_a, identifier_field_name_a, "A")
+
+                # Check whether a document having the same identifier value exists in collection B.
+                #
+                # Note: If the identifier value from document A was `None`, we use a special filter
+                #       (when checking collection B) to disambiguate between documents in which the
+                #       identifier field contains `None` and documents in which the identifier field
+                #       does not exist at all. MongoDB does not distinguish between those two cases when
+                #       we use a basic filter like `{field_name: None}`.
+                #
+                identifier_filter_b: dict = {identifier_field_name_b: identifier_value_a}
+                if identifier_value_a is None:
+                    identifier_filter_b = make_pymongo_filter_for_field_having_value_null(identifier_field_name_b)
+                document_b = collection_b.find_one(
+                    filter=combine_pymongo_filters(filter_b, identifier_filter_b),
+                    projection=projection_b,
+                )
+
+                # If such a document exists in collection B, compare it to the one from collection A.
+                if document_b is not None:
+                    matched_identifiers.add(identifier_value_a)
+                    self._process_document_pair(
+                        report=report,
+                        document_a=document_a,
+                        document_b=document_b,
+                        identifier_field_name_a=identifier_field_name_a,
+                        identifier_field_name_b=identifier_field_name_b,
+                        ignore_oid=ignore_oid,
+                    )
+                else:
+                    self._process_document_in_collection_a_only(report, identifier_field_name_a, identifier_value_a)
+
+                # Advance the progress bar by 1.
+                progress.update(task_a, advance=1)
+                num_documents_a += 1
+
+            # Compare the collections, using collection B as the reference.
+            num_documents_b = self._process_unmatched_documents_in_collection_b(
+                report=report,
+                progress=progress,
+                collection_b=collection_b,
+                identifier_field_name_b=identifier_field_name_b,
+                matched_identifiers=matched_identifiers,
+                filter_b=filter_b,
+            )
+        return num_documents_a, num_documents_b
+
+    def _compare_collections_via_batched_lookups(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        batch_size: int,
+        max_identifiers_in_memory: int,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections by iterating over collection A in batches and looking up, in collection
+        B, the documents having the same identifier values as the documents in the batch (i.e. one `$in`
+        query per batch of documents); then iterating over the identifiers in collection B and checking
+        which ones were not matched along the way.
+        """
+
+        with IdentifierSet(max_identifiers_in_memory=max_identifiers_in_memory) as matched_identifiers:
+
+            # Compare the collections, using collection A as the reference.
+            task_a = progress.add_task("Comparing collections, using collection A as reference",
+                                       total=report.num_documents_in_collection_a)
+            num_documents_a = 0
+            for documents_a in iterate_in_chunks(collection_a.find(filter_a, projection_a), chunk_size=batch_size):
+                identifier_values_a = [
+                    self.get_identifier_value(document_a, identifier_field_name_a, "A") for document_a in documents_a
+                ]
+                documents_b_by_key = find_documents_by_identifier_values(
+                    collection=collection_b,
+                    identifier_field_name=identifier_field_name_b,
+                    identifier_values=identifier_values_a,
+                    projection=projection_b,
+                    filter=filter_b,
+                )
+                for document_a, identifier_value_a in zip(documents_a, identifier_values_a):
+                    document_b = documents_b_by_key.get(bson_sort_key(identifier_value_a))
+                    if document_b is not None:
+                        matched_identifiers.add(identifier_value_a)
+                        self._process_document_pair(
+                            report=report,
+                            document_a=document_a,
+                            document_b=document_b,
+                            identifier_field_name_a=identifier_field_name_a,
+                            identifier_field_name_b=identifier_field_name_b,
+                            ignore_oid=ignore_oid,
+                        )
+                    else:
+                        self._process_document_in_collection_a_only(report, identifier_field_name_a,
+                                                                     identifier_value_a)
+
+                # Advance the progress bar by the size of the batch.
+                progress.update(task_a, advance=len(documents_a))
+                num_documents_a += len(documents_a)
+
+            # Compare the collections, using collection B as the reference.
+            num_documents_b = self._process_unmatched_documents_in_collection_b(
+                report=report,
+                progress=progress,
+                collection_b=collection_b,
+                identifier_field_name_b=identifier_field_name_b,
+                matched_identifiers=matched_identifiers,
+                filter_b=filter_b,
+            )
+        return num_documents_a, num_documents_b
+
+    def _process_unmatched_documents_in_collection_b(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_b: Collection,
+        identifier_field_name_b: str,
+        matched_identifiers: "IdentifierSet",
+        filter_b: dict,
+    ) -> int:
+        r"""
+        Iterates over the identifier values in collection B and records—as existing in collection B
+        only—the ones that are not among the identifier values matched while iterating over collection A.
+        Returns the number of documents it read from collection B.
+
+        Note: This does not query collection A at all. That is done under the assumption that the contents
+              of the collections do not change while this script is running (the same assumption we make
+              when we skip re-comparing documents that exist in both collections).
+        """
+
+        task_b = progress.add_task("Comparing collections, using collection B as reference",
+                                   total=report.num_documents_in_collection_b)
+        projection = make_pymongo_projection_for_identifier_field(identifier_field_name_b)
+        num_documents_b = 0
+        for document_b in collection_b.find(filter_b, projection):
+
+            # Get the identifier value from the document from collection B.
+            identifier_value_b = self.get_identifier_value(document_b, identifier_field_name_b, "B")
+
+            # If that identifier value wasn't matched with any in collection A, record it.
+            if identifier_value_b not in matched_identifiers:
+                self._process_document_in_collection_b_only(report, identifier_field_name_b, identifier_value_b)
+
+            # Advance the progress bar by 1.
+            progress.update(task_b, advance=1)
+            num_documents_b += 1
+        return num_documents_b
+
+    def _compare_collections_via_merge(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+        checkpointer: Optional[Checkpointer] = None,
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections by iterating over both of them at the same time, each one sorted by
+        its identifier field, and pairing up documents whose identifier values match (i.e. a merge join).
+
+        This makes a single pass over each collection and performs no per-document lookups. It is
+        efficient when each identifier field is indexed, since MongoDB can then use that index to
+        return the documents in sorted order.
+
+        Note: MongoDB sorts documents in which the identifier field contains `null` alongside documents
+              in which the identifier field does not exist at all. The latter are rejected (via
+              `get_identifier_value`) before they can be paired up with anything, so—as with lookups
+              made via `make_pymongo_filter_for_field_having_value_null`—a `null` identifier value
+              only ever matches another `null` identifier value.
+
+        If a `Checkpointer` is specified, this periodically saves the identifier value up to which
+        (inclusive) both collections have been processed. If the checkpointer has a saved state, this
+        restores the partial result from it and only processes documents whose identifier values come
+        after that one.
+        """
+
+        # Describe the comparison, so we can tell whether a checkpoint belongs to it.
+        checkpoint_context = dict(
+            collection_a=collection_a.full_name,
+            collection_b=collection_b.full_name,
+            identifier_field_name_a=identifier_field_name_a,
+            identifier_field_name_b=identifier_field_name_b,
+            ignore_oid=ignore_oid,
+            filter_a=filter_a,
+            filter_b=filter_b,
+            projection_a=projection_a,
+            projection_b=projection_b,
+        )
+        last_identifier_value: Any = None
+        has_last_identifier_value = False
+        num_processed_documents_a = num_processed_documents_b = 0
+
+        # If we are resuming from a checkpoint, restore the partial result and skip what has been processed.
+        if checkpointer is not None and checkpointer.state is not None:
+            state = checkpointer.state
+            for (name, value) in checkpoint_context.items():
+                if state.get(name) != value:
+                    raise ValueError(
+                        f"Checkpoint does not match this comparison (its `{name}` is {state.get(name)!r})."
+                    )
+            report.restore_counts(
+                num_documents_in_collection_a_only=state["num_documents_in_collection_a_only"],
+                num_documents_in_collection_b_only=state["num_documents_in_collection_b_only"],
+                num_differing_documents=state["num_differing_documents"],
+            )
+            num_processed_documents_a = state["num_processed_documents_a"]
+            num_processed_documents_b = state["num_processed_documents_b"]
+            if "last_identifier_value" in state:
+                last_identifier_value = state["last_identifier_value"]
+                has_last_identifier_value = True
+                filter_a = combine_pymongo_filters(filter_a, make_pymongo_filter_for_field_having_value_after(
+                    identifier_field_name_a, last_identifier_value,
+                ))
+                filter_b = combine_pymongo_filters(filter_b, make_pymongo_filter_for_field_having_value_after(
+                    identifier_field_name_b, last_identifier_value,
+                ))
+            self.console.print(f"Resuming after identifier value: {last_identifier_value!r}", highlight=False)
+
+        def save_checkpoint() -> None:
+            state = dict(
+                checkpoint_context,
+                num_processed_documents_a=num_processed_documents_a,
+                num_processed_documents_b=num_processed_documents_b,
+                num_documents_in_collection_a_only=report.num_documents_in_collection_a_only,
+                num_documents_in_collection_b_only=report.num_documents_in_collection_b_only,
+                num_differing_documents=report.num_differing_documents,
+            )
+            if has_last_identifier_value:
+                state["last_identifier_value"] = last_identifier_value
+            if report.sink is not None:
+                state["report_file_size"] = report.sink.size
+            checkpointer.save(state)
+
+        task_a = progress.add_task("Comparing collections via sorted merge (collection A)",
+                                   total=report.num_documents_in_collection_a, completed=num_processed_documents_a)
+        task_b = progress.add_task("Comparing collections via sorted merge (collection B)",
+                                   total=report.num_documents_in_collection_b, completed=num_processed_documents_b)
+
+        # Note: We allow the server to use temporary files when sorting, in case an identifier field is not
+        #       indexed (in which case the sort would otherwise be limited by the server's in-memory sort limit).
+        cursor_a = collection_a.find(
+            filter_a, projection_a, sort=[(identifier_field_name_a, ASCENDING)], allow_disk_use=True,
+        )
+        cursor_b = collection_b.find(
+            filter_b, projection_b, sort=[(identifier_field_name_b, ASCENDING)], allow_disk_use=True,
+        )
+        keyed_documents_a = (
+            (bson_sort_key(self.get_identifier_value(document_a, identifier_field_name_a, "A")), document_a)
+            for document_a in cursor_a
+        )
+        keyed_documents_b = (
+            (bson_sort_key(self.get_identifier_value(document_b, identifier_field_name_b, "B")), document_b)
+            for document_b in cursor_b
+        )
+
+        for document_a, document_b in merge_sorted_streams(keyed_documents_a, keyed_documents_b):
+            if document_a is not None and document_b is not None:
+                self._process_document_pair(
+                    report=report,
+                    document_a=document_a,
+                    document_b=document_b,
+                    identifier_field_name_a=identifier_field_name_a,
+                    identifier_field_name_b=identifier_field_name_b,
+                    ignore_oid=ignore_oid,
+                )
+            elif document_a is not None:
+                identifier_value_a = self.get_identifier_value(document_a, identifier_field_name_a, "A")
+                self._process_document_in_collection_a_only(report, identifier_field_name_a, identifier_value_a)
+            else:
+                identifier_value_b = self.get_identifier_value(document_b, identifier_field_name_b, "B")
+                self._process_document_in_collection_b_only(report, identifier_field_name_b, identifier_value_b)
+
+            # Advance the progress bar(s) by 1.
+            if document_a is not None:
+                progress.update(task_a, advance=1)
+                num_processed_documents_a += 1
+            if document_b is not None:
+                progress.update(task_b, advance=1)
+                num_processed_documents_b += 1
+
+            # Every so often, save a checkpoint (now that we've processed everything up to this identifier value).
+            if checkpointer is not None:
+                if document_a is not None:
+                    last_identifier_value = self.get_identifier_value(document_a, identifier_field_name_a, "A")
+                else:
+                    last_identifier_value = self.get_identifier_value(document_b, identifier_field_name_b, "B")
+                has_last_identifier_value = True
+                if checkpointer.is_due:
+                    save_checkpoint()
+
+        if checkpointer is not None:
+            save_checkpoint()
+        return num_processed_documents_a, num_processed_documents_b
+
+    def _compare_collections_via_fingerprints(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        batch_size: int,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections by reducing each document to an `(identifier, digest)` pair—each
+        collection sorted by its identifier field—and merging the two streams of pairs. Fetches the full
+        documents again (in batches) only when their digests differ, and then compares those documents
+        as usual; so this avoids decoding and comparing the documents whose digests match.
+
+        Note: The digests are computed locally, from the documents' raw BSON (see `iterate_fingerprints`),
+              so this reads every document in full—it transfers at least as many bytes as `Strategy.MERGE`
+              does, plus the documents it fetches again. The server can hash documents too (via
+              `$toHashedIndexKey`), but that truncates fractional numbers to integers (e.g. `1.2` and `1.7`
+              would have the same digest), so it can't be used to avoid transferring the documents.
+        """
+
+        task_a = progress.add_task("Comparing collections via fingerprints (collection A)",
+                                   total=report.num_documents_in_collection_a)
+        task_b = progress.add_task("Comparing collections via fingerprints (collection B)",
+                                   total=report.num_documents_in_collection_b)
+
+        keyed_fingerprints_a = (
+            (bson_sort_key(self.get_identifier_value(fingerprint, "identifier", "A")), fingerprint)
+            for fingerprint in iterate_fingerprints(
+                collection_a, identifier_field_name_a, ignore_oid, filter_a, projection_a
+            )
+        )
+        keyed_fingerprints_b = (
+            (bson_sort_key(self.get_identifier_value(fingerprint, "identifier", "B")), fingerprint)
+            for fingerprint in iterate_fingerprints(
+                collection_b, identifier_field_name_b, ignore_oid, filter_b, projection_b
+            )
+        )
+
+        # Collect the identifier values of documents whose digests differ, and compare those documents a batch at
+        # a time (so we can fetch each batch of documents via a single query per collection).
+        mismatched_identifier_values: list = []
+        num_documents_a = num_documents_b = 0
+
+        def process_mismatched_documents() -> None:
+            documents_a_by_key = find_documents_by_identifier_values(
+                collection=collection_a,
+                identifier_field_name=identifier_field_name_a,
+                identifier_values=mismatched_identifier_values,
+                projection=projection_a,
+                filter=filter_a,
+            )
+            documents_b_by_key = find_documents_by_identifier_values(
+                collection=collection_b,
+                identifier_field_name=identifier_field_name_b,
+                identifier_values=mismatched_identifier_values,
+                projection=projection_b,
+                filter=filter_b,
+            )
+            # Note: A document may have been deleted since we read its fingerprint.
+            for identifier_value in mismatched_identifier_values:
+                document_a = documents_a_by_key.get(bson_sort_key(identifier_value))
+                document_b = documents_b_by_key.get(bson_sort_key(identifier_value))
+                if document_a is not None and document_b is not None:
+                    self._process_document_pair(
+                        report=report,
+                        document_a=document_a,
+                        document_b=document_b,
+                        identifier_field_name_a=identifier_field_name_a,
+                        identifier_field_name_b=identifier_field_name_b,
+                        ignore_oid=ignore_oid,
+                    )
+                elif document_a is not None:
+                    self._process_document_in_collection_a_only(report, identifier_field_name_a, identifier_value)
+                elif document_b is not None:
+                    self._process_document_in_collection_b_only(report, identifier_field_name_b, identifier_value)
+            mismatched_identifier_values.clear()
+
+        for fingerprint_a, fingerprint_b in merge_sorted_streams(keyed_fingerprints_a, keyed_fingerprints_b):
+            if fingerprint_a is not None and fingerprint_b is not None:
+                if fingerprint_a["digest"] != fingerprint_b["digest"]:
+                    mismatched_identifier_values.append(fingerprint_a["identifier"])
+                    if len(mismatched_identifier_values) >= batch_size:
+                        process_mismatched_documents()
+            elif fingerprint_a is not None:
+                self._process_document_in_collection_a_only(report, identifier_field_name_a,
+                                                             fingerprint_a["identifier"])
+            else:
+                self._process_document_in_collection_b_only(report, identifier_field_name_b,
+                                                             fingerprint_b["identifier"])
+
+            # Advance the progress bar(s) by 1.
+            if fingerprint_a is not None:
+                progress.update(task_a, advance=1)
+                num_documents_a += 1
+            if fingerprint_b is not None:
+                progress.update(task_b, advance=1)
+                num_documents_b += 1
+
+        process_mismatched_documents()
+        return num_documents_a, num_documents_b
+
+    def _compare_collections_via_hash_index(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        batch_size: int,
+        max_identifiers_in_memory: int,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections by reading the smaller one (according to the numbers of documents in the
+        report) into a client-side hash index that maps each identifier value to the document's `_id` value
+        and digest (see `IdentifierIndex`); and then iterating over the larger one, looking up each document's
+        counterpart in that index. Fetches counterparts—by `_id` value, which MongoDB always indexes, and a
+        batch at a time—only when their digests differ.
+
+        So, this makes a single pass over each collection, and doesn't need an index on either identifier
+        field; unlike `Strategy.LOOKUP` and `Strategy.BATCH`, whose lookups each scan the whole collection
+        when the identifier field isn't indexed.
+        """
+
+        # Index the smaller collection (the "build" side), and iterate over the larger one (the "probe" side).
+        sides = [
+            (collection_a, identifier_field_name_a, filter_a, projection_a, "A"),
+            (collection_b, identifier_field_name_b, filter_b, projection_b, "B"),
+        ]
+        if report.num_documents_in_collection_b < report.num_documents_in_collection_a:
+            sides.reverse()
+        ((build_collection, build_field_name, build_filter, build_projection, build_label),
+         (probe_collection, probe_field_name, probe_filter, probe_projection, probe_label)) = sides
+        num_documents_by_label = dict(A=report.num_documents_in_collection_a, B=report.num_documents_in_collection_b)
+        num_read_documents_by_label = dict(A=0, B=0)
+
+        def process_document_in_one_collection_only(label: str, identifier_value: Any) -> None:
+            if label == "A":
+                self._process_document_in_collection_a_only(report, identifier_field_name_a, identifier_value)
+            else:
+                self._process_document_in_collection_b_only(report, identifier_field_name_b, identifier_value)
+
+        with IdentifierIndex(max_entries_in_memory=max_identifiers_in_memory) as index:
+            build_task = progress.add_task(f"Indexing identifiers of collection {build_label}",
+                                           total=num_documents_by_label[build_label])
+            for document in build_collection.find(build_filter, build_projection):
+                identifier_value = self.get_identifier_value(document, build_field_name, build_label)
+                index[identifier_value] = dict(
+                    identifier=identifier_value,
+                    oid=decode_raw_bson_document(document["_id"]),
+                    digest=compute_digest(document, ignore_oid=ignore_oid),
+                )
+                progress.update(build_task, advance=1)
+                num_read_documents_by_label[build_label] += 1
+
+            probe_task = progress.add_task(f"Comparing collections, using collection {probe_label} as reference",
+                                           total=num_documents_by_label[probe_label])
+            for probe_documents in iterate_in_chunks(probe_collection.find(probe_filter, probe_projection), batch_size):
+
+                # Look up each document's counterpart in the index, and note the ones whose digests differ.
+                mismatched_documents = []
+                for probe_document in probe_documents:
+                    identifier_value = self.get_identifier_value(probe_document, probe_field_name, probe_label)
+                    entry = index.pop(identifier_value)
+                    if entry is None:
+                        process_document_in_one_collection_only(probe_label, identifier_value)
+                    elif entry["digest"] != compute_digest(probe_document, ignore_oid=ignore_oid):
+                        mismatched_documents.append((entry["oid"], probe_document))
+
+                # Fetch the counterparts of the documents whose digests differ, and compare them as usual.
+                if len(mismatched_documents) > 0:
+                    oid_values = [oid_value for (oid_value, _) in mismatched_documents]
+                    build_documents_by_key = {
+                        bson_sort_key(decode_raw_bson_document(build_document["_id"])): build_document
+                        for build_document in build_collection.find(
+                            combine_pymongo_filters(build_filter, {"_id": {"$in": oid_values}}), build_projection,
+                        )
+                    }
+                    for (oid_value, probe_document) in mismatched_documents:
+                        build_document = build_documents_by_key.get(bson_sort_key(oid_value))
+                        if build_document is None:
+                            # The document was deleted from the indexed collection after we indexed it.
+                            identifier_value = self.get_identifier_value(probe_document, probe_field_name, probe_label)
+                            process_document_in_one_collection_only(probe_label, identifier_value)
+                            continue
+                        (document_a, document_b) = (build_document, probe_document) if build_label == "A" else (
+                            probe_document, build_document
+                        )
+                        self._process_document_pair(
+                            report=report,
+                            document_a=document_a,
+                            document_b=document_b,
+                            identifier_field_name_a=identifier_field_name_a,
+                            identifier_field_name_b=identifier_field_name_b,
+                            ignore_oid=ignore_oid,
+                        )
+
+                progress.update(probe_task, advance=len(probe_documents))
+                num_read_documents_by_label[probe_label] += len(probe_documents)
+
+            # Whatever remains in the index had no counterpart.
+            for entry in index.values():
+                process_document_in_one_collection_only(build_label, entry["identifier"])
+        return num_read_documents_by_label["A"], num_read_documents_by_label["B"]
+
+    def _compare_collections_via_external_sort(
+        self,
+        report: Result,
+        progress: Progress,
+        collection_a: Collection,
+        collection_b: Collection,
+        identifier_field_name_a: str,
+        identifier_field_name_b: str,
+        ignore_oid: bool,
+        batch_size: int,
+        memory_limit: int,
+        filter_a: dict,
+        filter_b: dict,
+        projection_a: Optional[dict],
+        projection_b: Optional[dict],
+    ) -> Tuple[int, int]:
+        r"""
+        Compares the collections by reading an `(identifier, _id, digest)` fingerprint of each document from
+        each collection—in whatever order the servers read them—and sorting each collection's fingerprints on
+        the client (see `ExternalSorter`), keyed by an encoding of the identifier value that sorts the way
+        MongoDB does (see `encode_sort_key`); and then merging the two sorted streams of fingerprints. Fetches
+        documents—by `_id` value, which MongoDB always indexes, and a batch at a time—only when their digests
+        differ.
+
+        So, this makes a single pass over each collection, doesn't need an index on either identifier field,
+        and—unlike `Strategy.HASH`—keeps at most about `memory_limit` bytes of fingerprints in memory however
+        large the collections are. The digests are computed locally (see `compute_digest`).
+        """
+
+        num_documents_by_label = dict(A=report.num_documents_in_collection_a, B=report.num_documents_in_collection_b)
+        num_read_documents_by_label = dict(A=0, B=0)
+        with ExternalSorter(memory_limit // 2) as sorter_a, ExternalSorter(memory_limit // 2) as sorter_b:
+
+            # Read the fingerprints of each collection into its sorter.
+            for (label, collection, identifier_field_name, filter, projection, sorter) in [
+                ("A", collection_a, identifier_field_name_a, filter_a, projection_a, sorter_a),
+                ("B", collection_b, identifier_field_name_b, filter_b, projection_b, sorter_b),
+            ]:
+                task = progress.add_task(f"Reading digests of collection {label}",
+                                         total=num_documents_by_label[label])
+                fingerprints = iterate_fingerprints(
+                    collection, identifier_field_name, ignore_oid, filter, projection, sort=False,
+                )
+                for fingerprint in fingerprints:
+                    identifier_value = self.get_identifier_value(fingerprint, "identifier", label)
+                    entry = dict(identifier=identifier_value, oid=fingerprint["oid"], digest=fingerprint["digest"])
+                    sorter.add(encode_sort_key(identifier_value), bson.encode(entry))
+                    progress.update(task, advance=1)
+                    num_read_documents_by_label[label] += 1
+
+            # Collect the (identifier and) `_id` values of documents whose digests differ, and compare those documents
+            # a batch at a time (so we can fetch each batch of documents via a single query per collection).
+            mismatched_oid_values: list[Tuple[Any, Any, Any]] = []
+
+            def process_mismatched_documents() -> None:
+                if len(mismatched_oid_values) == 0:
+                    return
+                documents_by_key = []
+                for (collection, filter, projection, oid_position) in [
+                    (collection_a, filter_a, projection_a, 1),
+                    (collection_b, filter_b, projection_b, 2),
+                ]:
+                    oid_values = [mismatched_oid_value[oid_position] for mismatched_oid_value in mismatched_oid_values]
+                    documents_by_key.append({
+                        bson_sort_key(decode_raw_bson_document(document["_id"])): document
+                        for document in collection.find(
+                            combine_pymongo_filters(filter, {"_id": {"$in": oid_values}}), projection,
+                        )
+                    })
+                # Note: A document may have been deleted since we read its fingerprint.
+                for (identifier_value, oid_value_a, oid_value_b) in mismatched_oid_values:
+                    document_a = documents_by_key[0].get(bson_sort_key(oid_value_a))
+                    document_b = documents_by_key[1].get(bson_sort_key(oid_value_b))
+                    if document_a is not None and document_b is not None:
+                        self._process_document_pair(
+                            report=report,
+                            document_a=document_a,
+                            document_b=document_b,
+                            identifier_field_name_a=identifier_field_name_a,
+                            identifier_field_name_b=identifier_field_name_b,
+                            ignore_oid=ignore_oid,
+                        )
+                    elif document_a is not None:
+                        self._process_document_in_collection_a_only(report, identifier_field_name_a, identifier_value)
+                    elif document_b is not None:
+                        self._process_document_in_collection_b_only(report, identifier_field_name_b, identifier_value)
+                mismatched_oid_values.clear()
+
+            # Merge the sorted fingerprints.
+            for (encoded_entry_a, encoded_entry_b) in merge_sorted_streams(sorter_a, sorter_b):
+                entry_a = None if encoded_entry_a is None else bson.decode(encoded_entry_a)
+                entry_b = None if encoded_entry_b is None else bson.decode(encoded_entry_b)
+                if entry_a is not None and entry_b is not None:
+                    if entry_a["digest"] != entry_b["digest"]:
+                        mismatched_oid_values.append((entry_a["identifier"], entry_a["oid"], entry_b["oid"]))
+                        if len(mismatched_oid_values) >= batch_size:
+                            process_mismatched_documents()
+                elif entry_a is not None:
+                    self._process_document_in_collection_a_only(report, identifier_field_name_a, entry_a["identifier"])
+                elif entry_b is not None:
+                    self._process_document_in_collection_b_only(report, identifier_field_name_b, entry_b["identifier"])
+            process_mismatched_documents()
+        return num_read_documents_by_label["A"], num_read_documents_by_label["B"]
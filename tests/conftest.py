@@ -0,0 +1,145 @@
+r"""
+Fixtures shared by the tests, which use mongomock in place of MongoDB servers.
+
+Docs: https://github.com/mongomock/mongomock
+"""
+
+from typing import Any, Callable, Optional
+
+import mongomock
+import mongomock.codec_options
+import mongomock.filtering
+import pytest
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from mongomock.collection import Collection, Cursor
+from mongomock.database import Database
+from pymongo.errors import OperationFailure
+from typer.testing import CliRunner
+from typer.testing import Result as CliResult
+
+import mongo_diff.cli
+from mongo_diff.cli import app
+from tests.helpers import RawBSONCollection
+
+
+@pytest.fixture(autouse=True)
+def fill_gaps_in_mongomock(monkeypatch: pytest.MonkeyPatch) -> None:
+    r"""
+    Makes mongomock behave the way a MongoDB server would in the cases the tool relies upon, but mongomock
+    does not implement:
+
+    - An aggregation stage mongomock does not implement (e.g. `$bucketAuto`) fails the way it would on a
+      server that does not support it, so the tool falls back to its alternative.
+    - The `$type` operator accepts a list of type names, and matches no value for the type names mongomock
+      does not implement (e.g. `minKey`), since the tests don't store values of those types.
+    - Explaining a query fails the way it would on a server that can't explain it, so the tool plans the
+      comparison based upon the collections' indexes alone.
+    - Listing the collections of type "collection" lists all of them, since mongomock doesn't implement views.
+    - Reading a collection via codec options whose document class is `RawBSONDocument` yields documents of that
+      class (mongomock only implements `dict`), so the tool can hash and compare the documents' raw BSON.
+    """
+
+    original_aggregate = Collection.aggregate
+
+    def aggregate(self: Collection, pipeline: list, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return original_aggregate(self, pipeline, *args, **kwargs)
+        except NotImplementedError as error:
+            raise OperationFailure(str(error))
+
+    original_type_op = mongomock.filtering._type_op
+
+    def type_op(value: Any, type_names: Any) -> bool:
+        if isinstance(type_names, list):
+            return any(type_op(value, type_name) for type_name in type_names)
+        try:
+            return original_type_op(value, type_names)
+        except NotImplementedError:
+            return False
+
+    def explain(self: Cursor) -> dict:
+        raise OperationFailure("mongomock can't explain queries.")
+
+    original_list_collection_names = Database.list_collection_names
+
+    def list_collection_names(self: Database, filter: Optional[dict] = None, *args: Any, **kwargs: Any) -> list[str]:
+        if filter == {"type": "collection"}:
+            filter = None
+        return original_list_collection_names(self, filter, *args, **kwargs)
+
+    original_with_codec_options = mongomock.codec_options.CodecOptions.with_options
+    original_with_options = Collection.with_options
+
+    def with_codec_options(self: Any, **kwargs: Any) -> Any:
+        if kwargs.get("document_class") is RawBSONDocument:
+            return CodecOptions(document_class=RawBSONDocument)
+        return original_with_codec_options(self, **kwargs)
+
+    def with_options(self: Collection, codec_options: Any = None, *args: Any, **kwargs: Any) -> Any:
+        if codec_options is not None and codec_options.document_class is RawBSONDocument:
+            return RawBSONCollection(self)
+        return original_with_options(self, codec_options, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.codec_options.CodecOptions, "with_options", with_codec_options)
+    monkeypatch.setattr(Collection, "with_options", with_options)
+    monkeypatch.setattr(Collection, "aggregate", aggregate)
+    monkeypatch.setattr(Database, "list_collection_names", list_collection_names)
+    monkeypatch.setattr(Cursor, "explain", explain, raising=False)
+    monkeypatch.setitem(mongomock.filtering._filterer_inst._operator_map, "$type", type_op)
+
+
+@pytest.fixture
+def mongo_client() -> mongomock.MongoClient:
+    r"""Returns an in-memory stand-in for a `MongoClient`."""
+
+    return mongomock.MongoClient()
+
+
+@pytest.fixture
+def collection_a(mongo_client: mongomock.MongoClient) -> Collection:
+    return mongo_client["db_a"]["things"]
+
+
+@pytest.fixture
+def collection_b(mongo_client: mongomock.MongoClient) -> Collection:
+    return mongo_client["db_b"]["things"]
+
+
+@pytest.fixture
+def populated_collections(collection_a: Collection, collection_b: Collection) -> tuple[Collection, Collection]:
+    r"""
+    Populates collections A and B with documents identified by their `id` field, and returns them. Where:
+
+    - Documents 1 through 10 are in both collections, and are identical (except for their `_id` values).
+    - Document 11 is only in collection A; and documents 12 and "twelve" are only in collection B.
+    - Documents 2 and 7 differ: the former in a nested field, and the latter only in the fractional
+      part of a number.
+    """
+
+    documents = [{"id": i, "name": f"thing {i}", "details": {"size": i * 10, "tags": ["x", "y"]}} for i in range(1, 11)]
+    collection_a.insert_many([{**document} for document in documents] + [{"id": 11, "name": "thing 11"}])
+    documents[1] = {**documents[1], "details": {"size": 20, "tags": ["x", "z"]}}
+    documents[6] = {**documents[6], "weight": 1.7}
+    collection_a.update_one({"id": 7}, {"$set": {"weight": 1.2}})
+    collection_b.insert_many(documents + [{"id": 12, "name": "thing 12"}, {"id": "twelve", "name": "thing 12"}])
+    return (collection_a, collection_b)
+
+
+@pytest.fixture
+def invoke_cli(monkeypatch: pytest.MonkeyPatch, mongo_client: mongomock.MongoClient) -> Callable[..., CliResult]:
+    r"""
+    Returns a function that invokes the CLI with the specified arguments, letting any exception propagate. The
+    CLI connects to the in-memory "server" (containing the collections the other fixtures return), whatever the
+    connection string.
+    """
+
+    def connect_to_database(console: Any, mongo_uri: str, database_name: str, *args: Any, **kwargs: Any) -> Any:
+        return mongo_client[database_name]
+
+    monkeypatch.setattr(mongo_diff.cli, "connect_to_database", connect_to_database)
+
+    def invoke(*args: str) -> CliResult:
+        return CliRunner().invoke(app, list(args), catch_exceptions=False)
+
+    return invoke
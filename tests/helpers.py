@@ -0,0 +1,78 @@
+r"""Helper functions shared by the tests."""
+
+from collections import Counter
+from typing import Any
+
+import bson
+from bson.raw_bson import RawBSONDocument
+from mongomock.collection import Collection
+
+from mongo_diff.bson_utils import bson_sort_key
+from mongo_diff.results import Result
+
+
+def summarize(result: Result) -> dict:
+    r"""
+    Returns the numbers of documents the result counted, and the identifier values it recorded (each group
+    ordered by identifier value, as the order in which the strategies record them varies).
+    """
+
+    return dict(
+        num_a=result.num_documents_in_collection_a,
+        num_b=result.num_documents_in_collection_b,
+        a_only=sorted(result.identifiers_of_documents_in_collection_a_only, key=bson_sort_key),
+        b_only=sorted(result.identifiers_of_documents_in_collection_b_only, key=bson_sort_key),
+        differing=sorted(result.identifiers_of_differing_documents, key=bson_sort_key),
+    )
+
+
+# The CLI options that select the collections the `populated_collections` fixture populates.
+COLLECTION_OPTIONS = [
+    "--mongo-uri-a", "mongodb://localhost", "--database-name-a", "db_a", "--collection-name-a", "things",
+    "--database-name-b", "db_b",
+]
+
+# The summary of comparing the collections the `populated_collections` fixture populates.
+EXPECTED_SUMMARY = dict(num_a=11, num_b=12, a_only=[11], b_only=[12, "twelve"], differing=[2, 7])
+
+
+class QueryCountingCollection:
+    r"""Wraps a collection, counting the calls to each of its query methods (e.g. `find`)."""
+
+    QUERY_METHOD_NAMES = ("find", "find_one", "aggregate", "count_documents")
+
+    def __init__(self, collection: Collection) -> None:
+        self.collection = collection
+        self.num_calls: Counter = Counter()
+
+    def __getattr__(self, name: str) -> Any:
+        if name in self.QUERY_METHOD_NAMES:
+            self.num_calls[name] += 1
+        return getattr(self.collection, name)
+
+    def with_options(self, *args: Any, **kwargs: Any) -> "QueryCountingCollection":
+        r"""Returns the wrapped collection with the specified options, counting its calls along with this one's."""
+
+        collection = QueryCountingCollection(self.collection.with_options(*args, **kwargs))
+        collection.num_calls = self.num_calls
+        return collection
+
+
+class RawBSONCollection:
+    r"""
+    Wraps a mongomock collection, yielding the documents its `find` and `find_one` methods return as
+    `RawBSONDocument` instances (as a PyMongo collection whose codec options specify that document class would).
+    """
+
+    def __init__(self, collection: Collection) -> None:
+        self.collection = collection
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def find(self, *args: Any, **kwargs: Any) -> Any:
+        return (RawBSONDocument(bson.encode(document)) for document in self.collection.find(*args, **kwargs))
+
+    def find_one(self, *args: Any, **kwargs: Any) -> Any:
+        document = self.collection.find_one(*args, **kwargs)
+        return None if document is None else RawBSONDocument(bson.encode(document))
@@ -0,0 +1,89 @@
+r"""Tests of the asyncio-based comparison of collections (see `AsyncComparator`)."""
+
+import asyncio
+from typing import Any, AsyncIterator
+
+import pytest
+from mongomock.collection import Collection
+
+from mongo_diff.async_comparator import AsyncComparator
+from mongo_diff.comparator import Comparator
+from mongo_diff.reports import ReportSink
+from mongo_diff.strategies import Strategy
+from tests.helpers import EXPECTED_SUMMARY, summarize
+
+
+class AsyncCollectionAdapter:
+    r"""Exposes (the parts of) a mongomock collection that `AsyncComparator` uses, the way an `AsyncCollection` does."""
+
+    def __init__(self, collection: Collection) -> None:
+        self.collection = collection
+
+    async def count_documents(self, filter: dict) -> int:
+        return self.collection.count_documents(filter)
+
+    async def estimated_document_count(self) -> int:
+        return self.collection.estimated_document_count()
+
+    def find(self, *args: Any, **kwargs: Any) -> AsyncIterator[dict]:
+        async def iterate_documents() -> AsyncIterator[dict]:
+            for document in self.collection.find(*args, **kwargs):
+                await asyncio.sleep(0)  # let the other tasks run, as waiting for the server would
+                yield document
+
+        return iterate_documents()
+
+
+def compare_collections_asynchronously(collection_a: Collection, collection_b: Collection, **options: Any) -> Any:
+    coroutine = AsyncComparator().compare_collections_async(
+        AsyncCollectionAdapter(collection_a), AsyncCollectionAdapter(collection_b), "id", "id", **options,
+    )
+    return asyncio.run(coroutine)
+
+
+@pytest.mark.parametrize("prefetch_size", [1, 1000])
+def test_async_comparator_produces_the_same_result_as_merge(
+    populated_collections: tuple[Collection, Collection], prefetch_size: int,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = compare_collections_asynchronously(collection_a, collection_b, ignore_oid=True,
+                                                prefetch_size=prefetch_size)
+    assert summarize(result) == EXPECTED_SUMMARY
+    merge_result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                                    strategy=Strategy.MERGE)
+    assert list(result.iterate_differing_documents()) == list(merge_result.iterate_differing_documents())
+
+
+def test_async_comparator_applies_filters_and_streams_records(
+    populated_collections: tuple[Collection, Collection], tmp_path: Any,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    report_path = str(tmp_path / "report.jsonl")
+    with ReportSink.for_path(report_path) as sink:
+        result = compare_collections_asynchronously(collection_a, collection_b, ignore_oid=True,
+                                                    filter_a={"id": {"$gte": 5}}, filter_b={"id": {"$gte": 5}},
+                                                    report_sink=sink)
+    assert (result.num_documents_in_collection_a, result.num_documents_in_collection_b) == (7, 7)
+    records = list(ReportSink.read_records(report_path))
+    assert [(record["kind"], record["identifier"]) for record in records] == [
+        ("differing", 7), ("collection_a_only", 11), ("collection_b_only", 12),
+    ]
+
+
+def test_async_comparator_raises_errors_of_its_readers(collection_a: Collection, collection_b: Collection) -> None:
+    collection_a.insert_many([{"id": 1}, {"id": 1}])
+    with pytest.raises(ValueError, match="not sorted by key"):
+        compare_collections_asynchronously(collection_a, collection_b, ignore_oid=True)
+
+
+def test_async_comparator_still_compares_collections_synchronously(
+    populated_collections: tuple[Collection, Collection],
+) -> None:
+    r"""
+    Regression test: `AsyncComparator` used to override `compare_collections` with a coroutine function, so it
+    couldn't be used in place of a `Comparator`.
+    """
+
+    (collection_a, collection_b) = populated_collections
+    result = AsyncComparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True)
+    assert summarize(result) == EXPECTED_SUMMARY
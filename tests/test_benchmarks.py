@@ -0,0 +1,24 @@
+r"""Tests of the collections the benchmark generates (see `benchmarks/compare_collections.py`)."""
+
+import pytest
+from mongomock.collection import Collection
+
+from benchmarks.compare_collections import generate_collection_pair
+from mongo_diff.comparator import Comparator
+from mongo_diff.strategies import Strategy
+
+
+@pytest.mark.parametrize("identifier_type", ["int", "string", "objectid", "mixed"])
+@pytest.mark.parametrize("strategy", [Strategy.LOOKUP, Strategy.SORT])
+def test_generated_collections_differ_as_expected(
+    collection_a: Collection, collection_b: Collection, identifier_type: str, strategy: Strategy,
+) -> None:
+    scenario = dict(num_documents=200, depth=2, width=3, percent_differing=10, percent_a_only=5, percent_b_only=5,
+                    identifier_type=identifier_type, indexed=True, seed=1)
+    expected = generate_collection_pair(collection_a, collection_b, scenario)
+    assert expected["num_differing"] >= 2  # so at least one pair differs only in a fractional part
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy)
+    assert (result.num_documents_in_collection_a_only, result.num_documents_in_collection_b_only,
+            result.num_differing_documents) == (expected["num_a_only"], expected["num_b_only"],
+                                                expected["num_differing"])
@@ -0,0 +1,134 @@
+r"""
+Tests of the re-comparison of collections driven by change streams (see `compare_collections_incrementally`) against
+a real replica set, since mongomock doesn't support change streams (so `test_incremental_comparison.py` fakes them).
+
+These tests run only if the `MONGO_DIFF_TEST_REPLICA_SET_URI` environment variable contains the connection string of
+a replica set (of MongoDB 6.0 or later, which supports pre-images); e.g. a single-node one (see the README). They
+create—and then drop—databases whose names start with `mongo_diff_test_`.
+"""
+
+import io
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+from pymongo import MongoClient
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.write_concern import WriteConcern
+from rich.console import Console
+
+from mongo_diff.comparator import Comparator
+from tests.helpers import summarize
+
+REPLICA_SET_URI = os.environ.get("MONGO_DIFF_TEST_REPLICA_SET_URI")
+
+pytestmark = pytest.mark.skipif(REPLICA_SET_URI is None,
+                                reason="The MONGO_DIFF_TEST_REPLICA_SET_URI environment variable is not set.")
+
+
+@pytest.fixture
+def database_name_prefix() -> str:
+    r"""Returns a prefix for the names of the databases the test creates, which no other test run uses."""
+
+    return f"mongo_diff_test_{uuid.uuid4().hex[:8]}_"
+
+
+@pytest.fixture
+def mongo_client(database_name_prefix: str) -> Iterator[MongoClient]:
+    r"""Returns a client connected to the replica set, and drops the databases the test created via it afterward."""
+
+    client: MongoClient = MongoClient(REPLICA_SET_URI)
+    try:
+        yield client
+    finally:
+        for database_name in client.list_database_names():
+            if database_name.startswith(database_name_prefix):
+                client.drop_database(database_name)
+        client.close()
+
+
+def create_collection(database: Database) -> Collection:
+    r"""
+    Creates a collection on which pre-images are enabled (so its change stream can tell which identifier value
+    a deleted document had), whose writes wait for a majority of the replica set (so its change stream includes
+    them as soon as they return).
+    """
+
+    database = database.with_options(write_concern=WriteConcern("majority"))
+    return database.create_collection("things", changeStreamPreAndPostImages={"enabled": True})
+
+
+# Note: These fixtures override the (mongomock) ones in `conftest.py`, so `populated_collections` populates these.
+@pytest.fixture
+def collection_a(mongo_client: MongoClient, database_name_prefix: str) -> Collection:
+    return create_collection(mongo_client[f"{database_name_prefix}a"])
+
+
+@pytest.fixture
+def collection_b(mongo_client: MongoClient, database_name_prefix: str) -> Collection:
+    return create_collection(mongo_client[f"{database_name_prefix}b"])
+
+
+def compare_incrementally(collection_a: Collection, collection_b: Collection, state_path: str) -> tuple[dict, str]:
+    r"""Compares the collections incrementally, and returns the summary of the result, along with the output."""
+
+    output = io.StringIO()
+    result = Comparator(console=Console(file=output, width=200)).compare_collections_incrementally(
+        collection_a, collection_b, "id", "id", ignore_oid=True, state_path=state_path,
+    )
+    return summarize(result), output.getvalue()
+
+
+def compare_in_full(collection_a: Collection, collection_b: Collection) -> dict:
+    return summarize(Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True))
+
+
+def test_recompares_documents_changed_according_to_pre_images(
+    populated_collections: tuple[Collection, Collection], tmp_path: Path,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    state_path = str(tmp_path / "state.json")
+    (summary, _) = compare_incrementally(collection_a, collection_b, state_path)
+    assert summary == compare_in_full(collection_a, collection_b)
+
+    # Note: Only the pre-images of documents 6 and 11 reveal the identifier values they had before changing.
+    collection_b.update_one({"id": 2}, {"$set": {"details": {"size": 20, "tags": ["x", "y"]}}})
+    collection_a.update_one({"id": 5}, {"$set": {"name": "something else"}})
+    collection_a.update_one({"id": 6}, {"$set": {"id": 13}})
+    collection_a.delete_one({"id": 11})
+    collection_b.insert_one({"id": 14})
+    (summary, output) = compare_incrementally(collection_a, collection_b, state_path)
+    assert "Comparing collections in full" not in output
+    assert "Re-comparing 6 document(s) changed since the previous comparison, and 5 document(s) that differed then." \
+        in output
+    assert summary["a_only"] == [13] and summary["b_only"] == [6, 12, 14, "twelve"]
+    assert summary["differing"] == [5, 7]
+    assert summary == compare_in_full(collection_a, collection_b)
+
+
+@pytest.mark.parametrize("change", ["delete without pre-image", "drop"])
+def test_compares_in_full_when_change_stream_has_gap(
+    populated_collections: tuple[Collection, Collection], tmp_path: Path, change: str,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    state_path = str(tmp_path / "state.json")
+    compare_incrementally(collection_a, collection_b, state_path)
+
+    if change == "delete without pre-image":
+        collection_b.database.command("collMod", collection_b.name, changeStreamPreAndPostImages={"enabled": False})
+        collection_b.delete_one({"id": 3})
+    else:
+        documents: list[Any] = list(collection_b.find())
+        collection_b.drop()
+        collection_b.insert_many(documents)
+    (summary, output) = compare_incrementally(collection_a, collection_b, state_path)
+    assert "Comparing collections in full, because:" in output
+    assert summary == compare_in_full(collection_a, collection_b)
+
+    # Check that the full comparison saved a usable state.
+    (summary, output) = compare_incrementally(collection_a, collection_b, state_path)
+    assert "Comparing collections in full" not in output
+    assert summary == compare_in_full(collection_a, collection_b)
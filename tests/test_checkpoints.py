@@ -0,0 +1,95 @@
+r"""Tests of saving checkpoints of comparisons, and of resuming comparisons from them (see `Checkpointer`)."""
+
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import pytest
+from mongomock.collection import Collection
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.reports import Checkpointer, ReportSink
+from mongo_diff.strategies import Strategy
+from tests.helpers import COLLECTION_OPTIONS
+
+
+class Interruption(Exception):
+    r"""Stands in for whatever interrupts a comparison (e.g. the user pressing Ctrl+C)."""
+
+
+def interrupt_after(monkeypatch: pytest.MonkeyPatch, num_pairs: int) -> None:
+    r"""Makes the comparator raise an `Interruption` when it processes the nth pair of documents."""
+
+    original_process_document_pair = Comparator._process_document_pair
+    num_calls = 0
+
+    def process_document_pair(self: Comparator, *args: Any, **kwargs: Any) -> None:
+        nonlocal num_calls
+        num_calls += 1
+        if num_calls == num_pairs:
+            raise Interruption()
+        original_process_document_pair(self, *args, **kwargs)
+
+    monkeypatch.setattr(Comparator, "_process_document_pair", process_document_pair)
+
+
+def get_record_summaries(report_path: str) -> list[tuple]:
+    return [(record["kind"], record.get("identifier")) for record in ReportSink.read_records(report_path)]
+
+
+@pytest.mark.parametrize("num_pairs", [2, 5, 10])
+def test_resumed_comparison_produces_the_same_report(
+    populated_collections: tuple[Collection, Collection], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+    num_pairs: int,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    (checkpoint_path, report_path) = (str(tmp_path / "checkpoint.json"), str(tmp_path / "report.jsonl"))
+
+    def compare(checkpointer: Optional[Checkpointer], resume_at: Optional[int] = None) -> None:
+        with ReportSink.for_path(report_path, resume_at=resume_at) as sink:
+            if resume_at is None:
+                sink.write_header("id", "id")
+            result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                                      strategy=Strategy.MERGE, report_sink=sink,
+                                                      checkpointer=checkpointer)
+            sink.write_summary(result)
+
+    compare(checkpointer=None)
+    expected_record_summaries = get_record_summaries(report_path)
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, num_pairs)
+        with pytest.raises(Interruption):
+            compare(Checkpointer(checkpoint_path, interval=0))
+    checkpointer = Checkpointer(checkpoint_path, interval=0, read_path=checkpoint_path)
+    assert checkpointer.state["num_processed_documents_a"] == num_pairs - 1
+    compare(checkpointer, resume_at=checkpointer.state["report_file_size"])
+    assert get_record_summaries(report_path) == expected_record_summaries
+
+
+def test_cli_resumes_from_one_checkpoint_file_and_saves_to_another(
+    populated_collections: tuple[Collection, Collection], monkeypatch: pytest.MonkeyPatch, tmp_path: Path,
+    invoke_cli: Callable,
+) -> None:
+    r"""
+    Regression test: When resuming via `--resume` while saving checkpoints to another file (via
+    `--checkpoint-file`), the tool used to try to read the checkpoint from the latter, which didn't exist yet.
+    """
+
+    (old_checkpoint_path, new_checkpoint_path) = (str(tmp_path / "old.json"), str(tmp_path / "new.json"))
+    report_path = str(tmp_path / "report.jsonl")
+    invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--report-file", report_path, "--strategy", "merge")
+    expected_record_summaries = get_record_summaries(report_path)
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 5)
+        with pytest.raises(Interruption):
+            invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--report-file", report_path,
+                       "--checkpoint-file", old_checkpoint_path, "--checkpoint-interval", "0")
+    old_checkpoint = Checkpointer.read(old_checkpoint_path)
+
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--report-file", report_path,
+                        "--resume", old_checkpoint_path, "--checkpoint-file", new_checkpoint_path).output
+    assert "Resuming after identifier value: 4" in output
+    assert get_record_summaries(report_path) == expected_record_summaries
+    assert Checkpointer.read(old_checkpoint_path) == old_checkpoint
+    assert Checkpointer.read(new_checkpoint_path)["num_processed_documents_a"] == 11
@@ -0,0 +1,53 @@
+r"""Tests of the command-line interface (beyond those of the features the other test modules cover)."""
+
+from typing import Callable
+
+import pytest
+from mongomock.collection import Collection
+
+from tests.helpers import COLLECTION_OPTIONS
+
+
+def test_diff_collections_applies_filter(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable,
+) -> None:
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--filter", '{"id": {"$gte": 3}}').output
+    assert "Documents in collection A                 │        9" in output
+    assert "Documents in collection B                 │        9" in output
+    assert "Documents that differ between collections │        1" in output
+    assert "id=2" not in output and "id=7" in output
+
+
+def test_diff_collections_displays_plan(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable,
+) -> None:
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS).output
+    assert "Strategy: hash (collection B is not indexed on 'id'" in output
+    populated_collections[1].create_index("id")
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS).output
+    assert "Strategy: batch (collection B can be looked up via an index on 'id')" in output
+
+
+def test_diff_collections_rejects_async_with_another_strategy_than_merge(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable,
+) -> None:
+    with pytest.raises(ValueError, match="cannot be used with another strategy than `merge`"):
+        invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--async", "--strategy", "hash")
+
+
+def test_diff_collections_displays_up_to_max_diffs(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable,
+) -> None:
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--max-diffs", "1").output
+    assert output.count("Document differs between collections") == 2
+    assert output.count("--- Collection A") == 1
+    assert "Documents that differ between collections │        2" in output
+
+
+def test_diff_collections_quietly_displays_only_summary(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable,
+) -> None:
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--quiet").output
+    assert output.lstrip().startswith("Result")
+    assert "Document" not in output.split("Result")[0] and "Strategy" not in output
+    assert "Documents that differ between collections │        2" in output
@@ -0,0 +1,87 @@
+r"""Tests of comparing the collections in one database with those in another (see `Comparator.compare_databases`)."""
+
+import os
+from pathlib import Path
+from typing import Callable
+
+import mongomock
+import pytest
+from mongomock.collection import Collection
+from rich.console import Console
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.reports import ReportSink
+from mongo_diff.results import DatabaseResult, Result
+from tests.helpers import EXPECTED_SUMMARY, summarize
+
+
+@pytest.fixture
+def populated_databases(
+    mongo_client: mongomock.MongoClient, populated_collections: tuple[Collection, Collection],
+) -> tuple[mongomock.Database, mongomock.Database]:
+    r"""
+    Populates databases A and B, and returns them. Besides the `things` collections (see `populated_collections`),
+    both databases contain a collection whose name contains path separators and whose documents are identical,
+    and a collection whose documents lack identifiers (so comparing them fails); and each database contains a
+    collection the other one doesn't.
+    """
+
+    (database_a, database_b) = (mongo_client["db_a"], mongo_client["db_b"])
+    for database in (database_a, database_b):
+        database["/x/y"].insert_many([{"id": 1}, {"id": 2}])
+        database["broken"].insert_one({"name": "no identifier"})
+    database_a["only_a"].insert_one({"id": 1})
+    database_b["only_b"].insert_one({"id": 1})
+    return (database_a, database_b)
+
+
+def compare_databases(populated_databases: tuple, **options: object) -> DatabaseResult:
+    return Comparator(console=Console(quiet=True)).compare_databases(*populated_databases, "id", "id", True, **options)
+
+
+def test_compare_databases(populated_databases: tuple) -> None:
+    database_result = compare_databases(populated_databases, max_concurrency=2, batch_size=3)
+    assert sorted(database_result.results_by_collection_name) == ["/x/y", "things"]
+    assert summarize(database_result.results_by_collection_name["things"]) == EXPECTED_SUMMARY
+    assert summarize(database_result.results_by_collection_name["/x/y"]) == dict(
+        num_a=2, num_b=2, a_only=[], b_only=[], differing=[],
+    )
+    assert list(database_result.errors_by_collection_name) == ["broken"]
+    assert database_result.collection_names_in_database_a_only == ["only_a"]
+    assert database_result.collection_names_in_database_b_only == ["only_b"]
+
+
+def test_compare_databases_only_compares_specified_collections(populated_databases: tuple) -> None:
+    database_result = compare_databases(populated_databases, collection_names=["things", "only_a"])
+    assert list(database_result.results_by_collection_name) == ["things"]
+    assert database_result.errors_by_collection_name == {}
+    assert database_result.collection_names_in_database_a_only == ["only_a"]
+    assert database_result.collection_names_in_database_b_only == []
+
+
+def test_compare_databases_saves_reports_in_directory(populated_databases: tuple, tmp_path: Path) -> None:
+    report_directory = tmp_path / "reports"
+    report_directory.mkdir()
+    compare_databases(populated_databases, collection_names=["things", "/x/y"], report_directory=str(report_directory))
+    assert sorted(os.listdir(tmp_path)) == ["reports"]
+    assert sorted(os.listdir(report_directory)) == ["%2Fx%2Fy.jsonl", "things.jsonl"]
+    records = list(ReportSink.read_records(str(report_directory / "things.jsonl")))
+    assert records[0]["kind"] == "header" and records[-1]["kind"] == "summary"
+    assert sorted(record["identifier"] for record in records if record["kind"] == "differing") == [2, 7]
+    assert Result.from_summary_record(records[-1]).num_documents_in_collection_b_only == 2
+
+
+def test_cli_diff_databases(populated_databases: tuple, invoke_cli: Callable, tmp_path: Path) -> None:
+    report_directory = tmp_path / "reports"
+    result = invoke_cli("diff-databases", "--mongo-uri-a", "mongodb://localhost", "--database-name-a", "db_a",
+                        "--database-name-b", "db_b", "--identifier-field-name-a", "id",
+                        "--report-directory", str(report_directory))
+    assert result.exit_code == 1  # since comparing the `broken` collections failed
+    assert "Collection exists in database A only" in result.output
+    assert "Collection exists in database B only" in result.output
+    assert "Error:" in result.output
+    assert sorted(os.listdir(report_directory)) == ["%2Fx%2Fy.jsonl", "broken.jsonl", "things.jsonl"]
+    result = invoke_cli("diff-databases", "--mongo-uri-a", "mongodb://localhost", "--database-name-a", "db_a",
+                        "--database-name-b", "db_b", "--identifier-field-name-a", "id", "--collection", "things")
+    assert result.exit_code == 0
+    assert "things" in result.output and "only_a" not in result.output
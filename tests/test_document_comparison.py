@@ -0,0 +1,64 @@
+r"""Tests of the comparison of pairs of documents (see `Comparator.compare_documents`)."""
+
+import datetime
+
+import bson
+import pytest
+from bson import Binary, Code, Decimal128, Int64, MaxKey, MinKey, ObjectId, Regex, Timestamp
+from bson.raw_bson import RawBSONDocument
+
+import mongo_diff.comparator
+from mongo_diff.bson_utils import remove_field_from_raw_bson
+from mongo_diff.comparator import Comparator
+
+# A document containing a field of (almost) every BSON type.
+DOCUMENT_OF_EVERY_TYPE = {
+    "double": 1.5,
+    "string": "abc",
+    "document": {"a": [1, {"b": None}]},
+    "array": [1, "2", 3.0],
+    "binary": Binary(b"\x00\x01\x02", 128),
+    "oid": ObjectId("65a1b2c3d4e5f60718293a4b"),
+    "bool": True,
+    "date": datetime.datetime(2024, 1, 2, 3, 4, 5),
+    "null": None,
+    "regex": Regex("^a.*b$", "im"),
+    "code": Code("return x;"),
+    "code_with_scope": Code("return x;", {"x": 1}),
+    "int32": 42,
+    "timestamp": Timestamp(1700000000, 7),
+    "int64": Int64(2 ** 40),
+    "decimal": Decimal128("1.25"),
+    "min_key": MinKey(),
+    "max_key": MaxKey(),
+}
+
+
+@pytest.mark.parametrize("field_name", list(DOCUMENT_OF_EVERY_TYPE))
+def test_remove_field_from_raw_bson(field_name: str) -> None:
+    raw = bson.encode({"_id": 1, **DOCUMENT_OF_EVERY_TYPE})
+    expected_document = {"_id": 1, **DOCUMENT_OF_EVERY_TYPE}
+    del expected_document[field_name]
+    assert remove_field_from_raw_bson(raw, field_name) == bson.encode(expected_document)
+
+
+def test_compare_documents_does_not_decode_identical_raw_documents(monkeypatch: pytest.MonkeyPatch) -> None:
+    def decode_raw_bson_document(value: object) -> object:
+        raise AssertionError("The documents should not have been decoded.")
+
+    raw_a = RawBSONDocument(bson.encode({"_id": 1, **DOCUMENT_OF_EVERY_TYPE}))
+    raw_b = RawBSONDocument(bson.encode({"_id": 2, **DOCUMENT_OF_EVERY_TYPE}))
+    monkeypatch.setattr(mongo_diff.comparator, "decode_raw_bson_document", decode_raw_bson_document)
+    assert Comparator.compare_documents(raw_a, raw_b, ignore_oid=True)
+
+
+@pytest.mark.parametrize("ignore_oid", [False, True])
+def test_compare_documents_decodes_raw_documents_that_are_not_identical(ignore_oid: bool) -> None:
+    document_a = {"_id": 1, **DOCUMENT_OF_EVERY_TYPE}
+    reordered_document = {"_id": 1, **dict(reversed(DOCUMENT_OF_EVERY_TYPE.items()))}
+    changed_document = {"_id": 1, **DOCUMENT_OF_EVERY_TYPE, "regex": Regex("^a.*b$", "i")}
+    raw_a = RawBSONDocument(bson.encode(document_a))
+    for (document_b, expected_outcome) in [(reordered_document, True), (changed_document, False)]:
+        raw_b = RawBSONDocument(bson.encode(document_b))
+        assert Comparator.compare_documents(raw_a, raw_b, ignore_oid=ignore_oid) is expected_outcome
+        assert Comparator.compare_documents(document_a, document_b, ignore_oid=ignore_oid) is expected_outcome
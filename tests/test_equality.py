@@ -0,0 +1,92 @@
+r"""Tests of the rules via which the tool compares BSON values (see `values_are_equal` and `EqualityRules`)."""
+
+import datetime
+from typing import Any, Callable
+
+import dictdiffer
+import pytest
+from bson import Decimal128, Int64, ObjectId
+from mongomock.collection import Collection
+
+from mongo_diff.equality import EqualityRules, values_are_equal
+from tests.helpers import COLLECTION_OPTIONS
+
+NAN = float("nan")
+
+# Pairs of values the tool compared via `dictdiffer` before it had its own equality check.
+VALUE_PAIRS = [
+    (1, 1), (1, 2), (1, 1.0), (1, Int64(1)), (Int64(2), 2.0), (1.5, 1.5), (1.2, 1.7), (0.0, -0.0),
+    (1.0, 1.0000000000000002), (1, 1.0000000000000002), (1.0, 1.0000000000000004), (1e300, 1.0000000000000002e300),
+    (True, 1.0000000000000002), ([0.1 + 0.2], [0.3]), (float("inf"), float("inf")), (float("inf"), 1e308),
+    (True, 1), (False, 0), (True, 1.0), (True, True), (True, False), (NAN, NAN), (NAN, 1.0),
+    (Decimal128("1"), 1), (Decimal128("1.0"), Decimal128("1")), (Decimal128("1.5"), Decimal128("1.5")),
+    (Decimal128("NaN"), Decimal128("NaN")), (Decimal128("1.5"), 1.5),
+    ("a", "a"), ("a", "b"), ("1", 1), (None, None), (None, 0), (b"x", b"x"), (b"x", "x"),
+    (ObjectId("65a1b2c3d4e5f60718293a4b"), ObjectId("65a1b2c3d4e5f60718293a4b")),
+    (datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 1)),
+    ([1, 2], [1, 2]), ([1, 2], [2, 1]), ([1, 2], [1, 2, 3]), ([1], [1.0]), ([[True]], [[1]]),
+    ({"a": 1, "b": 2}, {"b": 2, "a": 1}), ({"a": 1}, {"a": 1, "b": None}), ({"a": {"b": [1]}}, {"a": {"b": [1.0]}}),
+    ({"a": 1}, [("a", 1)]), ({}, []),
+]
+
+
+@pytest.mark.parametrize(("value_a", "value_b"), VALUE_PAIRS)
+def test_default_rules_agree_with_dictdiffer(value_a: Any, value_b: Any) -> None:
+    are_equal_according_to_dictdiffer = len(list(dictdiffer.diff({"v": value_a}, {"v": value_b}))) == 0
+    assert values_are_equal(value_a, value_b) is are_equal_according_to_dictdiffer
+    assert values_are_equal(value_b, value_a) is are_equal_according_to_dictdiffer
+
+
+def test_default_rules_compare_integers_exactly() -> None:
+    r"""Unlike `dictdiffer`, which compares them as doubles, within a relative tolerance of the machine epsilon."""
+    (value_a, value_b) = (Int64(2 ** 62), Int64(2 ** 62 + 1))
+    assert not values_are_equal(value_a, value_b)
+    assert len(list(dictdiffer.diff({"v": value_a}, {"v": value_b}))) == 0
+
+
+@pytest.mark.parametrize(("rule_options", "value_a", "value_b", "expected_outcome"), [
+    (dict(compare_numbers_by_value=False), 1, 1.0, False),
+    (dict(compare_numbers_by_value=False), 1, Int64(1), False),
+    (dict(compare_numbers_by_value=False), 1, 1, True),
+    (dict(compare_decimals_by_value=True), Decimal128("1.0"), 1, True),
+    (dict(compare_decimals_by_value=True), Decimal128("1.0"), Decimal128("1"), True),
+    (dict(compare_decimals_by_value=True, compare_numbers_by_value=False), Decimal128("1.0"), 1, False),
+    (dict(compare_decimals_by_value=True), Decimal128("0.1"), 0.1, False),  # 0.1 isn't exactly representable
+    (dict(bool_equals_number=False), True, 1, False),
+    (dict(bool_equals_number=False), [False], [0], False),
+    (dict(bool_equals_number=False), True, True, True),
+    (dict(nan_equals_nan=False), NAN, NAN, False),
+    (dict(nan_equals_nan=False, compare_decimals_by_value=True), Decimal128("NaN"), NAN, False),
+    (dict(nan_equals_nan=True, compare_decimals_by_value=True), Decimal128("NaN"), NAN, True),
+    (dict(double_tolerance=0), 1.0, 1.0000000000000002, False),
+    (dict(double_tolerance=0), 1, 1.0000000000000002, False),
+    (dict(double_tolerance=1e-6), 1.0, 1.0000001, True),
+    (dict(compare_decimals_by_value=True), Decimal128("1"), 1.0000000000000002, False),
+    (dict(ignore_field_order=False), {"a": 1, "b": 2}, {"b": 2, "a": 1}, False),
+    (dict(ignore_field_order=False), {"x": {"a": 1, "b": 2}}, {"x": {"b": 2, "a": 1}}, False),
+    (dict(ignore_field_order=False), {"a": 1, "b": 2}, {"a": 1, "b": 2}, True),
+])
+def test_rules(rule_options: dict, value_a: Any, value_b: Any, expected_outcome: bool) -> None:
+    assert values_are_equal(value_a, value_b, EqualityRules(**rule_options)) is expected_outcome
+    assert values_are_equal(value_b, value_a, EqualityRules(**rule_options)) is expected_outcome
+
+
+@pytest.mark.parametrize(("option", "value_a", "value_b"), [
+    ("--strict-number-types", 1, 1.0),
+    ("--decimals-by-value", Decimal128("1"), Decimal128("1.00")),
+    ("--strict-booleans", True, 1),
+    ("--strict-nan", NAN, -NAN),  # NaN values whose BSON representations differ (in their sign bits)
+    ("--field-order-matters", {"a": 1, "b": 2}, {"b": 2, "a": 1}),
+    ("--exact-doubles", 0.1 + 0.2, 0.3),
+])
+def test_cli_options_change_rules(
+    collection_a: Collection, collection_b: Collection, invoke_cli: Callable, option: str, value_a: Any,
+    value_b: Any,
+) -> None:
+    collection_a.insert_one({"id": 1, "v": value_a})
+    collection_b.insert_one({"id": 1, "v": value_b})
+    outputs = [invoke_cli("diff-collections", *COLLECTION_OPTIONS, *options).output for options in ([], [option])]
+    are_equal = ["Documents that differ between collections │        0" in output for output in outputs]
+
+    # Check that the option reverses the outcome of the comparison.
+    assert are_equal[0] is not are_equal[1]
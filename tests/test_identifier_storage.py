@@ -0,0 +1,34 @@
+r"""Tests of the structures in which strategies keep identifier values (spilling them to disk if necessary)."""
+
+import pytest
+from mongomock.collection import Collection
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.storage import IdentifierSet
+from mongo_diff.strategies import Strategy
+from tests.helpers import EXPECTED_SUMMARY, QueryCountingCollection, summarize
+
+
+def test_identifier_set_spills_to_disk_and_still_finds_identifiers() -> None:
+    identifier_values = [None, 1, 2.5, "1", {"a": 1}, [1, 2], True]
+    with IdentifierSet(max_identifiers_in_memory=3) as identifiers:
+        for identifier_value in identifier_values:
+            identifiers.add(identifier_value)
+        identifiers.add(1.0)  # a value equal to one already in the set
+        assert identifiers.is_spilled
+        assert len(identifiers) == len(identifier_values)
+        assert all(identifier_value in identifiers for identifier_value in identifier_values)
+        assert not any(identifier_value in identifiers for identifier_value in [2, "2", {"a": 2}, False, [2, 1]])
+    assert len(identifiers) == 0 and not identifiers.is_spilled
+
+
+@pytest.mark.parametrize("strategy", [Strategy.LOOKUP, Strategy.BATCH])
+def test_detects_documents_in_collection_b_only_without_querying_collection_a_again(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    query_counting_collection_a = QueryCountingCollection(collection_a)
+    result = Comparator().compare_collections(query_counting_collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy, batch_size=4, max_identifiers_in_memory=2)
+    assert summarize(result) == EXPECTED_SUMMARY
+    assert query_counting_collection_a.num_calls == {"find": 1}
@@ -0,0 +1,183 @@
+r"""Tests of the re-comparison of collections driven by change streams (see `compare_collections_incrementally`)."""
+
+import io
+from pathlib import Path
+from typing import Any, Optional
+
+import pytest
+from bson import ObjectId
+from mongomock.collection import Collection
+from rich.console import Console
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.reports import ReportSink, read_extended_json_file
+from tests.helpers import summarize
+
+
+class FakeChangeStream:
+    r"""Reads the change events a `WatchableCollection` has logged, from the specified position onward."""
+
+    def __init__(self, events: list[dict], position: int) -> None:
+        self.events = events
+        self.position = position
+
+    def __enter__(self) -> "FakeChangeStream":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+    def try_next(self) -> Optional[dict]:
+        if self.position >= len(self.events):
+            return None
+        self.position += 1
+        return self.events[self.position - 1]
+
+    @property
+    def resume_token(self) -> dict:
+        return {"_data": self.position}
+
+
+class WatchableCollection:
+    r"""
+    Wraps a collection (since mongomock doesn't support change streams), logging a change event—like the ones
+    MongoDB emits—whenever a document is modified via one of the methods of this class, and serving those events
+    via `watch`.
+    """
+
+    def __init__(self, collection: Collection, provides_pre_images: bool = True) -> None:
+        self.collection = collection
+        self.provides_pre_images = provides_pre_images
+        self.events: list[dict] = []
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def watch(self, resume_after: Optional[dict] = None, **options: Any) -> FakeChangeStream:
+        return FakeChangeStream(self.events, 0 if resume_after is None else resume_after["_data"])
+
+    def log_event(self, operation_type: str, document_before: Optional[dict], document_after: Optional[dict],
+                  **fields: Any) -> None:
+        event = {"operationType": operation_type, **fields}
+        if document_before is not None and self.provides_pre_images:
+            event["fullDocumentBeforeChange"] = document_before
+        if document_after is not None:
+            event["fullDocument"] = document_after
+        event["documentKey"] = {"_id": (document_before or document_after)["_id"]}
+        self.events.append(event)
+
+    def insert(self, document: dict) -> None:
+        document = {"_id": ObjectId(), **document}
+        self.collection.insert_one(document)
+        self.log_event("insert", None, document)
+
+    def update(self, identifier_value: Any, fields: dict) -> None:
+        document_before = self.collection.find_one({"id": identifier_value})
+        self.collection.update_one({"_id": document_before["_id"]}, {"$set": fields})
+        document_after = self.collection.find_one({"_id": document_before["_id"]})
+        self.log_event("update", document_before, document_after,
+                       updateDescription={"updatedFields": fields, "removedFields": []})
+
+    def delete(self, identifier_value: Any) -> None:
+        document_before = self.collection.find_one({"id": identifier_value})
+        self.collection.delete_one({"_id": document_before["_id"]})
+        self.log_event("delete", document_before, None)
+
+
+@pytest.fixture
+def watchable_collections(populated_collections: tuple[Collection, Collection]) -> tuple[Any, Any]:
+    (collection_a, collection_b) = populated_collections
+    return (WatchableCollection(collection_a), WatchableCollection(collection_b))
+
+
+def compare_incrementally(collection_a: Any, collection_b: Any, state_path: str) -> tuple[dict, str]:
+    r"""Compares the collections incrementally, and returns the summary of the result, along with the output."""
+
+    output = io.StringIO()
+    result = Comparator(console=Console(file=output, width=200)).compare_collections_incrementally(
+        collection_a, collection_b, "id", "id", ignore_oid=True, state_path=state_path,
+    )
+    return summarize(result), output.getvalue()
+
+
+def compare_in_full(collection_a: Any, collection_b: Any) -> dict:
+    return summarize(Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True))
+
+
+def test_state_contains_only_resume_tokens_and_differing_identifiers(
+    watchable_collections: tuple[Any, Any], tmp_path: Path,
+) -> None:
+    (collection_a, collection_b) = watchable_collections
+    state_path = str(tmp_path / "state.json")
+    (summary, _) = compare_incrementally(collection_a, collection_b, state_path)
+    assert summary == compare_in_full(collection_a, collection_b)
+    state = read_extended_json_file(state_path)
+    assert (state["resume_token_a"], state["resume_token_b"]) == ({"_data": 0}, {"_data": 0})
+    assert state["differing_identifiers"] == [2, 7, 11, 12, "twelve"]
+    assert not any(name.startswith("num_") for name in state)
+
+
+@pytest.mark.parametrize("report_file_name", ["report.jsonl", "report.bson"])
+def test_streams_records_to_the_sink(
+    watchable_collections: tuple[Any, Any], tmp_path: Path, report_file_name: str,
+) -> None:
+    r"""Regression test: The first (full) comparison used to hold every record in memory, then copy it to the sink."""
+
+    (collection_a, collection_b) = watchable_collections
+    (state_path, report_path) = (str(tmp_path / "state.json"), str(tmp_path / report_file_name))
+    for change in [None, lambda: collection_a.update(5, {"name": "something else"})]:
+        if change is not None:
+            change()
+        with ReportSink.for_path(report_path) as sink:
+            sink.write_header("id", "id")
+            result = Comparator().compare_collections_incrementally(collection_a, collection_b, "id", "id",
+                                                                     ignore_oid=True, state_path=state_path,
+                                                                     report_sink=sink)
+        assert result.identifiers_of_differing_documents == [] and result.num_differing_documents > 0
+        records = [record for record in ReportSink.read_records(report_path) if record["kind"] != "header"]
+        identifier_values = sorted(record["identifier"] for record in records if record["identifier"] != "twelve")
+        assert read_extended_json_file(state_path)["differing_identifiers"] == [*identifier_values, "twelve"]
+    assert identifier_values == [2, 5, 7, 11, 12]
+
+
+def test_recompares_changed_documents_and_previously_differing_ones(
+    watchable_collections: tuple[Any, Any], tmp_path: Path,
+) -> None:
+    (collection_a, collection_b) = watchable_collections
+    state_path = str(tmp_path / "state.json")
+    compare_incrementally(collection_a, collection_b, state_path)
+
+    collection_b.update(2, {"details": {"size": 20, "tags": ["x", "y"]}})  # document 2 no longer differs
+    collection_a.update(5, {"name": "something else"})  # document 5 now differs
+    collection_a.update(6, {"id": 13})  # document 6 is now in collection B only, and document 13 in A only
+    collection_a.delete(11)  # document 11 is no longer in collection A only
+    collection_b.insert({"id": 14})  # document 14 is in collection B only
+    (summary, output) = compare_incrementally(collection_a, collection_b, state_path)
+    assert summary["a_only"] == [13] and summary["b_only"] == [6, 12, 14, "twelve"]
+    assert summary["differing"] == [5, 7]
+    assert summary == compare_in_full(collection_a, collection_b)
+    assert "Re-comparing 6 document(s) changed since the previous comparison, and 5 document(s) that differed then." \
+        in output
+
+    # Check that nothing has changed since then.
+    (summary, output) = compare_incrementally(collection_a, collection_b, state_path)
+    assert summary == compare_in_full(collection_a, collection_b)
+    assert "Re-comparing 0 document(s) changed since the previous comparison, and 7 document(s)" in output
+
+
+@pytest.mark.parametrize("change", ["delete", "drop"])
+def test_compares_in_full_when_change_stream_has_gap(
+    watchable_collections: tuple[Any, Any], tmp_path: Path, change: str,
+) -> None:
+    (collection_a, collection_b) = watchable_collections
+    state_path = str(tmp_path / "state.json")
+    compare_incrementally(collection_a, collection_b, state_path)
+
+    if change == "delete":
+        collection_b.provides_pre_images = False
+        collection_b.delete(3)
+    else:
+        collection_b.events.append({"operationType": "drop"})
+    (summary, output) = compare_incrementally(collection_a, collection_b, state_path)
+    assert "Comparing collections in full, because:" in output
+    assert summary == compare_in_full(collection_a, collection_b)
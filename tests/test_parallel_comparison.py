@@ -0,0 +1,106 @@
+r"""Tests of the comparison of collections in parallel (see `Comparator.compare_collections_in_parallel`)."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import mongomock
+import pytest
+from mongomock.collection import Collection
+
+import mongo_diff.comparator
+from mongo_diff.comparator import Comparator
+from mongo_diff.queries import compute_partition_boundaries, make_pymongo_filters_for_partitions
+from mongo_diff.reports import ReportSink
+from mongo_diff.results import Result
+from mongo_diff.strategies import Strategy
+from tests.helpers import EXPECTED_SUMMARY, summarize
+
+
+@pytest.fixture
+def in_process_workers(monkeypatch: pytest.MonkeyPatch, mongo_client: mongomock.MongoClient) -> None:
+    r"""
+    Makes `compare_collections_in_parallel` run its workers in threads of this process (instead of in worker
+    processes, which couldn't see the in-memory collections), and connect to the in-memory "server".
+    """
+
+    def make_executor(max_workers: int, mp_context: Any) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(mongo_diff.comparator, "ProcessPoolExecutor", make_executor)
+    monkeypatch.setattr(mongo_diff.comparator, "MongoClient", lambda **kwargs: mongo_client)
+
+
+@pytest.mark.parametrize("num_workers", [1, 2, 4])
+@pytest.mark.parametrize("strategy", [Strategy.LOOKUP, Strategy.MERGE])
+def test_compare_collections_in_parallel(
+    in_process_workers: None, populated_collections: tuple[Collection, Collection], num_workers: int,
+    strategy: Strategy,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections_in_parallel(
+        "mongodb://a", "mongodb://b", collection_a, collection_b, "id", "id", ignore_oid=True,
+        num_workers=num_workers, strategy=strategy,
+    )
+    assert summarize(result) == EXPECTED_SUMMARY
+    assert result.identifiers_of_differing_documents == [2, 7]  # ordered by identifier value
+
+
+def test_workers_stream_records_to_spill_files(
+    in_process_workers: None, populated_collections: tuple[Collection, Collection], monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Any,
+) -> None:
+    r"""Regression test: The workers used to send every record back to the main process, which held them all."""
+
+    partial_results = []
+    original_compare_collection_partition = mongo_diff.comparator._compare_collection_partition
+
+    def compare_collection_partition(job: dict) -> Result:
+        partial_results.append(original_compare_collection_partition(job))
+        return partial_results[-1]
+
+    monkeypatch.setattr(mongo_diff.comparator, "_compare_collection_partition", compare_collection_partition)
+    (collection_a, collection_b) = populated_collections
+    report_path = str(tmp_path / "report.jsonl")
+    with ReportSink.for_path(report_path) as sink:
+        result = Comparator().compare_collections_in_parallel(
+            "mongodb://a", "mongodb://b", collection_a, collection_b, "id", "id", ignore_oid=True, num_workers=3,
+            report_sink=sink, memory_limit=1,
+        )
+    assert len(partial_results) == 3
+    assert all(partial_result.identifiers_of_differing_documents == [] for partial_result in partial_results)
+    assert sum(partial_result.num_differing_documents for partial_result in partial_results) == 2
+    assert result.num_differing_documents == 2
+    assert [(record["kind"], record["identifier"]) for record in ReportSink.read_records(report_path)] == [
+        ("differing", 2), ("differing", 7), ("collection_a_only", 11), ("collection_b_only", 12),
+        ("collection_b_only", "twelve"),
+    ]
+
+
+def test_partition_filters_match_every_document_exactly_once(collection_a: Collection) -> None:
+    identifier_values = [None, "a", 1.5, *range(20), {"x": 1}]
+    collection_a.insert_many([{"id": value} for value in identifier_values] + [{"no_id": True}])
+    boundaries = compute_partition_boundaries(collection_a, "id", num_partitions=4)
+    assert len(boundaries) == 3 and all(isinstance(boundary, (int, float)) for boundary in boundaries)
+    num_matches = [
+        collection_a.count_documents(filter) for filter in make_pymongo_filters_for_partitions("id", boundaries)
+    ]
+    assert sum(num_matches) == len(identifier_values) + 1
+    assert all(count > 0 for count in num_matches)
+
+
+def test_combined_records_keep_their_own_oid_and_diff() -> None:
+    r"""
+    Regression test: Records used to be matched up with their `_id` values and diffs by position, so records
+    whose `_id` values were the same (e.g. in different partitions) got each other's diffs.
+    """
+
+    result_1, result_2 = Result(1, 1), Result(1, 1)
+    result_1.add_differing_document(3, oid_value="same", diff_lines=["- 3"])
+    result_2.add_differing_document(1, oid_value="same", diff_lines=["- 1"])
+    result_2.add_differing_document(2, oid_value="other", diff_lines=None)
+    combined_result = Result.combine([result_1, result_2])
+    assert list(Result.iterate_combined_records([combined_result])) == [
+        ("differing", 1, "same", ["- 1"]),
+        ("differing", 2, "other", None),
+        ("differing", 3, "same", ["- 3"]),
+    ]
@@ -0,0 +1,82 @@
+r"""Tests of the streaming of results to report files (see `ReportSink`) and of the `render-report` command."""
+
+from pathlib import Path
+
+import pytest
+from bson import Int64
+from mongomock.collection import Collection
+from typer.testing import CliRunner
+
+from mongo_diff.cli import app
+from mongo_diff.comparator import Comparator
+from mongo_diff.reports import ReportSink
+from mongo_diff.results import Result
+from mongo_diff.strategies import Strategy
+
+
+def write_report(collection_a: Collection, collection_b: Collection, report_path: str) -> Result:
+    with ReportSink.for_path(report_path) as sink:
+        sink.write_header("id", "id")
+        result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                                  strategy=Strategy.MERGE, report_sink=sink)
+        sink.write_summary(result)
+    return result
+
+
+@pytest.mark.parametrize("file_name", ["report.jsonl", "report.bson"])
+def test_result_streams_records_to_sink(
+    populated_collections: tuple[Collection, Collection], tmp_path: Path, file_name: str,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    collection_a.insert_one({"id": Int64(13)})
+    report_path = str(tmp_path / file_name)
+    result = write_report(collection_a, collection_b, report_path)
+
+    # Check that the result only kept count of the records.
+    assert result.identifiers_of_differing_documents == result.identifiers_of_documents_in_collection_a_only == []
+    assert (result.num_documents_in_collection_a_only, result.num_documents_in_collection_b_only,
+            result.num_differing_documents) == (2, 2, 2)
+
+    # Check the records (including that the identifier values kept their BSON types).
+    records = list(ReportSink.read_records(report_path))
+    assert [record["kind"] for record in records] == [
+        "header", "differing", "differing", "collection_a_only", "collection_b_only", "collection_a_only",
+        "collection_b_only", "summary",
+    ]
+    assert [record.get("identifier") for record in records[1:-1]] == [2, 7, 11, 12, 13, "twelve"]
+    assert isinstance(records[5]["identifier"], Int64)
+    assert all(line.startswith(("-", "+", " ", "@")) for line in records[1]["diff_lines"])
+    summary_result = Result.from_summary_record(records[-1])
+    assert (summary_result.num_documents_in_collection_a, summary_result.num_documents_in_collection_b,
+            summary_result.num_differing_documents) == (12, 12, 2)
+
+
+def test_sink_resumes_at_the_specified_size(tmp_path: Path) -> None:
+    report_path = str(tmp_path / "report.jsonl")
+    with ReportSink.for_path(report_path) as sink:
+        sink.write_header("id", "id")
+        size = sink.size
+        sink.write_record({"kind": "collection_a_only", "identifier": 1})
+    with ReportSink.for_path(report_path, resume_at=size) as sink:
+        sink.write_record({"kind": "collection_a_only", "identifier": 2})
+    assert [record.get("identifier") for record in ReportSink.read_records(report_path)] == [None, 2]
+
+
+def test_render_report(populated_collections: tuple[Collection, Collection], tmp_path: Path) -> None:
+    (collection_a, collection_b) = populated_collections
+    report_path = str(tmp_path / "report.jsonl")
+    write_report(collection_a, collection_b, report_path)
+    output = CliRunner().invoke(app, ["render-report", report_path], catch_exceptions=False).output
+    assert "--- Collection A: id=2" in output and '+      "z"' in output
+    assert "--- Collection A: id=7" in output
+    assert "Document exists in collection A only: id=11" in output
+    assert "Document exists in collection B only: id='twelve'" in output
+    assert "Documents that differ between collections │        2" in output
+
+
+def test_render_report_requires_a_summary(tmp_path: Path) -> None:
+    report_path = str(tmp_path / "report.jsonl")
+    with ReportSink.for_path(report_path) as sink:
+        sink.write_header("id", "id")
+    with pytest.raises(ValueError, match="lacks a summary"):
+        CliRunner().invoke(app, ["render-report", report_path], catch_exceptions=False)
@@ -0,0 +1,87 @@
+r"""Tests of comparing samples of the collections (see `Comparator.compare_collection_samples`)."""
+
+from typing import Any, Callable
+
+import pytest
+from mongomock.collection import Collection
+from rich.console import Console
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.queries import iterate_sampled_documents
+from mongo_diff.results import SampleResult
+from tests.helpers import COLLECTION_OPTIONS, EXPECTED_SUMMARY, summarize
+
+
+class DuplicatingCollection:
+    r"""Wraps a collection, so that the server seems to choose every sampled document twice."""
+
+    def __init__(self, collection: Collection) -> None:
+        self.collection = collection
+
+    def aggregate(self, pipeline: list, *args: Any, **kwargs: Any) -> list[dict]:
+        documents = list(self.collection.aggregate(pipeline, *args, **kwargs))
+        return documents + documents
+
+
+def compare_collection_samples(collection_a: Collection, collection_b: Collection, **options: Any) -> SampleResult:
+    comparator = Comparator(console=Console(quiet=True))
+    return comparator.compare_collection_samples(collection_a, collection_b, "id", "id", True, **options)
+
+
+@pytest.mark.parametrize("options", [dict(sample_size=100), dict(sample_rate=1.0)])
+def test_sample_of_whole_collections_finds_every_difference(
+    populated_collections: tuple[Collection, Collection], options: dict,
+) -> None:
+    result = compare_collection_samples(*populated_collections, batch_size=3, **options)
+    assert summarize(result) == EXPECTED_SUMMARY
+    assert (result.num_sampled_documents_in_collection_a, result.num_sampled_documents_in_collection_b) == (11, 12)
+    (estimate_a_only, estimate_b_only, estimate_differing) = [estimate[3] for estimate in result.get_estimates()]
+    assert (estimate_a_only, estimate_b_only, estimate_differing) == (1.0, 2.0, 2.0)
+
+
+def test_sample_estimates_proportions_of_whole_collections(collection_a: Collection, collection_b: Collection) -> None:
+    collection_a.insert_many([{"id": i, "value": i} for i in range(200)])
+    collection_b.insert_many([{"id": i, "value": i if i % 4 else -i} for i in range(200)])
+    result = compare_collection_samples(collection_a, collection_b, sample_rate=0.25)
+    assert result.num_sampled_documents_in_collection_a == 50
+    (_, num_sampled, num_found, estimate, low, high) = result.get_estimates()[2]
+    assert num_sampled == 50 and estimate == pytest.approx(num_found * 4)
+    assert low <= estimate <= high
+
+
+def test_sample_applies_filters(populated_collections: tuple[Collection, Collection]) -> None:
+    result = compare_collection_samples(*populated_collections, sample_size=100,
+                                        filter_a={"id": {"$gte": 3}}, filter_b={"id": {"$gte": 3, "$lte": 10}})
+    assert summarize(result) == dict(num_a=9, num_b=8, a_only=[11], b_only=[], differing=[7])
+
+
+def test_sampled_documents_are_deduplicated(populated_collections: tuple[Collection, Collection]) -> None:
+    documents = list(iterate_sampled_documents(DuplicatingCollection(populated_collections[1]), "id", 100,
+                                               {"id": {"$lte": 5}}, {"id": 1}))
+    assert sorted(document["id"] for document in documents) == [1, 2, 3, 4, 5]
+
+
+@pytest.mark.parametrize("options", [dict(), dict(sample_size=1, sample_rate=0.5), dict(sample_rate=0),
+                                     dict(sample_rate=1.5)])
+def test_sample_requires_valid_size_or_rate(
+    populated_collections: tuple[Collection, Collection], options: dict,
+) -> None:
+    with pytest.raises(ValueError):
+        compare_collection_samples(*populated_collections, **options)
+
+
+def test_cli_compares_samples(populated_collections: tuple[Collection, Collection], invoke_cli: Callable) -> None:
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--sample", "100").output
+    assert "Sampling: 100 documents from each collection" in output
+    assert "Result (estimated from samples)" in output
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--sample-rate", "0.5").output
+    assert "Sampling: 50.0000% of documents from each collection" in output
+
+
+@pytest.mark.parametrize("options", [["--sample", "5", "--sample-rate", "0.5"], ["--sample", "5", "--async"],
+                                     ["--sample-rate", "0.5", "--workers", "2"]])
+def test_cli_rejects_incompatible_sampling_options(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable, options: list[str],
+) -> None:
+    with pytest.raises(ValueError):
+        invoke_cli("diff-collections", *COLLECTION_OPTIONS, *options)
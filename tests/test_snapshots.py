@@ -0,0 +1,95 @@
+r"""Tests of snapshots, and of comparing collections with them (see `FingerprintSnapshot`)."""
+
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import pytest
+from mongomock.collection import Collection
+from rich.console import Console
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.queries import make_pymongo_projection_for_fields
+from mongo_diff.results import Result
+from mongo_diff.snapshot import FingerprintSnapshot
+from tests.helpers import COLLECTION_OPTIONS, EXPECTED_SUMMARY, summarize
+
+
+def compare_with_snapshot(
+    collection_a: Optional[Collection], collection_b: Optional[Collection], snapshot: FingerprintSnapshot,
+    **options: Any,
+) -> Result:
+    comparator = Comparator(console=Console(quiet=True))
+    return comparator.compare_collection_with_snapshot(collection_a=collection_a, collection_b=collection_b,
+                                                       snapshot=snapshot, identifier_field_name_a="id",
+                                                       identifier_field_name_b="id", ignore_oid=True, **options)
+
+
+@pytest.mark.parametrize("snapshot_label", ["A", "B"])
+def test_compare_collection_with_snapshot(
+    populated_collections: tuple[Collection, Collection], tmp_path: Path, snapshot_label: str,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    path = str(tmp_path / "things.snapshot")
+    (snapshotted_collection, num_documents) = (collection_a, 11) if snapshot_label == "A" else (collection_b, 12)
+    assert FingerprintSnapshot.write(path, snapshotted_collection, "id", ignore_oid=True) == num_documents
+    with FingerprintSnapshot(path) as snapshot:
+        if snapshot_label == "A":
+            result = compare_with_snapshot(None, collection_b, snapshot, batch_size=1)
+        else:
+            result = compare_with_snapshot(collection_a, None, snapshot, batch_size=1)
+    assert summarize(result) == EXPECTED_SUMMARY  # including document 7, which only differs in a fractional part
+
+
+def test_compare_collection_with_snapshot_applies_filter_and_field_limits(
+    populated_collections: tuple[Collection, Collection], tmp_path: Path,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    path = str(tmp_path / "things.snapshot")
+    filter = {"id": {"$gte": 3}}
+    FingerprintSnapshot.write(path, collection_a, "id", ignore_oid=True, filter=filter,
+                              projection=make_pymongo_projection_for_fields("id", None, ["weight"]))
+    with FingerprintSnapshot(path) as snapshot:
+        result = compare_with_snapshot(None, collection_b, snapshot, filter_a=filter, filter_b=filter,
+                                       ignored_field_names=["weight"])
+    assert summarize(result) == dict(num_a=9, num_b=9, a_only=[11], b_only=[12], differing=[])
+
+
+@pytest.mark.parametrize("header, options, message", [
+    (dict(digest_kind="server"), dict(), "digests computed by the server"),
+    (dict(ignore_oid=False), dict(), "with the `_id` field"),
+    (dict(filter={"id": 1}), dict(), "different filter"),
+    (dict(), dict(filter_a={"id": 1}), "different filter"),
+    (dict(), dict(only_field_names=["name"]), "different field limits"),
+])
+def test_compare_collection_with_snapshot_rejects_incompatible_snapshot(
+    populated_collections: tuple[Collection, Collection], tmp_path: Path, header: dict, options: dict, message: str,
+) -> None:
+    path = str(tmp_path / "things.snapshot")
+    header = dict(dict(namespace="db_a.things", identifier_field_name="id", ignore_oid=True, digest_kind="client",
+                       filter={}, projection=None), **header)
+    FingerprintSnapshot.write_fingerprints(path, header, [])
+    with FingerprintSnapshot(path) as snapshot, pytest.raises(ValueError, match=message):
+        compare_with_snapshot(None, populated_collections[1], snapshot, **options)
+
+
+def test_snapshot_rejects_files_that_are_not_snapshots(tmp_path: Path) -> None:
+    path = tmp_path / "not.snapshot"
+    path.write_bytes(b"something else")
+    with pytest.raises(ValueError, match="not a snapshot"):
+        FingerprintSnapshot(str(path))
+
+
+def test_cli_compares_collection_with_snapshot(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable, tmp_path: Path,
+) -> None:
+    path = str(tmp_path / "things.snapshot")
+    output = invoke_cli("snapshot", "--mongo-uri", "mongodb://localhost", "--database-name", "db_a",
+                        "--collection-name", "things", "--snapshot-file", path).output
+    assert "Snapshot of 11 documents saved to" in output
+    output = invoke_cli("diff-collections", "--snapshot-a", path, "--mongo-uri-b", "mongodb://localhost",
+                        "--database-name-b", "db_b", "--collection-name-b", "things").output
+    assert "Snapshot A: db_a.things (11 documents, taken" in output
+    assert "Documents that differ between collections │        2" in output
+    with pytest.raises(ValueError, match="cannot be used with"):
+        invoke_cli("diff-collections", *COLLECTION_OPTIONS[6:], "--snapshot-a", path, "--mongo-uri-b",
+                   "mongodb://localhost", "--collection-name-b", "things", "--strategy", "merge")
@@ -0,0 +1,65 @@
+r"""Tests of the statistics collected about comparisons (see `ComparisonStats`)."""
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+import pytest
+from mongomock.collection import Collection
+from rich.console import Console
+
+from mongo_diff.comparator import Comparator
+from mongo_diff.reports import ReportSink
+from mongo_diff.stats import ComparisonStats
+from mongo_diff.strategies import Strategy
+from tests.helpers import COLLECTION_OPTIONS
+
+
+@pytest.mark.parametrize("strategy", [Strategy.MERGE, Strategy.HASH])
+def test_comparator_times_phases_of_comparison(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy,
+) -> None:
+    stats = ComparisonStats()
+    comparator = Comparator(console=Console(quiet=True), stats=stats)
+    result = comparator.compare_collections(*populated_collections, "id", "id", ignore_oid=True, strategy=strategy)
+    assert result.stats is stats
+    phases = stats.get_profile()["phases"]
+    assert {"counting documents", "comparing collections", "comparing documents", "generating diffs",
+            "rendering output"} <= set(phases)
+    assert phases["generating diffs"]["count"] == 2  # one per differing document
+    assert phases["comparing documents"]["count"] >= 2
+
+
+def test_stats_pair_up_command_events() -> None:
+    stats = ComparisonStats()
+    for (request_id, command_name) in [(1, "find"), (2, "getMore"), (3, "find")]:
+        event = SimpleNamespace(connection_id=("localhost", 27017), request_id=request_id, command_name=command_name,
+                                command={command_name: "things"}, reply={"ok": 1}, duration_micros=250_000)
+        stats.started(event)
+        (stats.failed if request_id == 2 else stats.succeeded)(event)
+    profile = stats.get_profile()
+    assert profile["commands"]["find"]["round_trips"] == 2
+    assert profile["commands"]["find"]["seconds"] == 0.5
+    assert profile["commands"]["getMore"]["bytes_received"] == 0
+    assert profile["servers"]["localhost:27017"]["round_trips"] == 3
+    assert profile["servers"]["localhost:27017"]["bytes_sent"] > 0
+
+
+def test_cli_displays_and_saves_stats(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable, tmp_path: Path,
+) -> None:
+    report_path = str(tmp_path / "report.jsonl")
+    output = invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--stats", "--report-file", report_path).output
+    displayed_profile = json.loads(output.split("Statistics:")[1].split("Report saved to:")[0])
+    assert {"planning", "comparing collections"} <= set(displayed_profile["phases"])
+    summary_record = list(ReportSink.read_records(report_path))[-1]
+    assert summary_record["kind"] == "summary"
+    assert {"planning", "comparing collections"} <= set(summary_record["stats"]["phases"])
+
+
+def test_cli_rejects_stats_with_workers(
+    populated_collections: tuple[Collection, Collection], invoke_cli: Callable,
+) -> None:
+    with pytest.raises(ValueError, match="`--stats` and `--workers`"):
+        invoke_cli("diff-collections", *COLLECTION_OPTIONS, "--stats", "--workers", "2")
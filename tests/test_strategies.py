@@ -0,0 +1,305 @@
+r"""Tests of the strategies via which `Comparator.compare_collections` pairs up documents."""
+
+import random
+from typing import Any, Iterator, Optional
+
+import pytest
+from bson import Decimal128
+from bson.raw_bson import RawBSONDocument
+from mongomock.collection import Collection
+
+import mongo_diff.queries
+from mongo_diff.bson_utils import bson_sort_key, compute_digest
+from mongo_diff.comparator import Comparator
+from mongo_diff.planning import plan_comparison
+from mongo_diff.progress import ThrottledProgress
+from mongo_diff.queries import estimate_number_of_documents, find_documents_by_identifier_values
+from mongo_diff.storage import ExternalSorter
+from mongo_diff.strategies import Strategy
+from tests.helpers import EXPECTED_SUMMARY, QueryCountingCollection, summarize
+
+# The strategies that compare entire collections (i.e. that `Comparator.compare_collections` accepts).
+STRATEGIES = [
+    Strategy.LOOKUP, Strategy.MERGE, Strategy.BATCH, Strategy.FINGERPRINT, Strategy.HASH, Strategy.SORT,
+]
+
+
+class RefetchDeletingCollection:
+    r"""
+    Wraps a collection, deleting the documents having the specified identifier values from it just before the
+    first query that looks documents up via `$in` (e.g. when a strategy fetches documents whose digests differ).
+    """
+
+    def __init__(self, collection: Collection, identifier_values: list) -> None:
+        self.collection = collection
+        self.identifier_values = identifier_values
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+    def find(self, filter: Optional[dict] = None, *args: Any, **kwargs: Any) -> Any:
+        if "$in" in repr(filter) and self.identifier_values:
+            self.collection.delete_many({"id": {"$in": self.identifier_values}})
+            self.identifier_values = []
+        return self.collection.find(filter, *args, **kwargs)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_compare_collections(populated_collections: tuple[Collection, Collection], strategy: Strategy) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy, batch_size=3)
+    assert summarize(result) == EXPECTED_SUMMARY
+
+    # Check the diff of each differing document.
+    assert any("tags" in line for line in result.get_diff_lines(2))
+    assert any("1.2" in line for line in result.get_diff_lines(7))
+    assert any("1.7" in line for line in result.get_diff_lines(7))
+    assert result.get_oid_value(7) == collection_a.find_one({"id": 7})["_id"]
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_compare_collections_counts_documents_independently_of_progress_bars(
+    populated_collections: tuple[Collection, Collection], monkeypatch: pytest.MonkeyPatch, strategy: Strategy,
+) -> None:
+    r"""Regression test: The numbers of documents in the result used to be read from the progress bars."""
+    monkeypatch.setattr(ThrottledProgress, "update", lambda *args, **kwargs: None)
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy, filter_a={"id": {"$gte": 3}})
+    assert (result.num_documents_in_collection_a, result.num_documents_in_collection_b) == (9, 12)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_compare_collections_considers_oid_unless_ignored(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=False,
+                                              strategy=strategy)
+    assert summarize(result)["differing"] == list(range(1, 11))
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+@pytest.mark.parametrize(("field_options", "differing_identifier_values"), [
+    (dict(ignored_field_names=["details.tags"]), [7]),
+    (dict(ignored_field_names=["details", "weight"]), []),
+    (dict(only_field_names=["details.tags"]), [2]),
+    (dict(only_field_names=["name", "details.size"]), []),
+])
+def test_compare_collections_limits_fields(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy, field_options: dict,
+    differing_identifier_values: list,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy, **field_options)
+    assert summarize(result) == {**EXPECTED_SUMMARY, "differing": differing_identifier_values}
+
+    # Check that the ignored fields don't appear in the diffs, either.
+    for field_name in field_options.get("ignored_field_names", []):
+        for (_, _, diff_lines) in result.iterate_differing_documents():
+            assert not any(f'"{field_name.split(".")[-1]}"' in line for line in diff_lines)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_compare_collections_applies_filters(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy, batch_size=3, filter_a={"id": {"$gte": 3}},
+                                              filter_b={"id": {"$gte": 3, "$ne": 12}})
+    assert summarize(result) == dict(num_a=9, num_b=8, a_only=[11], b_only=[], differing=[7])
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_compare_collections_generates_up_to_max_diffs(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    result = Comparator(max_diffs=1).compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                                         strategy=strategy)
+    assert summarize(result) == EXPECTED_SUMMARY
+    diffs = [diff_lines for (_, _, diff_lines) in result.iterate_differing_documents()]
+    assert len(diffs) == 2 and sum(diff_lines is not None for diff_lines in diffs) == 1
+
+
+def test_merge_pairs_up_identifiers_of_different_types_in_mongodb_order(
+    collection_a: Collection, collection_b: Collection,
+) -> None:
+    identifier_values = [None, 1, 2.5, "a", "b", {"x": 1}, True]
+    collection_a.insert_many([{"_id": i, "id": value, "v": i} for (i, value) in enumerate(identifier_values)])
+    collection_b.insert_many([{"_id": i, "id": value, "v": i} for (i, value) in enumerate(identifier_values)])
+    collection_b.update_one({"id": "b"}, {"$set": {"v": -1}})
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=False,
+                                              strategy=Strategy.MERGE)
+    assert summarize(result) == dict(num_a=7, num_b=7, a_only=[], b_only=[], differing=["b"])
+
+
+def test_find_documents_by_identifier_values_distinguishes_null_from_missing(collection_b: Collection) -> None:
+    collection_b.insert_many([{"id": 1}, {"id": None, "v": "null"}, {"v": "missing"}, {"id": "x"}])
+    documents_by_key = find_documents_by_identifier_values(collection_b, "id", [1, None, 2], projection={"_id": 0})
+    assert documents_by_key == {bson_sort_key(1): {"id": 1}, bson_sort_key(None): {"id": None, "v": "null"}}
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_detects_differences_in_fractional_parts_of_numbers(
+    collection_a: Collection, collection_b: Collection, strategy: Strategy,
+) -> None:
+    r"""
+    Regression test: Digests computed via `$toHashedIndexKey` truncated numbers to integers, so strategies that
+    compared such digests missed differences like this one.
+    """
+
+    values = [(1.2, 1.7), (Decimal128("1.2"), Decimal128("1.7")), ([0.25], [0.75]), ({"x": -2.5}, {"x": -2.0})]
+    collection_a.insert_many([{"id": i, "v": value_a} for (i, (value_a, _)) in enumerate(values)])
+    collection_b.insert_many([{"id": i, "v": value_b} for (i, (_, value_b)) in enumerate(values)])
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy)
+    assert summarize(result)["differing"] == [0, 1, 2, 3]
+    assert compute_digest({"v": 1.2}) != compute_digest({"v": 1.7})
+
+
+def test_fingerprint_compares_documents_whose_digests_differ_by_value(
+    collection_a: Collection, collection_b: Collection,
+) -> None:
+    collection_a.insert_many([{"id": 1, "v": 1, "w": 2}, {"id": 2, "v": 1}, {"id": 3, "v": 1}, {"id": 4, "v": 1}])
+    collection_b.insert_many([{"id": 1, "w": 2, "v": 1.0}, {"id": 2, "v": 1}, {"id": 3, "v": 2}, {"id": 4, "v": 1}])
+    (query_counting_collection_a, query_counting_collection_b) = (
+        QueryCountingCollection(collection_a), QueryCountingCollection(collection_b),
+    )
+    result = Comparator().compare_collections(query_counting_collection_a, query_counting_collection_b, "id", "id",
+                                              ignore_oid=True, strategy=Strategy.FINGERPRINT)
+
+    # Documents 1 (whose fields are in a different order, and whose numbers have different types) and 3 have
+    # different digests; so they are fetched again (via one query per collection) and compared.
+    assert summarize(result)["differing"] == [3]
+    assert query_counting_collection_a.num_calls == query_counting_collection_b.num_calls == {"find": 2}
+
+
+def test_fingerprint_hashes_raw_bson_without_decoding_documents(
+    populated_collections: tuple[Collection, Collection], monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    r"""
+    Regression test: The fingerprint strategy read each document as a `dict` (unless `use_raw_bson` was set), and
+    then encoded it back into BSON to compute its digest.
+    """
+
+    hashed_document_types = set()
+
+    def spy_on_compute_digest(document: Any, *args: Any, **kwargs: Any) -> bytes:
+        hashed_document_types.add(type(document))
+        return compute_digest(document, *args, **kwargs)
+
+    monkeypatch.setattr(mongo_diff.queries, "compute_digest", spy_on_compute_digest)
+    result = Comparator().compare_collections(*populated_collections, "id", "id", ignore_oid=True,
+                                              strategy=Strategy.FINGERPRINT)
+
+    assert summarize(result) == EXPECTED_SUMMARY
+    assert hashed_document_types == {RawBSONDocument}
+
+
+@pytest.mark.parametrize("memory_limit", [1, 2048])
+def test_sort_strategy_spills_fingerprints_to_disk(
+    populated_collections: tuple[Collection, Collection], monkeypatch: pytest.MonkeyPatch, memory_limit: int,
+) -> None:
+    num_runs = []
+    original_close = ExternalSorter.close
+
+    def close(self: ExternalSorter) -> None:
+        num_runs.append(self.num_runs)
+        original_close(self)
+
+    monkeypatch.setattr(ExternalSorter, "close", close)
+    (collection_a, collection_b) = populated_collections
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=Strategy.SORT, memory_limit=memory_limit)
+    assert summarize(result) == EXPECTED_SUMMARY
+    if memory_limit == 1:
+        assert sorted(num_runs) == [11, 12]  # a run per fingerprint
+    else:
+        assert all(0 < num_runs_of_sorter < 11 for num_runs_of_sorter in num_runs)
+
+
+def test_external_sorter_merges_many_runs_in_passes(monkeypatch: pytest.MonkeyPatch) -> None:
+    r"""
+    Regression test: The sorter used to merge every run at once, so it had a file open per run and, with enough
+    runs, exceeded the limit on open files.
+    """
+
+    num_open_runs = max_num_open_runs = 0
+    original_read_run = ExternalSorter._read_run
+
+    def read_run(run_path: str) -> Iterator[tuple[bytes, bytes]]:
+        nonlocal num_open_runs, max_num_open_runs
+        num_open_runs += 1
+        max_num_open_runs = max(max_num_open_runs, num_open_runs)
+        try:
+            yield from original_read_run(run_path)
+        finally:
+            num_open_runs -= 1
+
+    monkeypatch.setattr(ExternalSorter, "_read_run", staticmethod(read_run))
+    keys = [f"{number:04}".encode() for number in random.Random(0).sample(range(1000), 1000)]
+    with ExternalSorter(memory_limit=1, max_runs_per_merge=4) as sorter:
+        for key in keys:
+            sorter.add(key, key[::-1])
+        assert list(sorter) == [(key, key[::-1]) for key in sorted(keys)]
+        assert sorter.num_runs == 1000
+    assert max_num_open_runs == 4
+
+
+@pytest.mark.parametrize(("filter", "expected_num_calls"), [(None, {}), ({"id": {"$lt": 5}}, {"count_documents": 1})])
+def test_estimate_number_of_documents_counts_documents_only_when_filtered(
+    populated_collections: tuple[Collection, Collection], filter: Optional[dict], expected_num_calls: dict,
+) -> None:
+    query_counting_collection = QueryCountingCollection(populated_collections[0])
+    expected_number = 11 if filter is None else 4
+    assert estimate_number_of_documents(query_counting_collection, filter) == expected_number
+    assert query_counting_collection.num_calls == expected_num_calls
+
+
+@pytest.mark.parametrize(("strategy", "deleting_label"), [
+    (Strategy.HASH, "A"), (Strategy.FINGERPRINT, "A"), (Strategy.FINGERPRINT, "B"), (Strategy.SORT, "A"),
+    (Strategy.SORT, "B"),
+])
+def test_documents_deleted_before_being_fetched_again_are_in_one_collection_only(
+    populated_collections: tuple[Collection, Collection], strategy: Strategy, deleting_label: str,
+) -> None:
+    r"""
+    Regression test: Strategies that fetch documents again when their digests differ used to raise a `KeyError`
+    if a document had been deleted in the meantime.
+    """
+
+    (collection_a, collection_b) = populated_collections
+    if deleting_label == "A":
+        collection_a = RefetchDeletingCollection(collection_a, [2])
+    else:
+        collection_b = RefetchDeletingCollection(collection_b, [2])
+    result = Comparator().compare_collections(collection_a, collection_b, "id", "id", ignore_oid=True,
+                                              strategy=strategy, max_identifiers_in_memory=2)
+    summary = summarize(result)
+    assert summary["differing"] == [7]
+    if deleting_label == "A":
+        assert (summary["a_only"], summary["b_only"]) == ([11], [2, 12, "twelve"])
+    else:
+        assert (summary["a_only"], summary["b_only"]) == ([2, 11], [12, "twelve"])
+
+
+@pytest.mark.parametrize(("indexed_labels", "expected_strategy"), [
+    ("AB", Strategy.MERGE), ("B", Strategy.BATCH), ("A", Strategy.HASH), ("", Strategy.HASH),
+])
+def test_plan_comparison_uses_indexes(
+    populated_collections: tuple[Collection, Collection], indexed_labels: str, expected_strategy: Strategy,
+) -> None:
+    (collection_a, collection_b) = populated_collections
+    for (label, collection) in (("A", collection_a), ("B", collection_b)):
+        if label in indexed_labels:
+            collection.create_index("id")
+    plan = plan_comparison(collection_a, collection_b, "id", "id")
+    assert (plan.strategy, plan.is_quadratic) == (expected_strategy, False)
+
+    # Check that a plan for a strategy that would scan collection B for every lookup is flagged as such.
+    plan = plan_comparison(collection_a, collection_b, "id", "id", strategy=Strategy.LOOKUP)
+    assert plan.is_quadratic == ("B" not in indexed_labels)